@@ -0,0 +1,54 @@
+"""Cold storage for old expenses.
+
+Expenses dated before the archive horizon are moved out of the hot
+``expenses`` collection into one ``expense_archives`` document per user and
+month, holding the month's stored expense documents as zlib-compressed JSON.
+Alongside, ``expense_rollups`` keeps exact per-month/category totals (in
+minor units) hot, so summaries and budget checks never need to decompress
+an archive. Archived expenses are read-only; they can be listed and
+exported on demand.
+
+These helpers are pure; the storage side lives in ``server.py``.
+"""
+
+import json
+import zlib
+
+COMPRESSION_LEVEL = 6
+
+
+def month_of(date_value) -> str:
+    """``YYYY-MM`` of a stored ISO date."""
+    return str(date_value)[:7]
+
+
+def pack(expenses) -> bytes:
+    rows = [{k: v for k, v in expense.items() if k != "_id"} for expense in expenses]
+    data = json.dumps(rows, separators=(",", ":"), default=str).encode()
+    return zlib.compress(data, COMPRESSION_LEVEL)
+
+
+def unpack(blob) -> list:
+    return json.loads(zlib.decompress(bytes(blob)))
+
+
+def merge(archived, expenses) -> list:
+    """Archived rows plus ``expenses``, de-duplicated by id (re-archiving
+    after an interrupted run must not double count)."""
+    rows = {row["id"]: row for row in archived}
+    for expense in expenses:
+        rows[expense["id"]] = {k: v for k, v in expense.items() if k != "_id"}
+    return sorted(rows.values(), key=lambda row: (str(row["date"]), row["id"]))
+
+
+def rollup(user_id: str, month: str, rows) -> list:
+    """Per-category rollup documents for one user and month."""
+    totals = {}
+    for row in rows:
+        total = totals.setdefault(row["category"], {"total_minor": 0, "count": 0})
+        total["total_minor"] += row["amount_minor"]
+        total["count"] += 1
+    return [
+        {"user_id": user_id, "month": month, "category": category, **total}
+        for category, total in sorted(totals.items())
+    ]
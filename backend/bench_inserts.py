@@ -0,0 +1,133 @@
+"""Benchmark for insert write coalescing.
+
+Runs concurrent writers that each insert expenses back to back, once with
+direct inserts and once through InsertCoalescer, and reports throughput and
+per-insert latency. Without --mongo-url, storage is simulated with a fixed
+network round trip per call plus a durable-commit cost that the server
+pays one call at a time (as a journaled write concern does); with it, the
+inserts go to a scratch collection on that server.
+
+    python bench_inserts.py --writers 200 --inserts 20 --rtt-ms 1 --commit-us 250
+    python bench_inserts.py --mongo-url mongodb://localhost:27017
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from coalesce import InsertCoalescer
+
+
+class SimulatedStorage:
+    def __init__(self, rtt: float, commit: float, per_document: float):
+        self.rtt = rtt
+        self.commit = commit
+        self.per_document = per_document
+        self.commit_lock = asyncio.Lock()
+        self.round_trips = 0
+
+    async def _call(self, documents: int):
+        self.round_trips += 1
+        await asyncio.sleep(self.rtt / 2)
+        async with self.commit_lock:
+            await asyncio.sleep(self.commit + documents * self.per_document)
+        await asyncio.sleep(self.rtt / 2)
+
+    async def insert_one(self, document):
+        await self._call(1)
+
+    async def insert_many(self, documents):
+        await self._call(len(documents))
+
+
+class MongoStorage:
+    def __init__(self, url: str):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self.collection = AsyncIOMotorClient(url)["bench_inserts"]["expenses"]
+        self.round_trips = 0
+
+    async def insert_one(self, document):
+        self.round_trips += 1
+        await self.collection.insert_one(document)
+
+    async def insert_many(self, documents):
+        self.round_trips += 1
+        await self.collection.insert_many(documents, ordered=False)
+
+
+def new_expense(writer: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": f"user-{writer}",
+        "amount_minor": 12345,
+        "category": "Food",
+        "date": "2026-10-31T12:00:00+00:00",
+        "notes": "end of month",
+    }
+
+
+async def run(storage, writers: int, inserts: int, coalescer=None):
+    latencies = []
+
+    async def write(document):
+        if coalescer:
+            await coalescer.insert("expenses", document)
+        else:
+            await storage.insert_one(document)
+
+    async def writer(n):
+        for _ in range(inserts):
+            start = time.perf_counter()
+            await write(new_expense(n))
+            latencies.append(time.perf_counter() - start)
+
+    storage.round_trips = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(n) for n in range(writers)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"  inserts/second:   {len(latencies) / elapsed:,.0f}")
+    print(f"  round trips:      {storage.round_trips}")
+    print(f"  latency p50:      {statistics.median(latencies) * 1000:.2f} ms")
+    print(f"  latency p99:      {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+
+
+async def main(args):
+    if args.mongo_url:
+        storage = MongoStorage(args.mongo_url)
+    else:
+        storage = SimulatedStorage(
+            args.rtt_ms / 1000, args.commit_us / 1e6, args.document_us / 1e6
+        )
+
+    async def flush(collection, documents):
+        await storage.insert_many(documents)
+        return [None] * len(documents)
+
+    print(f"{args.writers} writers x {args.inserts} inserts")
+    print("direct insert_one:")
+    await run(storage, args.writers, args.inserts)
+    print(f"coalesced ({args.delay_ms} ms / {args.max_batch} documents):")
+    coalescer = InsertCoalescer(flush, args.max_batch, args.delay_ms / 1000)
+    await run(storage, args.writers, args.inserts, coalescer)
+    print(f"  mean batch:       {coalescer.stats()['mean_batch']}")
+
+    if args.mongo_url:
+        await storage.collection.drop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=200)
+    parser.add_argument("--inserts", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=1.0)
+    parser.add_argument("--commit-us", type=float, default=250.0)
+    parser.add_argument("--document-us", type=float, default=10.0)
+    parser.add_argument("--delay-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--mongo-url")
+    asyncio.run(main(parser.parse_args()))
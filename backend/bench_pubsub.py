@@ -0,0 +1,77 @@
+"""Load test for the real-time event hub.
+
+Simulates thousands of concurrent subscribers (one consumer task each, as an
+/api/events connection would have) and measures publish cost, end-to-end
+delivery latency and per-subscriber memory.
+
+    python bench_pubsub.py --subscribers 5000 --events 200 --group-size 8
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import tracemalloc
+
+from pubsub import PubSubHub
+
+
+async def run(subscribers: int, events: int, group_size: int, queue_size: int):
+    hub = PubSubHub(queue_size)
+    latencies = []
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    subscriptions = [
+        hub.subscribe([f"user:{i}", f"group:{i // group_size}"])
+        for i in range(subscribers)
+    ]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    async def consume(subscription):
+        while True:
+            frame = await subscription.next_frame()
+            sent_at = json.loads(frame.split("data: ", 1)[1])["sent_at"]
+            latencies.append(time.perf_counter() - sent_at)
+
+    consumers = [asyncio.create_task(consume(sub)) for sub in subscriptions]
+    await asyncio.sleep(0)
+
+    groups = max(1, subscribers // group_size)
+    publish_times = []
+    for n in range(events):
+        start = time.perf_counter()
+        # One group event (fan-out to group_size members) and one broadcast-
+        # style burst to every group, as an end-of-month entry spike would do
+        hub.publish(f"group:{n % groups}", "group_expense.created", {"sent_at": start})
+        for group in range(groups):
+            hub.publish(f"group:{group}", "tick", {"sent_at": time.perf_counter()})
+        publish_times.append(time.perf_counter() - start)
+        await asyncio.sleep(0)
+
+    while any(not sub.queue.empty() for sub in subscriptions):
+        await asyncio.sleep(0.001)
+    for consumer in consumers:
+        consumer.cancel()
+
+    latencies.sort()
+    stats = hub.stats()
+    print(f"subscribers:            {subscribers}")
+    print(f"frames delivered:       {stats['delivered']}")
+    print(f"frames dropped:         {stats['dropped']}")
+    print(f"memory per subscriber:  {(after - before) / subscribers:.0f} bytes")
+    print(f"publish round (mean):   {statistics.mean(publish_times) * 1000:.2f} ms")
+    print(f"delivery latency p50:   {latencies[len(latencies) // 2] * 1000:.2f} ms")
+    print(f"delivery latency p99:   {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--group-size", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.subscribers, args.events, args.group_size, args.queue_size))
@@ -0,0 +1,216 @@
+"""Idempotency-Key support for retried writes.
+
+Clients on flaky networks retry writes whose response they never received.
+When such a request carries an ``Idempotency-Key`` header, the first
+response is cached per (user, key) and replayed for every retry, so a retry
+never creates a second expense or adds money twice:
+
+* a retry that arrives while the first request is still running waits for
+  it and gets the same response instead of executing concurrently;
+* reusing a key for a different request (method, path, query or body) is
+  rejected with 422;
+* 5xx responses, exceptions and bodies over ``max_body_bytes`` are not
+  cached, so the request runs again on retry;
+* entries expire after ``ttl`` seconds and the cache holds at most
+  ``max_entries`` responses and ``max_bytes`` of cached bodies and headers
+  (oldest evicted first).
+
+The cache lives in process memory, so with several workers a retry is only
+deduplicated when it reaches the same worker.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+
+from starlette.responses import JSONResponse, Response
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# Headers that describe one particular request rather than its result; they
+# are never replayed (outer middleware sets fresh ones on every response)
+PER_REQUEST_HEADERS = {b"x-profile-id", b"x-request-id", b"traceparent", b"date"}
+
+
+class CachedResponse:
+    __slots__ = ("fingerprint", "status_code", "headers", "body", "expires")
+
+    def __init__(self, fingerprint, status_code, headers, body, expires):
+        self.fingerprint = fingerprint
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.expires = expires
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers)
+
+    def replay(self) -> Response:
+        response = _raw_response(self.body, self.status_code, self.headers)
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+
+def _raw_response(content: bytes, status_code: int, raw_headers) -> Response:
+    # Built from the raw header list, so repeated headers (Set-Cookie) survive
+    response = Response(content, status_code)
+    response.raw_headers = list(raw_headers)
+    return response
+
+
+class IdempotencyCache:
+    """HTTP middleware deduplicating keyed writes on selected routes."""
+
+    def __init__(
+        self,
+        routes,
+        identify,
+        ttl: float = 86400.0,
+        max_entries: int = 10_000,
+        max_body_bytes: int = 64 * 1024,
+        max_bytes: int = 32 * 1024 * 1024,
+    ):
+        self.routes = [(method, re.compile(path)) for method, path in routes]
+        self.identify = identify  # request -> user_id or None
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_body_bytes = max_body_bytes
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0  # total size of the cached responses
+        self.in_flight = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.conflicts = 0
+
+    @classmethod
+    def from_env(cls, identify):
+        return cls(
+            [
+                ("POST", r"^/api/expenses$"),
+                ("POST", r"^/api/groups/[^/]+/expenses$"),
+                ("PUT", r"^/api/savings-goals/[^/]+/add-amount$"),
+            ],
+            identify,
+            ttl=float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "86400")),
+            max_entries=int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", "10000")),
+            max_bytes=int(
+                float(os.environ.get("IDEMPOTENCY_MAX_MB", "32")) * 1024 * 1024
+            ),
+        )
+
+    def applies_to(self, request) -> bool:
+        return any(
+            request.method == method and path.match(request.url.path)
+            for method, path in self.routes
+        )
+
+    def lookup(self, key, now: float):
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires <= now:
+            del self.entries[key]
+            self.bytes -= entry.size
+            return None
+        return entry
+
+    def store(self, key, entry: CachedResponse, now: float):
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous.size
+        self.entries[key] = entry
+        self.bytes += entry.size
+        # Entries share one TTL, so the oldest are also the first to expire
+        while self.entries:
+            oldest = next(iter(self.entries.values()))
+            if (
+                oldest.expires > now
+                and len(self.entries) <= self.max_entries
+                and self.bytes <= self.max_bytes
+            ):
+                break
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= evicted.size
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "in_flight": len(self.in_flight),
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "conflicts": self.conflicts,
+        }
+
+    async def __call__(self, request, call_next):
+        idempotency_key = request.headers.get(HEADER)
+        if not idempotency_key or not self.applies_to(request):
+            return await call_next(request)
+        user_id = self.identify(request)
+        if not user_id:
+            return await call_next(request)
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return JSONResponse(
+                {"detail": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"},
+                status_code=400,
+            )
+
+        body = await request.body()
+        request_line = f"{request.method} {request.url.path}?{request.url.query}"
+        fingerprint = hashlib.sha256(request_line.encode() + b"\0" + body).hexdigest()
+        key = (user_id, idempotency_key)
+
+        while True:
+            entry = self.lookup(key, time.monotonic())
+            if entry is not None:
+                if entry.fingerprint != fingerprint:
+                    self.conflicts += 1
+                    return JSONResponse(
+                        {"detail": f"{HEADER} was already used for a different request"},
+                        status_code=422,
+                    )
+                self.hits += 1
+                return entry.replay()
+
+            pending = self.in_flight.get(key)
+            if pending is None:
+                break
+            # Wait for the first request, then replay its response (or run
+            # this one if the first was not cached)
+            self.coalesced += 1
+            await asyncio.shield(pending)
+
+        self.misses += 1
+        done = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = done
+        try:
+            response = await call_next(request)
+            if response.status_code >= 500:
+                return response
+            chunks = []
+            async for chunk in response.body_iterator:
+                chunks.append(chunk)
+            content = b"".join(chunks)
+            if len(content) <= self.max_body_bytes:
+                headers = [
+                    (name, value)
+                    for name, value in response.raw_headers
+                    if name.lower() not in PER_REQUEST_HEADERS
+                ]
+                now = time.monotonic()
+                self.store(
+                    key,
+                    CachedResponse(
+                        fingerprint, response.status_code, headers, content, now + self.ttl
+                    ),
+                    now,
+                )
+            return _raw_response(content, response.status_code, response.raw_headers)
+        finally:
+            del self.in_flight[key]
+            done.set_result(None)
@@ -0,0 +1,114 @@
+"""Running per-category spending statistics.
+
+Statistics are updated in O(1) per expense write, so spending insights never
+need to rescan a user's history. Each category keeps:
+
+* exact ``count``, ``total`` and ``sum_squares``, which can be reversed when
+  an expense is edited or deleted, and
+* an exponentially weighted mean/variance (``ewma_mean``/``ewma_var``) that
+  tracks recent behaviour and is used to flag unusually large expenses.
+
+EWMA state cannot be "un-applied" exactly, so edits and deletes only adjust
+the exact aggregates; the EWMA keeps decaying towards new observations.
+Each write is one upsert: ``$inc`` of ``amount_deltas`` keeps the exact
+aggregates correct under concurrent writes, while the EWMA fields are a
+best-effort ``$set`` computed from the document read just before.
+
+Amounts are integer minor units (see money.py), which keeps ``total``
+exact; ``sum_squares`` is a float so it cannot overflow a 64-bit integer.
+``summarize`` converts back to decimal amounts.
+"""
+
+import math
+import os
+
+from money import MINOR_PER_UNIT, from_minor
+
+EWMA_ALPHA = float(os.environ.get("INSIGHTS_EWMA_ALPHA", "0.1"))
+OUTLIER_Z_SCORE = float(os.environ.get("INSIGHTS_OUTLIER_Z", "3.0"))
+# A category needs this many expenses before anything is flagged
+OUTLIER_MIN_COUNT = int(os.environ.get("INSIGHTS_MIN_COUNT", "5"))
+# Standard deviation floor as a fraction of the mean, so categories with
+# near-constant amounts do not flag every small deviation
+MIN_RELATIVE_STD = 0.1
+
+
+def new_stats(user_id: str, category: str) -> dict:
+    return {
+        "user_id": user_id,
+        "category": category,
+        "units": "minor",
+        "count": 0,
+        "total": 0,
+        "sum_squares": 0.0,
+        "ewma_mean": 0.0,
+        "ewma_var": 0.0,
+    }
+
+
+def outlier_score(stats: dict, amount: int):
+    """Return the z-score of ``amount`` if it is an outlier for ``stats``, else None."""
+    if stats["count"] < OUTLIER_MIN_COUNT:
+        return None
+    mean = stats["ewma_mean"]
+    std = max(math.sqrt(stats["ewma_var"]), abs(mean) * MIN_RELATIVE_STD)
+    if std == 0:
+        return None
+    z_score = (amount - mean) / std
+    return z_score if z_score >= OUTLIER_Z_SCORE else None
+
+
+def amount_deltas(old_amount=None, new_amount=None) -> dict:
+    """``$inc`` of the exact aggregates for replacing ``old_amount`` (None for
+    a create) with ``new_amount`` (None for a delete) in one category."""
+    deltas = {"count": 0, "total": 0, "sum_squares": 0.0}
+    if old_amount is not None:
+        deltas["count"] -= 1
+        deltas["total"] -= old_amount
+        deltas["sum_squares"] -= float(old_amount) * old_amount
+    if new_amount is not None:
+        deltas["count"] += 1
+        deltas["total"] += new_amount
+        deltas["sum_squares"] += float(new_amount) * new_amount
+    return deltas
+
+
+def ewma_after(stats: dict, amount: int, alpha: float = EWMA_ALPHA) -> dict:
+    """EWMA fields after observing ``amount``, computed from the snapshot
+    ``stats``. Concurrent writes may overwrite each other's result; unlike
+    the exact aggregates, the EWMA is only ever an estimate."""
+    if stats["count"] <= 0:
+        return {"ewma_mean": amount, "ewma_var": 0.0}
+    diff = amount - stats["ewma_mean"]
+    increment = alpha * diff
+    return {
+        "ewma_mean": stats["ewma_mean"] + increment,
+        "ewma_var": (1 - alpha) * (stats["ewma_var"] + diff * increment),
+    }
+
+
+def summarize(stats: dict) -> dict:
+    count = stats["count"]
+    mean = stats["total"] / count if count else 0.0
+    variance = max(0.0, stats["sum_squares"] / count - mean * mean) if count else 0.0
+    return {
+        "category": stats["category"],
+        "count": count,
+        "total": from_minor(stats["total"]),
+        "mean": round(mean / MINOR_PER_UNIT, 2),
+        "std": round(math.sqrt(variance) / MINOR_PER_UNIT, 2),
+        "recent_mean": round(stats["ewma_mean"] / MINOR_PER_UNIT, 2),
+        "recent_std": round(math.sqrt(stats["ewma_var"]) / MINOR_PER_UNIT, 2),
+    }
+
+
+def stats_to_minor_units(stats: dict) -> dict:
+    """Fields to $set to convert a pre-minor-units stats document."""
+    scale = MINOR_PER_UNIT
+    return {
+        "units": "minor",
+        "total": round(stats["total"] * scale),
+        "sum_squares": stats["sum_squares"] * scale * scale,
+        "ewma_mean": stats["ewma_mean"] * scale,
+        "ewma_var": stats["ewma_var"] * scale * scale,
+    }
@@ -0,0 +1,176 @@
+"""Background job runner for heavy reports.
+
+Jobs are queued on a bounded asyncio queue and executed by a fixed pool of
+worker tasks, so long computations never run on the request path. Handlers
+that do CPU-heavy aggregation can hand the pure computation to
+``JobRunner.run_cpu``, which uses a process pool when
+``REPORT_PROCESS_WORKERS`` > 0 (and a thread otherwise) to keep the event loop
+responsive.
+
+Job state is persisted through the callables passed in by ``server.py`` (the
+``db_*`` storage helpers), so a job's status survives the worker that ran it
+and can be polled from any request.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class JobRunner:
+    def __init__(
+        self,
+        insert_job,
+        update_job,
+        workers: int = 2,
+        queue_size: int = 100,
+        process_workers: int = 0,
+    ):
+        self.insert_job = insert_job  # async (job dict) -> None
+        self.update_job = update_job  # async (job_id, fields dict) -> None
+        self.worker_count = workers
+        self.queue = asyncio.Queue(queue_size)
+        self.process_workers = process_workers
+        self.handlers = {}
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_times = deque(maxlen=500)
+        self.run_times = deque(maxlen=500)
+        self._workers = []
+        self._pool = None
+        self._reserved = 0  # queue slots held by submits still inserting their job
+
+    def register(self, job_type: str, handler):
+        """Register ``async handler(job, runner) -> result dict`` for a job type."""
+        self.handlers[job_type] = handler
+
+    async def start(self):
+        if self.process_workers > 0:
+            self._pool = ProcessPoolExecutor(self.process_workers)
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"job-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def submit(self, job_type: str, user_id: str, params: dict) -> dict:
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        # Hold a slot across the insert below, so concurrent submits cannot
+        # all pass this check and overfill the queue
+        capacity = self.queue.maxsize
+        if capacity and self.queue.qsize() + self._reserved >= capacity:
+            raise QueueFullError()
+
+        job = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "type": job_type,
+            "params": params,
+            "status": "queued",
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        self._reserved += 1
+        try:
+            await self.insert_job(dict(job))
+        finally:
+            self._reserved -= 1
+        self.queue.put_nowait((job, time.perf_counter()))
+        return job
+
+    async def run_cpu(self, func, *args):
+        """Run a pure, picklable function off the event loop."""
+        if self._pool:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, func, *args)
+        return await asyncio.to_thread(func, *args)
+
+    async def _work(self):
+        while True:
+            job, queued_at = await self.queue.get()
+            self.wait_times.append(time.perf_counter() - queued_at)
+            self.running += 1
+            started = time.perf_counter()
+            try:
+                await self.update_job(
+                    job["id"], {"status": "running", "started_at": _now()}
+                )
+                result = await self.handlers[job["type"]](job, self)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.exception(
+                    "Job %s failed", job["id"], extra={"job_type": job["type"]}
+                )
+                await self._finish(
+                    job, {"status": "failed", "error": str(e), "finished_at": _now()}
+                )
+            else:
+                self.completed += 1
+                await self._finish(
+                    job,
+                    {"status": "completed", "result": result, "finished_at": _now()},
+                )
+            finally:
+                self.running -= 1
+                self.run_times.append(time.perf_counter() - started)
+                self.queue.task_done()
+
+    async def _finish(self, job, fields):
+        # A storage error here must not take the worker down with it
+        try:
+            await self.update_job(job["id"], fields)
+        except Exception:
+            logger.exception(
+                "Could not record the outcome of job %s",
+                job["id"],
+                extra={"job_type": job["type"]},
+            )
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_seconds_p50": _percentile(self.wait_times, 0.5),
+            "wait_seconds_p95": _percentile(self.wait_times, 0.95),
+            "run_seconds_p50": _percentile(self.run_times, 0.5),
+            "run_seconds_p95": _percentile(self.run_times, 0.95),
+        }
@@ -0,0 +1,187 @@
+"""Structured, non-blocking logging.
+
+``setup_logging`` routes every log record through a bounded in-memory queue
+to a background thread that formats it as one JSON object per line and
+writes it to stdout, so request handlers never wait on stdout. When the
+queue is full, records are dropped and counted rather than blocking.
+
+Each HTTP request gets an ID (the client's ``X-Request-ID`` or a new one),
+held in a contextvar by ``RequestLogMiddleware`` and attached to every
+record logged while handling it. High-volume loggers such as the access log
+(``app.access``) can be sampled with ``LOG_SAMPLE_RATES``; warnings and
+errors are always kept.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+request_id_var: ContextVar = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        if getattr(record, "request_id", None):
+            line += f" [{record.request_id}]"
+        return line
+
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the current request ID and sample noisy loggers.
+
+    Attached to the queue handler, so it runs in the caller's context (where
+    the request's contextvars are visible) and before anything is queued.
+    """
+
+    def __init__(self, sample_rates=None):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            rate = self.sample_rates.get(record.name)
+            if rate is not None and random.random() >= rate:
+                return False
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message and traceback here, where args and exc_info
+        # are still valid, and leave the formatting to the listener thread
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_sample_rates(value: str) -> dict:
+    """Parse ``"app.access=0.05,app.db=0.01"``."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, rate = item.split("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+_handler = None
+_listener = None
+
+
+def setup_logging():
+    """Install the queue-backed handler on the root logger (idempotent)."""
+    global _handler, _listener
+    if _handler is not None:
+        return _handler
+
+    log_queue = queue.Queue(int(os.environ.get("LOG_QUEUE_SIZE", "10000")))
+    _handler = DroppingQueueHandler(log_queue)
+    _handler.addFilter(
+        ContextFilter(parse_sample_rates(os.environ.get("LOG_SAMPLE_RATES", "")))
+    )
+
+    output = logging.StreamHandler()
+    if os.environ.get("LOG_FORMAT", "json") == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(TextFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+    # Stopping the listener writes out whatever is still queued
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    # Let uvicorn's loggers flow through the same pipeline, except its
+    # access log: RequestLogMiddleware already logs every request once
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+    logging.getLogger("uvicorn.access").disabled = True
+    return _handler
+
+
+def stats() -> dict:
+    return {
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0,
+    }
+
+
+access_logger = logging.getLogger("app.access")
+
+
+class RequestLogMiddleware:
+    """Assign request IDs and write a (sampled) access log line per request."""
+
+    async def __call__(self, request, call_next):
+        request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        request_id = request_id[:64]
+        token = request_id_var.set(request_id)
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+            response.headers["X-Request-ID"] = request_id
+            access_logger.info(
+                "%s %s %s",
+                request.method,
+                request.url.path,
+                response.status_code,
+                extra={
+                    "status": response.status_code,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                },
+            )
+            return response
+        finally:
+            request_id_var.reset(token)
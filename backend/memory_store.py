@@ -0,0 +1,179 @@
+"""In-memory document store used when STORAGE_BACKEND=memory.
+
+Each collection keeps its documents in insertion order plus hash indexes on
+a few equality fields (``user_id``, ``group_id``, ``id``...). A query with an
+equality condition on an indexed field only scans that value's bucket, so
+per-user reads cost O(that user's documents) rather than O(everything).
+
+Queries use the Mongo filter subset understood by ``matches``; the
+``db_*`` helpers in ``server.py`` call into this module so both backends
+share one storage API. Each collection also keeps a running estimate of its
+size in ``bytes`` (see ``approx_size``), which spill.py budgets against.
+"""
+
+import sys
+
+# Comparison operators understood by the in-memory backend
+QUERY_OPERATORS = {
+    "$gt": lambda a, b: a is not None and a > b,
+    "$gte": lambda a, b: a is not None and a >= b,
+    "$lt": lambda a, b: a is not None and a < b,
+    "$lte": lambda a, b: a is not None and a <= b,
+    "$ne": lambda a, b: a != b,
+    "$in": lambda a, b: a in b,
+    "$nin": lambda a, b: a not in b,
+}
+
+
+def apply_update(item, update):
+    """Apply the $set/$unset/$inc parts of a Mongo-style update in memory."""
+    item.update(update.get("$set", {}))
+    for key in update.get("$unset", {}):
+        item.pop(key, None)
+    for key, amount in update.get("$inc", {}).items():
+        item[key] = item.get(key, 0) + amount
+
+
+def matches(item, query):
+    """Evaluate a Mongo-style filter against an in-memory document."""
+    for key, condition in query.items():
+        value = item.get(key)
+        if isinstance(condition, dict) and condition and all(
+            op in QUERY_OPERATORS for op in condition
+        ):
+            if not all(QUERY_OPERATORS[op](value, arg) for op, arg in condition.items()):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def approx_size(value) -> int:
+    """Rough deep size of a JSON-like document in bytes."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    elif isinstance(value, list):
+        size += sum(approx_size(item) for item in value)
+    return size
+
+
+def project(item, fields):
+    """Copy only ``fields`` out of ``item`` (Mongo inclusion projection)."""
+    return {field: item[field] for field in fields if field in item}
+
+
+def _hashable(value) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class MemoryCollection:
+    def __init__(self, indexed=()):
+        # Documents are keyed by identity: dicts preserve insertion order and
+        # give O(1) removal
+        self.documents = {}
+        self.indexes = {field: {} for field in indexed}
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self.documents)
+
+    def __iter__(self):
+        return iter(list(self.documents.values()))
+
+    def _index(self, doc):
+        for field, index in self.indexes.items():
+            value = doc.get(field)
+            if _hashable(value):
+                index.setdefault(value, {})[id(doc)] = doc
+
+    def _unindex(self, doc, values=None):
+        for field, index in self.indexes.items():
+            value = (values or doc).get(field)
+            if not _hashable(value):
+                continue
+            bucket = index.get(value)
+            if bucket is not None:
+                bucket.pop(id(doc), None)
+                if not bucket:
+                    del index[value]
+
+    def candidates(self, query):
+        """Documents that may match ``query``, narrowed by the smallest
+        matching index bucket."""
+        best = None
+        for field, condition in (query or {}).items():
+            index = self.indexes.get(field)
+            if index is None or isinstance(condition, dict) or not _hashable(condition):
+                continue
+            bucket = index.get(condition, {})
+            if best is None or len(bucket) < len(best):
+                best = bucket
+        if best is None:
+            best = self.documents
+        return list(best.values())
+
+    def scan(self, query=None):
+        if not query:
+            return list(self.documents.values())
+        return [item for item in self.candidates(query) if matches(item, query)]
+
+    def insert(self, document):
+        self.documents[id(document)] = document
+        self._index(document)
+        self.bytes += approx_size(document)
+
+    def remove(self, document):
+        if self.documents.pop(id(document), None) is not None:
+            self._unindex(document)
+            self.bytes -= approx_size(document)
+
+    def update(self, document, update):
+        before = {field: document.get(field) for field in self.indexes}
+        self.bytes -= approx_size(document)
+        apply_update(document, update)
+        self.bytes += approx_size(document)
+        if any(document.get(field) != value for field, value in before.items()):
+            self._unindex(document, before)
+            self._index(document)
+
+    def find_one(self, query):
+        for item in self.candidates(query):
+            if matches(item, query):
+                return item
+        return None
+
+    def find(self, query=None, sort=None, limit=None, projection=None):
+        items = self.scan(query)
+        if sort:
+            items.sort(key=lambda x: x.get(sort[0], 0), reverse=(sort[1] == -1))
+        if limit:
+            items = items[:limit]
+        if projection:
+            items = [project(item, projection) for item in items]
+        return items
+
+    def count(self, query=None, limit=None):
+        count = 0
+        for item in self.candidates(query):
+            if matches(item, query or {}):
+                count += 1
+                if limit and count >= limit:
+                    break
+        return count
+
+    def group_sum(self, query, group_by=None, sum_field=None):
+        """{group key: {"total", "count"}} over documents matching ``query``."""
+        groups = {}
+        for item in self.scan(query):
+            group = groups.setdefault(
+                item.get(group_by) if group_by else None, {"total": 0, "count": 0}
+            )
+            group["count"] += 1
+            if sum_field:
+                group["total"] += item.get(sum_field) or 0
+        return groups
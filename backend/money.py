@@ -0,0 +1,47 @@
+"""Money helpers.
+
+Amounts are stored and aggregated as integer minor units (paise) so that sums
+and splits are exact. The API keeps exposing decimal rupee amounts; the
+conversion happens at the storage boundary (``prepare_for_mongo`` /
+``parse_from_mongo`` in ``server.py``), where every field listed in
+``MONEY_FIELDS`` is stored as ``<field>_minor``.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+MINOR_PER_UNIT = 100
+MONEY_FIELDS = ("amount", "target_amount", "current_amount")
+MINOR_SUFFIX = "_minor"
+
+
+def to_minor(amount) -> int:
+    """Convert a decimal amount (float, int, str or Decimal) to minor units.
+
+    Raises ValueError for anything that is not a finite number.
+    """
+    try:
+        value = Decimal(str(amount)) * MINOR_PER_UNIT
+    except ArithmeticError:
+        raise ValueError(f"Not an amount: {amount!r}")
+    if not value.is_finite():
+        raise ValueError(f"Not a finite amount: {amount!r}")
+    return int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(minor: int) -> float:
+    return minor / MINOR_PER_UNIT
+
+
+def split_evenly(total_minor: int, parties):
+    """Split ``total_minor`` across ``parties`` exactly.
+
+    Every party gets the floor share; the remainder is handed out one minor
+    unit at a time in sorted party order, so the result is deterministic and
+    always sums to ``total_minor``.
+    """
+    parties = sorted(parties)
+    share, remainder = divmod(total_minor, len(parties))
+    shares = {}
+    for i, party in enumerate(parties):
+        shares[party] = shares.get(party, 0) + share + (1 if i < remainder else 0)
+    return shares
@@ -0,0 +1,350 @@
+"""Opt-in per-request profiling for the Student Expense Manager API.
+
+A sampled fraction of requests (``PROFILE_SAMPLE_RATE``), or any request that
+carries ``X-Profile-Token: <ADMIN_TOKEN>``, is profiled. For each
+profiled request we record:
+
+* a sampling profile of the event-loop thread while the request's own tasks
+  run (collapsed stacks), taken by one sampler thread shared by all
+  profiled requests,
+* the wall time of every ``db_*`` storage call,
+* an estimate of the time spent in Pydantic validation, taken from the share
+  of stack samples that land inside pydantic.
+
+Profiles are written as JSON files to a bounded directory (oldest files are
+pruned first) and can be listed through the admin endpoints in ``server.py``.
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+import tracing
+
+_active_profile = contextvars.ContextVar("active_profile", default=None)
+
+PROFILE_HEADER = "X-Profile-Token"
+
+
+class RequestProfile:
+    summary_keys = (
+        "id",
+        "method",
+        "path",
+        "started_at",
+        "duration_ms",
+        "status_code",
+    )
+
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.duration_ms = None
+        self.status_code = None
+        self.db_calls = []
+        self.stacks = Counter()
+        self.samples = 0
+        self.validation_samples = 0
+        self.sample_interval = 0.0
+        self.tasks = []  # asyncio tasks whose samples belong to this request
+        self.done = False  # set once the request has finished
+
+    def record_db_call(self, helper: str, collection: str, elapsed: float):
+        self.db_calls.append(
+            {
+                "helper": helper,
+                "collection": collection,
+                "ms": round(elapsed * 1000, 3),
+            }
+        )
+
+    def summary(self) -> dict:
+        return {key: getattr(self, key) for key in self.summary_keys}
+
+    def to_dict(self) -> dict:
+        db_ms = sum(call["ms"] for call in self.db_calls)
+        validation_ms = self.validation_samples * self.sample_interval * 1000
+        data = self.summary()
+        data.update(
+            {
+                "db_calls": self.db_calls,
+                "db_total_ms": round(db_ms, 3),
+                "validation_ms_estimate": round(validation_ms, 3),
+                "samples": self.samples,
+                "sample_interval_ms": self.sample_interval * 1000,
+                "stacks": dict(self.stacks.most_common()),
+            }
+        )
+        return data
+
+
+class StackSampler(threading.Thread):
+    """Samples the event-loop thread's stack on behalf of every profiled
+    request in flight.
+
+    One sampler thread serves all profiled requests. Each sample is credited
+    to the profile owning the asyncio task that was running when it was
+    taken; a profiled request owns its own task and every task created while
+    it is active (``task_factory``), such as the one Starlette runs the route
+    in. Concurrent requests therefore never see each other's frames, and
+    samples taken between tasks (loop internals, I/O polling) are dropped.
+    """
+
+    def __init__(self, loop, thread_id: int, interval: float):
+        super().__init__(daemon=True, name="profile-sampler")
+        self.loop = loop
+        self.thread_id = thread_id
+        self.interval = interval
+        self.owners = {}  # task -> RequestProfile
+        self.lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._previous_factory = loop.get_task_factory()
+        loop.set_task_factory(self.task_factory)
+
+    def task_factory(self, loop, coro, **kwargs):
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        profile = _active_profile.get()
+        if profile is not None:
+            self.attach(task, profile)
+        return task
+
+    def attach(self, task, profile: RequestProfile):
+        with self.lock:
+            # Tasks started after the request finished (a streaming body,
+            # background work) inherit its context but are not part of it
+            if profile.done:
+                return
+            self.owners[task] = profile
+            profile.tasks.append(task)
+        task.add_done_callback(self._forget)
+        self._wake.set()
+
+    def _forget(self, task):
+        with self.lock:
+            self.owners.pop(task, None)
+            if not self.owners:
+                self._wake.clear()
+
+    def detach(self, profile: RequestProfile):
+        """Stop crediting samples to ``profile``."""
+        with self.lock:
+            profile.done = True
+            for task in profile.tasks:
+                self.owners.pop(task, None)
+            profile.tasks.clear()
+            if not self.owners:
+                self._wake.clear()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def run(self):
+        while not self._stopped:
+            self._wake.wait()
+            time.sleep(self.interval)
+            task = asyncio.current_task(self.loop)
+            frame = sys._current_frames().get(self.thread_id)
+            # The loop may switch tasks while we read its frame: only keep
+            # samples the same task was running on both sides of the read
+            if frame is None or task is None or task is not asyncio.current_task(
+                self.loop
+            ):
+                continue
+            stack = []
+            in_validation = False
+            while frame is not None:
+                code = frame.f_code
+                if "pydantic" in code.co_filename:
+                    in_validation = True
+                stack.append(
+                    f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            with self.lock:
+                profile = self.owners.get(task)
+                if profile is None:
+                    continue
+                profile.stacks[";".join(reversed(stack))] += 1
+                profile.samples += 1
+                if in_validation:
+                    profile.validation_samples += 1
+
+
+def _row_count(result):
+    """Rows returned or written by a ``db_*`` helper, for trace attributes."""
+    if result is None:
+        return 0
+    if isinstance(result, bool):
+        return int(result)
+    if isinstance(result, int):
+        return result
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        return 1
+    for attr in ("modified_count", "deleted_count", "inserted_count"):
+        if hasattr(result, attr):
+            return getattr(result, attr)
+    if hasattr(result, "inserted_id"):
+        return 1
+    return None
+
+
+def track_db_call(func):
+    """Record the wall time of a ``db_*`` helper on the active profile, if
+    any, and as a span on the active trace (see tracing.py)."""
+
+    @functools.wraps(func)
+    async def wrapper(collection, *args, **kwargs):
+        profile = _active_profile.get()
+        if profile is None and tracing.current_span() is None:
+            return await func(collection, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            with tracing.span(func.__name__, **{"db.collection": collection}) as span:
+                result = await func(collection, *args, **kwargs)
+                rows = _row_count(result)
+                if rows is not None:
+                    span.set_attribute("db.rows", rows)
+                return result
+        finally:
+            if profile is not None:
+                profile.record_db_call(
+                    func.__name__, collection, time.perf_counter() - start
+                )
+
+    return wrapper
+
+
+class ProfileStore:
+    """Stores profiles as JSON files in a directory capped at ``max_files``."""
+
+    def __init__(self, directory: Path, max_files: int):
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _load_index(self):
+        index = []
+        if self.directory.exists():
+            for path in sorted(self.directory.glob("*.json")):
+                try:
+                    with open(path) as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                summary = {k: data.get(k) for k in RequestProfile.summary_keys}
+                index.append(summary)
+        return index
+
+    def save(self, profile: RequestProfile):
+        with self._lock:
+            if self._index is None:
+                self._index = self._load_index()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{int(profile.started_at * 1000)}-{profile.id}.json"
+            with open(path, "w") as f:
+                json.dump(profile.to_dict(), f)
+            self._index.append(profile.summary())
+
+            files = sorted(self.directory.glob("*.json"))
+            for old in files[: max(0, len(files) - self.max_files)]:
+                old.unlink(missing_ok=True)
+            self._index = self._index[-self.max_files :]
+
+    def list_recent(self, limit: int = 50, min_duration_ms: float = 0.0):
+        with self._lock:
+            if self._index is None:
+                self._index = self._load_index()
+            entries = [
+                entry
+                for entry in self._index
+                if (entry.get("duration_ms") or 0) >= min_duration_ms
+            ]
+        return list(reversed(entries))[:limit]
+
+    def load(self, profile_id: str):
+        for path in self.directory.glob(f"*-{profile_id}.json"):
+            with open(path) as f:
+                return json.load(f)
+        return None
+
+
+class RequestProfiler:
+    """HTTP middleware that profiles sampled or explicitly requested calls."""
+
+    def __init__(
+        self,
+        store: ProfileStore,
+        sample_rate: float = 0.0,
+        admin_token: str = None,
+        interval: float = 0.005,
+    ):
+        self.store = store
+        self.sample_rate = sample_rate
+        self.admin_token = admin_token
+        self.interval = interval
+        self.sampler = None
+
+    @classmethod
+    def from_env(cls, root_dir: Path):
+        directory = os.environ.get("PROFILE_DIR") or root_dir / "profiles"
+        store = ProfileStore(directory, int(os.environ.get("PROFILE_MAX_FILES", "200")))
+        return cls(
+            store,
+            sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", "0")),
+            admin_token=os.environ.get("ADMIN_TOKEN") or None,
+            interval=float(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1000,
+        )
+
+    def should_profile(self, request) -> bool:
+        token = request.headers.get(PROFILE_HEADER)
+        if self.admin_token and token == self.admin_token:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, request, call_next):
+        if not self.should_profile(request):
+            return await call_next(request)
+
+        loop = asyncio.get_running_loop()
+        if self.sampler is None or self.sampler.loop is not loop:
+            # A new event loop (only ever the case in tests): sample that one
+            if self.sampler is not None:
+                self.sampler.stop()
+            self.sampler = StackSampler(loop, threading.get_ident(), self.interval)
+            self.sampler.start()
+
+        profile = RequestProfile(request.method, request.url.path)
+        profile.sample_interval = self.interval
+        token = _active_profile.set(profile)
+        self.sampler.attach(asyncio.current_task(), profile)
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            profile.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+            self.sampler.detach(profile)
+            _active_profile.reset(token)
+
+        profile.status_code = response.status_code
+        response.headers["X-Profile-Id"] = profile.id
+        await asyncio.to_thread(self.store.save, profile)
+        return response
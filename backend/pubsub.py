@@ -0,0 +1,127 @@
+"""In-process publish/subscribe hub for the real-time event stream.
+
+Topics are plain strings (``user:<id>``, ``group:<id>``). Publishing encodes
+the event once as a server-sent-events frame and hands the same string to
+every subscriber of the topic, so fan-out cost is one queue append per
+subscriber.
+
+Every subscription has a bounded queue. A slow consumer never blocks the
+publisher or other subscribers: when its queue is full the oldest frame is
+dropped and the subscriber is sent a ``resync`` event before the next frame,
+telling the client to refetch instead of trusting its incremental state.
+
+EventSource cannot send an Authorization header, so browsers connect with a
+``StreamTickets`` ticket in the query string instead of their JWT: tickets
+are random, single-use and expire after a few seconds, so one that ends up
+in an access log is worthless.
+"""
+
+import asyncio
+import json
+import secrets
+import time
+from collections import OrderedDict
+
+
+def encode_event(event_type: str, data: dict) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+RESYNC_FRAME = encode_event("resync", {"reason": "events dropped"})
+
+
+class Subscription:
+    def __init__(self, topics, maxsize: int):
+        self.topics = tuple(topics)
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self._lagged = False
+
+    def deliver(self, frame: str):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self._lagged = True
+        self.queue.put_nowait(frame)
+
+    async def next_frame(self) -> str:
+        if self._lagged:
+            self._lagged = False
+            return RESYNC_FRAME
+        return await self.queue.get()
+
+
+class PubSubHub:
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.topics = {}  # topic -> set of subscriptions
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, topics) -> Subscription:
+        subscription = Subscription(topics, self.queue_size)
+        for topic in subscription.topics:
+            self.topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def resubscribe(self, subscription: Subscription, topics):
+        """Move ``subscription`` to ``topics`` without losing queued frames."""
+        self.unsubscribe(subscription)
+        subscription.topics = tuple(topics)
+        for topic in subscription.topics:
+            self.topics.setdefault(topic, set()).add(subscription)
+
+    def unsubscribe(self, subscription: Subscription):
+        for topic in subscription.topics:
+            subscribers = self.topics.get(topic)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.topics[topic]
+
+    def publish(self, topic: str, event_type: str, data: dict) -> int:
+        subscribers = self.topics.get(topic)
+        self.published += 1
+        if not subscribers:
+            return 0
+        frame = encode_event(event_type, data)
+        for subscription in subscribers:
+            subscription.deliver(frame)
+        self.delivered += len(subscribers)
+        return len(subscribers)
+
+    def stats(self) -> dict:
+        subscriptions = {sub for subs in self.topics.values() for sub in subs}
+        return {
+            "topics": len(self.topics),
+            "subscriptions": len(subscriptions),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": sum(sub.dropped for sub in subscriptions),
+        }
+
+
+class StreamTickets:
+    """Short-lived, single-use tickets that authenticate one stream connect."""
+
+    def __init__(self, ttl: float = 30.0, max_tickets: int = 10000):
+        self.ttl = ttl
+        self.max_tickets = max_tickets
+        self.tickets = OrderedDict()  # ticket -> (user_id, expiry)
+
+    def issue(self, user_id: str) -> str:
+        now = time.monotonic()
+        while self.tickets:
+            oldest = next(iter(self.tickets))
+            if self.tickets[oldest][1] > now and len(self.tickets) < self.max_tickets:
+                break
+            del self.tickets[oldest]
+        ticket = secrets.token_urlsafe(32)
+        self.tickets[ticket] = (user_id, now + self.ttl)
+        return ticket
+
+    def redeem(self, ticket: str):
+        """The ticket's user_id, or None if it is unknown, used or expired."""
+        user_id, expires = self.tickets.pop(ticket, (None, 0.0))
+        return user_id if expires > time.monotonic() else None
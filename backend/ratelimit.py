@@ -0,0 +1,192 @@
+"""In-process rate limiting and load shedding for the Student Expense Manager API.
+
+Each request is charged against a token bucket keyed by (rule, client), where
+the client is the JWT ``user_id`` when the request carries a valid token and
+the client IP otherwise (always the IP for ``/api/auth/*``). Buckets that have
+been idle long enough to refill completely are indistinguishable from new
+ones, so they are evicted by a periodic sweep; a hard cap on the number of
+buckets bounds memory if many clients are active at once.
+
+Behind a reverse proxy (the Heroku router, a load balancer) the connecting
+address is the proxy's, so every anonymous client would share one bucket.
+With ``TRUSTED_PROXY_HOPS=n`` the client IP is instead the ``n``-th address
+from the right of ``X-Forwarded-For``: each trusted proxy appends the peer
+it received the request from, and anything further left was written by the
+client and cannot be trusted.
+
+Independently of the buckets, requests beyond ``max_in_flight`` concurrent
+requests are shed with 503 so that queueing delay (and p99 latency) stays
+bounded under overload.
+"""
+
+import math
+import os
+import time
+from collections import OrderedDict
+
+from starlette.responses import JSONResponse
+
+
+class RateRule:
+    def __init__(self, name: str, prefix: str, rate: float, burst: float, by_ip=False):
+        self.name = name
+        self.prefix = prefix
+        self.rate = rate  # tokens per second
+        self.burst = burst  # bucket capacity
+        self.by_ip = by_ip
+
+    @classmethod
+    def from_env(cls, name, prefix, default, by_ip=False):
+        """Read a "<rate>/<burst>" setting such as ``RATE_LIMIT_CHAT=0.1/5``."""
+        rate, burst = os.environ.get(f"RATE_LIMIT_{name.upper()}", default).split("/")
+        return cls(name, prefix, float(rate), float(burst), by_ip=by_ip)
+
+    @property
+    def idle_seconds(self) -> float:
+        """Time after which an unused bucket is full again."""
+        return self.burst / self.rate
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+
+
+class RateLimiter:
+    """HTTP middleware applying per-client token buckets and load shedding."""
+
+    def __init__(
+        self,
+        rules,
+        default_rule: RateRule,
+        identify,
+        max_in_flight: int = 256,
+        max_buckets: int = 100_000,
+        sweep_interval: float = 30.0,
+        trusted_proxy_hops: int = 0,
+    ):
+        self.rules = rules
+        self.default_rule = default_rule
+        self.identify = identify  # request -> user_id or None
+        self.max_in_flight = max_in_flight
+        self.max_buckets = max_buckets
+        self.sweep_interval = sweep_interval
+        self.trusted_proxy_hops = trusted_proxy_hops
+        self.buckets = OrderedDict()
+        self.in_flight = 0
+        self.rejected = 0
+        self.shed = 0
+        self._last_sweep = time.monotonic()
+
+    @classmethod
+    def from_env(cls, identify):
+        rules = [
+            RateRule.from_env("auth", "/api/auth/", "0.5/10", by_ip=True),
+            RateRule.from_env("chat", "/api/chat", "0.1/5"),
+        ]
+        return cls(
+            rules,
+            RateRule.from_env("default", "/", "20/60"),
+            identify,
+            max_in_flight=int(os.environ.get("MAX_IN_FLIGHT", "256")),
+            max_buckets=int(os.environ.get("RATE_LIMIT_MAX_BUCKETS", "100000")),
+            trusted_proxy_hops=int(os.environ.get("TRUSTED_PROXY_HOPS", "0")),
+        )
+
+    def rule_for(self, path: str) -> RateRule:
+        for rule in self.rules:
+            if path.startswith(rule.prefix):
+                return rule
+        return self.default_rule
+
+    def client_ip(self, request) -> str:
+        if self.trusted_proxy_hops:
+            forwarded = [
+                hop.strip()
+                for value in request.headers.getlist("x-forwarded-for")
+                for hop in value.split(",")
+                if hop.strip()
+            ]
+            if forwarded:
+                return forwarded[-min(self.trusted_proxy_hops, len(forwarded))]
+        return request.client.host if request.client else "unknown"
+
+    def client_key(self, request, rule: RateRule) -> str:
+        if not rule.by_ip:
+            user_id = self.identify(request)
+            if user_id:
+                return f"user:{user_id}"
+        return f"ip:{self.client_ip(request)}"
+
+    def acquire(self, key, rule: RateRule, now: float) -> float:
+        """Take one token; return 0 on success or the seconds until one is available."""
+        bucket_key = (rule.name, key)
+        bucket = self.buckets.get(bucket_key)
+        if bucket is None:
+            bucket = TokenBucket(rule.burst, now)
+            self.buckets[bucket_key] = bucket
+        else:
+            bucket.tokens = min(
+                rule.burst, bucket.tokens + (now - bucket.updated) * rule.rate
+            )
+            bucket.updated = now
+            self.buckets.move_to_end(bucket_key)
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / rule.rate
+
+    def sweep(self, now: float):
+        """Evict buckets that have refilled completely, oldest first."""
+        rules = {rule.name: rule for rule in self.rules + [self.default_rule]}
+        while self.buckets:
+            (rule_name, _), bucket = next(iter(self.buckets.items()))
+            idle = now - bucket.updated
+            if idle < rules[rule_name].idle_seconds and len(self.buckets) <= self.max_buckets:
+                break
+            self.buckets.popitem(last=False)
+        self._last_sweep = now
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "buckets": len(self.buckets),
+            "rejected": self.rejected,
+            "shed": self.shed,
+        }
+
+    async def __call__(self, request, call_next):
+        if request.method == "OPTIONS":
+            return await call_next(request)
+
+        if self.in_flight >= self.max_in_flight:
+            self.shed += 1
+            return JSONResponse(
+                {"detail": "Server is overloaded, please retry"},
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval or len(self.buckets) > self.max_buckets:
+            self.sweep(now)
+
+        rule = self.rule_for(request.url.path)
+        wait = self.acquire(self.client_key(request, rule), rule, now)
+        if wait:
+            self.rejected += 1
+            return JSONResponse(
+                {"detail": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+        self.in_flight += 1
+        try:
+            return await call_next(request)
+        finally:
+            self.in_flight -= 1
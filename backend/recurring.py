@@ -0,0 +1,119 @@
+"""Recurring expense schedules.
+
+A recurring expense (rent, a subscription, mess fees) is stored once as a
+template with an interval, a start and an optional end. Its occurrences are
+numbered 0, 1, 2...; occurrence ``n`` has a deterministic expense id
+(``occurrence_id``), so writing it twice, from two concurrent readers or
+two processes, can only ever produce one row.
+
+Nothing runs on a schedule. ``next_index``/``next_date`` on the template mark
+the first occurrence not yet written to ``expenses``; reads that list
+expenses write the due ones first, and aggregates add the due-but-unwritten
+ones arithmetically with ``pending_totals`` instead of writing them.
+
+These helpers are pure; the storage side lives in ``server.py``.
+"""
+
+import calendar
+import uuid
+from datetime import datetime, timedelta, timezone
+
+INTERVALS = ("daily", "weekly", "monthly", "yearly")
+# Upper bound on occurrences written by one read (a daily template that was
+# last read years ago catches up over several reads)
+MAX_OCCURRENCES_PER_READ = 400
+
+_NAMESPACE = uuid.UUID("5b0a3f9e-8c1d-4e52-9a57-2f4c1b6d7e80")
+
+
+def _parse(value) -> datetime:
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value
+
+
+def as_utc(value: datetime) -> datetime:
+    """Schedules are stored in UTC so their ISO dates compare as strings."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _add_months(start: datetime, months: int) -> datetime:
+    index = start.year * 12 + start.month - 1 + months
+    year, month = divmod(index, 12)
+    # The 31st recurs on the last day of shorter months
+    day = min(start.day, calendar.monthrange(year, month + 1)[1])
+    return start.replace(year=year, month=month + 1, day=day)
+
+
+def occurrence_date(template: dict, n: int) -> datetime:
+    start = _parse(template["start_date"])
+    step = n * template.get("every", 1)
+    interval = template["interval"]
+    if interval == "daily":
+        return start + timedelta(days=step)
+    if interval == "weekly":
+        return start + timedelta(weeks=step)
+    if interval == "monthly":
+        return _add_months(start, step)
+    return _add_months(start, 12 * step)
+
+
+def occurrence_id(template_id: str, n: int) -> str:
+    return str(uuid.uuid5(_NAMESPACE, f"{template_id}:{n}"))
+
+
+def next_date(template: dict, n: int):
+    """ISO date of occurrence ``n``, or None once the schedule has ended."""
+    date = occurrence_date(template, n)
+    end = template.get("end_date")
+    if end is not None and date > _parse(end):
+        return None
+    return date.isoformat()
+
+
+def due(template: dict, through: datetime, limit: int = MAX_OCCURRENCES_PER_READ):
+    """``(n, date)`` of the unwritten occurrences dated on or before ``through``."""
+    n = template.get("next_index", 0)
+    occurrences = []
+    while len(occurrences) < limit:
+        date = next_date(template, n)
+        if date is None or _parse(date) > through:
+            break
+        occurrences.append((n, date))
+        n += 1
+    return occurrences
+
+
+def occurrence(template: dict, n: int, date: str) -> dict:
+    """The stored expense document for occurrence ``n``."""
+    return {
+        "id": occurrence_id(template["id"], n),
+        "user_id": template["user_id"],
+        "amount_minor": template["amount_minor"],
+        "category": template["category"],
+        "date": date,
+        "notes": template.get("notes"),
+        "created_at": date,
+        "recurring_id": template["id"],
+    }
+
+
+def pending_totals(templates, start, end: datetime) -> dict:
+    """``{category: {"total", "count"}}`` of the unwritten occurrences dated
+    in ``[start, end)`` (``start`` None = since the first one), in minor
+    units, without expanding the schedule further than ``end``."""
+    totals = {}
+    for template in templates:
+        n = template.get("next_index", 0)
+        while True:
+            date = next_date(template, n)
+            if date is None or _parse(date) >= end:
+                break
+            if start is None or _parse(date) >= start:
+                total = totals.setdefault(template["category"], {"total": 0, "count": 0})
+                total["total"] += template["amount_minor"]
+                total["count"] += 1
+            n += 1
+    return totals
@@ -0,0 +1,96 @@
+"""Pure report computations run by the background job runner.
+
+These functions take plain stored expense documents and return
+JSON-serializable results. They must stay free of I/O and module state so
+they can run in a worker process (see ``JobRunner.run_cpu``). Totals are
+accumulated in exact integer minor units and converted on output.
+"""
+
+import csv
+import io
+
+from money import from_minor
+
+EXPORT_FIELDS = ("id", "date", "category", "amount", "notes", "created_at")
+
+
+def _month_of(date_value) -> int:
+    # Stored dates are ISO strings: YYYY-MM-...
+    return int(str(date_value)[5:7])
+
+
+def yearly_summary(expenses, year: int) -> dict:
+    months = {month: {"total": 0, "count": 0, "categories": {}} for month in range(1, 13)}
+    categories = {}
+    total = 0
+    for expense in expenses:
+        if not str(expense["date"]).startswith(f"{year:04d}-"):
+            continue
+        amount = expense["amount_minor"]
+        month = months[_month_of(expense["date"])]
+        month["total"] += amount
+        month["count"] += 1
+        month["categories"][expense["category"]] = (
+            month["categories"].get(expense["category"], 0) + amount
+        )
+        categories[expense["category"]] = categories.get(expense["category"], 0) + amount
+        total += amount
+
+    busiest = max(months, key=lambda m: months[m]["total"]) if total else None
+    return {
+        "year": year,
+        "total_expenses": from_minor(total),
+        "expense_count": sum(month["count"] for month in months.values()),
+        "category_breakdown": _to_major(categories),
+        "months": {
+            str(month): {
+                "total": from_minor(data["total"]),
+                "count": data["count"],
+                "categories": _to_major(data["categories"]),
+            }
+            for month, data in months.items()
+        },
+        "highest_spending_month": busiest,
+    }
+
+
+def _to_major(totals: dict) -> dict:
+    return {key: from_minor(value) for key, value in totals.items()}
+
+
+def monthly_summary(expenses, year: int, month: int) -> dict:
+    prefix = f"{year:04d}-{month:02d}-"
+    selected = [e for e in expenses if str(e["date"]).startswith(prefix)]
+    categories = {}
+    for expense in selected:
+        categories[expense["category"]] = (
+            categories.get(expense["category"], 0) + expense["amount_minor"]
+        )
+    largest = sorted(selected, key=lambda e: e["amount_minor"], reverse=True)[:5]
+    return {
+        "year": year,
+        "month": month,
+        "total_expenses": from_minor(sum(e["amount_minor"] for e in selected)),
+        "expense_count": len(selected),
+        "category_breakdown": _to_major(categories),
+        "largest_expenses": [
+            {
+                "date": e["date"],
+                "category": e["category"],
+                "amount": from_minor(e["amount_minor"]),
+                "notes": e.get("notes"),
+            }
+            for e in largest
+        ],
+    }
+
+
+def expenses_csv(expenses) -> str:
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for expense in sorted(expenses, key=lambda e: str(e["date"])):
+        row = {field: expense.get(field) for field in EXPORT_FIELDS}
+        row["amount"] = f"{from_minor(expense['amount_minor']):.2f}"
+        writer.writerow(row)
+    return output.getvalue()
@@ -1,8 +1,29 @@
+import os
+import sys
+
 import uvicorn
-from server import app
 
 if __name__ == "__main__":
+    # Production mode (APP_ENV=production or --production): bind to $PORT on
+    # all interfaces and run without the reloader, which doubles start-up
+    # work and watches the file system for changes.
+    production = (
+        os.environ.get("APP_ENV") == "production" or "--production" in sys.argv
+    )
+    host = "0.0.0.0" if production else "127.0.0.1"
+    port = int(os.environ.get("PORT", "8000"))
+
     print("Starting Student Expense Manager Backend...")
-    print("Backend will be available at: http://localhost:8000")
-    print("API documentation at: http://localhost:8000/docs")
-    uvicorn.run(app, host="127.0.0.1", port=8000, reload=True)
+    print(f"Backend will be available at: http://localhost:{port}")
+    print(f"API documentation at: http://localhost:{port}/docs")
+    # The app is passed as an import string so uvicorn can re-import it in
+    # the reloader's worker process.
+    uvicorn.run(
+        "server:app",
+        host=host,
+        port=port,
+        reload=not production,
+        workers=1,
+        # Requests are logged once, by the app (app.access in logconfig.py)
+        access_log=False,
+    )
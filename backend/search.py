@@ -0,0 +1,165 @@
+"""Per-user full-text search over expense notes and categories.
+
+Each active user gets an in-memory inverted index (term -> expense ids) plus
+a trigram index over the user's vocabulary (trigram -> terms). A query term
+matches indexed terms that share enough trigrams with it, which tolerates
+typos ("cofee" finds "coffee") and also accepts prefixes ("groc" finds
+"groceries"). Lookups touch only the postings of matching terms, so latency
+depends on the number of matches rather than on the size of the history.
+
+Indexes are built lazily from storage on a user's first search and are kept
+current by the expense write routes. The number of resident indexes is
+bounded; the least recently used one is dropped and rebuilt on demand.
+"""
+
+import heapq
+import re
+from collections import Counter, OrderedDict
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Minimum trigram Jaccard similarity for a fuzzy term match
+FUZZY_THRESHOLD = 0.35
+# Category matches rank above matches in free-text notes
+FIELD_WEIGHTS = {"category": 2.0, "notes": 1.0}
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def trigrams(term: str):
+    padded = f"  {term} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _date_key(value):
+    # Stored dates are ISO strings, but may already have been parsed in memory
+    return value.isoformat() if hasattr(value, "isoformat") else str(value or "")
+
+
+class UserSearchIndex:
+    def __init__(self):
+        self.postings = {}  # term -> {expense_id: weight}
+        self.trigram_terms = {}  # trigram -> set of terms
+        self.documents = {}  # expense_id -> (terms, date key)
+
+    def add(self, expense: dict):
+        self.remove(expense["id"])
+        weights = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(expense.get(field)):
+                weights[term] += weight
+
+        for term, weight in weights.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                for gram in trigrams(term):
+                    self.trigram_terms.setdefault(gram, set()).add(term)
+            postings[expense["id"]] = weight
+        self.documents[expense["id"]] = (tuple(weights), _date_key(expense.get("date")))
+
+    def remove(self, expense_id: str):
+        document = self.documents.pop(expense_id, None)
+        if document is None:
+            return
+        for term in document[0]:
+            postings = self.postings[term]
+            postings.pop(expense_id, None)
+            if not postings:
+                del self.postings[term]
+                for gram in trigrams(term):
+                    terms = self.trigram_terms[gram]
+                    terms.discard(term)
+                    if not terms:
+                        del self.trigram_terms[gram]
+
+    def matching_terms(self, query_term: str):
+        """Yield (term, similarity) for indexed terms close to ``query_term``."""
+        if query_term in self.postings:
+            yield query_term, 1.0
+        query_grams = trigrams(query_term)
+        shared = Counter()
+        for gram in query_grams:
+            for term in self.trigram_terms.get(gram, ()):
+                shared[term] += 1
+        for term, common in shared.items():
+            if term == query_term:
+                continue
+            similarity = common / (len(query_grams) + len(trigrams(term)) - common)
+            if term.startswith(query_term):
+                similarity = max(similarity, 0.9)
+            if similarity >= FUZZY_THRESHOLD:
+                yield term, similarity
+
+    def search(self, query: str, limit: int, offset: int = 0):
+        """Return (total matches, expense ids for the requested page)."""
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        matched = Counter()  # expense_id -> number of query terms matched
+        scores = Counter()
+        for query_term in query_terms:
+            best = {}
+            for term, similarity in self.matching_terms(query_term):
+                for expense_id, weight in self.postings[term].items():
+                    score = weight * similarity
+                    if score > best.get(expense_id, 0):
+                        best[expense_id] = score
+            for expense_id, score in best.items():
+                matched[expense_id] += 1
+                scores[expense_id] += score
+
+        # Stable ranking: query terms matched, score, newest first, then id
+        def rank(expense_id):
+            date_key = self.documents[expense_id][1]
+            return (-matched[expense_id], -scores[expense_id], _Reversed(date_key), expense_id)
+
+        page = heapq.nsmallest(offset + limit, scores, key=rank)[offset:]
+        return len(scores), page
+
+
+class _Reversed:
+    """Sort wrapper that inverts the ordering of a string (newest date first)."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class SearchIndexes:
+    """LRU-bounded registry of per-user search indexes."""
+
+    def __init__(self, max_users: int = 1000):
+        self.max_users = max_users
+        self.indexes = OrderedDict()
+
+    def get(self, user_id: str):
+        index = self.indexes.get(user_id)
+        if index is not None:
+            self.indexes.move_to_end(user_id)
+        return index
+
+    def build(self, user_id: str, expenses):
+        index = UserSearchIndex()
+        for expense in expenses:
+            index.add(expense)
+        self.indexes[user_id] = index
+        while len(self.indexes) > self.max_users:
+            self.indexes.popitem(last=False)
+        return index
+
+    def update(self, user_id: str, old=None, new=None):
+        """Apply an expense write to the user's index, if it is resident."""
+        index = self.indexes.get(user_id)
+        if index is None:
+            return
+        if new:
+            index.add(new)
+        elif old:
+            index.remove(old["id"])
@@ -1,96 +1,334 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import (
+    FastAPI,
+    APIRouter,
+    HTTPException,
+    Depends,
+    Header,
+    Query,
+    Request,
+    Response,
+)
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import asynccontextmanager
+import asyncio
+import importlib.util
+import math
 import os
+import re
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, EmailStr, ValidationError
+from typing import Annotated, List, Optional
 import uuid
-from datetime import datetime, timezone
+import weakref
+from datetime import datetime, timedelta, timezone
 import hashlib
+import time
 import jwt
 
-# AI Chat imports (optional)
-try:
-    import google.generativeai as genai
-
-    AI_AVAILABLE = True
-except ImportError:
-    AI_AVAILABLE = False
-    print("AI chat features disabled - google-generativeai not available")
+from profiling import RequestProfiler, track_db_call
+from ratelimit import RateLimiter
+import archive
+import insights
+from money import MINOR_SUFFIX, MONEY_FIELDS, from_minor, split_evenly, to_minor
+from search import SearchIndexes
+from pubsub import PubSubHub, StreamTickets
+from jobs import JobRunner, QueueFullError
+from coalesce import InsertCoalescer
+from memory_store import MemoryCollection, apply_update, project
+from spill import PartitionSpiller
+from idempotency import IdempotencyCache
+from workingset import WorkingSetCache, copy_doc
+import logconfig
+import tracing
+import recurring
+import reports
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / ".env")
 
+# Structured JSON logs written off the request path (see logconfig.py)
+logconfig.setup_logging()
+logger = logging.getLogger(__name__)
+
+# AI Chat (optional). google.generativeai is slow to import, so it is only
+# imported on the first /chat request (see get_genai).
+AI_AVAILABLE = importlib.util.find_spec("google.generativeai") is not None
+if not AI_AVAILABLE:
+    logger.warning("AI chat features disabled - google-generativeai not available")
+_genai = None
+
 # MongoDB connection
 mongo_url = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
 db_name = os.environ.get("DB_NAME", "student_expense_manager")
 
-# Initialize database connection
-try:
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[db_name]
-    print(f"Connected to MongoDB: {db_name}")
-except Exception as e:
-    print(f"Failed to connect to MongoDB: {e}")
-    print("Running without database - some features may not work")
+# "memory" keeps everything in demo_storage; "mongo" connects to MONGO_URL.
+# The connection itself is opened in the lifespan hook, not at import time.
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "memory")
 db = None
 client = None
 
-# In-memory storage for fallback (when database is not available)
+# In-memory storage for fallback (when database is not available), indexed
+# on the fields routes filter by (see memory_store.py)
 demo_storage = {
-    "users": [],
-    "expenses": [],
-    "budgets": [],
-    "savings_goals": [],
-    "groups": [],
-    "group_expenses": [],
+    "users": MemoryCollection(("id", "email")),
+    "expenses": MemoryCollection(("id", "user_id")),
+    "budgets": MemoryCollection(("id", "user_id")),
+    "savings_goals": MemoryCollection(("id", "user_id")),
+    "groups": MemoryCollection(("id",)),
+    "group_expenses": MemoryCollection(("id", "group_id")),
+    "expense_tombstones": MemoryCollection(("user_id",)),
+    "change_sequences": MemoryCollection(("user_id",)),
+    "category_stats": MemoryCollection(("user_id",)),
+    "spending_flags": MemoryCollection(("user_id",)),
+    "report_jobs": MemoryCollection(("id", "user_id")),
+    "expense_archives": MemoryCollection(("user_id",)),
+    "expense_rollups": MemoryCollection(("user_id",)),
+    "recurring_expenses": MemoryCollection(("id", "user_id")),
 }
 
+# Memory budget for the in-memory backend (see spill.py): idle users'
+# documents in the per-user collections are spilled to disk and faulted back
+# in by the db_* helpers through memory_collection().
+memory_spiller = PartitionSpiller.from_env(
+    demo_storage,
+    (
+        "expenses",
+        "budgets",
+        "savings_goals",
+        "recurring_expenses",
+        "expense_tombstones",
+        "change_sequences",
+        "category_stats",
+        "spending_flags",
+        "expense_archives",
+        "expense_rollups",
+    ),
+)
+
 
-# Helper functions for database operations
-async def db_find_one(collection, query):
-    if db:
-        return await db[collection].find_one(query)
-    else:
-        items = demo_storage[collection]
-        for item in items:
-            if all(item.get(k) == v for k, v in query.items()):
-                return item
+async def memory_collection(collection, query=None):
+    """``demo_storage[collection]`` with the partitions ``query`` can touch resident."""
+    await memory_spiller.fault_in(collection, query)
+    return demo_storage[collection]
+
+
+# Read routing (MongoDB only). Reads tagged read="secondary" may be served by
+# replica-set secondaries that lag by at most READ_MAX_STALENESS_SECONDS;
+# auth, mutations and read-before-write lookups stay on the primary.
+SECONDARY_READS = os.environ.get("SECONDARY_READS", "true").lower() == "true"
+# MongoDB rejects a maxStalenessSeconds below 90
+READ_MAX_STALENESS_SECONDS = max(
+    90, int(os.environ.get("READ_MAX_STALENESS_SECONDS", "90"))
+)
+READ_CONCERN_LEVEL = os.environ.get("READ_CONCERN", "local")
+_secondary_read_options = None
+
+
+def _read_collection(collection, read=None):
+    global _secondary_read_options
+    if read != "secondary" or not SECONDARY_READS:
+        return db[collection]
+    if _secondary_read_options is None:
+        from pymongo.read_concern import ReadConcern
+        from pymongo.read_preferences import SecondaryPreferred
+
+        _secondary_read_options = {
+            "read_preference": SecondaryPreferred(
+                max_staleness=READ_MAX_STALENESS_SECONDS
+            ),
+            "read_concern": ReadConcern(READ_CONCERN_LEVEL),
+        }
+    return db[collection].with_options(**_secondary_read_options)
+
+
+# Scopes ("user:<id>", "group:<id>") written within the staleness bound keep
+# reading from the primary, so clients always see their own writes.
+_recent_writes = {}
+
+
+def note_write(scope: str):
+    now = time.monotonic()
+    _recent_writes[scope] = now
+    if len(_recent_writes) > 10000:
+        for key, written in list(_recent_writes.items()):
+            if now - written >= READ_MAX_STALENESS_SECONDS:
+                del _recent_writes[key]
+
+
+def read_preference(scope: str) -> str:
+    written = _recent_writes.get(scope)
+    if written is not None and time.monotonic() - written < READ_MAX_STALENESS_SECONDS:
+        return "primary"
+    return "secondary"
+
+
+def _mongo_projection(projection):
+    return {"_id": 0, **{field: 1 for field in projection}} if projection else None
+
+
+# Hot users' and groups' documents are served from memory in MongoDB mode and
+# kept current by the write helpers below (see workingset.py)
+working_sets = WorkingSetCache(
+    {
+        "expenses": "user_id",
+        "budgets": "user_id",
+        "savings_goals": "user_id",
+        "recurring_expenses": "user_id",
+        "group_expenses": "group_id",
+        "groups": "id",
+    },
+    int(float(os.environ.get("WORKING_SET_CACHE_MB", "64")) * 1024 * 1024),
+    ttl=float(os.environ.get("WORKING_SET_TTL_SECONDS", "30")),
+    max_docs=int(os.environ.get("WORKING_SET_MAX_DOCS", "1000")),
+)
+
+
+async def _working_set(collection, query):
+    """The cached partition ``query`` is confined to, loaded on a miss."""
+    key = working_sets.partition(collection, query)
+    if key is None or working_sets.is_oversized(key):
         return None
+    docs = working_sets.get(key)
+    if docs is None:
+        field = working_sets.partitions[collection]
+        working_sets.begin_load(key)
+        loaded = None
+        try:
+            loaded = await db[collection].find({field: key[1]}).to_list(
+                working_sets.max_docs + 1
+            )
+        finally:
+            docs = working_sets.end_load(key, loaded)
+    return docs
+
+
+# Helper functions for database operations. ``projection`` is a list of the
+# fields a caller needs; only those are returned by either backend.
+@track_db_call
+async def db_find_one(collection, query, read=None, projection=None):
+    if db is not None:
+        cached = await _working_set(collection, query)
+        if cached is not None:
+            item = cached.find_one(query)
+            if item is not None and projection:
+                item = project(item, projection)
+            return copy_doc(item)
+        return await _read_collection(collection, read).find_one(
+            query, _mongo_projection(projection)
+        )
+    else:
+        items = await memory_collection(collection, query)
+        item = items.find_one(query)
+        if item is not None and projection:
+            return project(item, projection)
+        return item
 
 
-async def db_find(collection, query=None, sort=None, limit=None):
-    if db:
-        cursor = db[collection].find(query or {})
+@track_db_call
+async def db_find(
+    collection, query=None, sort=None, limit=None, read=None, projection=None
+):
+    if db is not None:
+        cached = await _working_set(collection, query)
+        if cached is not None:
+            items = cached.find(query, sort, limit or 1000, projection)
+            return [copy_doc(item) for item in items]
+        cursor = _read_collection(collection, read).find(
+            query or {}, _mongo_projection(projection)
+        )
         if sort:
             cursor = cursor.sort(sort[0], sort[1])
         if limit:
             cursor = cursor.limit(limit)
-        return await cursor.to_list(1000)
+        return await cursor.to_list(limit or 1000)
     else:
-        items = demo_storage[collection]
-        if query:
-            filtered = []
-            for item in items:
-                if all(item.get(k) == v for k, v in query.items()):
-                    filtered.append(item)
-            items = filtered
+        items = await memory_collection(collection, query)
+        return items.find(query, sort, limit, projection)
+
+
+@track_db_call
+async def db_find_all(collection, query=None, sort=None, read=None, projection=None):
+    """Every document matching ``query``: unlike ``db_find``, which returns at
+    most 1000 rows unless given a limit, the result is never capped."""
+    if db is not None:
+        cached = await _working_set(collection, query)
+        if cached is not None:
+            items = cached.find(query, sort, None, projection)
+            return [copy_doc(item) for item in items]
+        cursor = _read_collection(collection, read).find(
+            query or {}, _mongo_projection(projection)
+        )
         if sort:
-            items.sort(key=lambda x: x.get(sort[0], 0), reverse=(sort[1] == -1))
-        if limit:
-            items = items[:limit]
-        return items
+            cursor = cursor.sort(sort[0], sort[1])
+        return await cursor.to_list(None)
+    else:
+        items = await memory_collection(collection, query)
+        return items.find(query, sort, None, projection)
+
+
+@track_db_call
+async def db_count(collection, query=None, limit=None, read=None):
+    """Number of documents matching ``query`` (at most ``limit``)."""
+    if db is not None:
+        cached = await _working_set(collection, query)
+        if cached is not None:
+            return cached.count(query, limit)
+        options = {"limit": limit} if limit else {}
+        return await _read_collection(collection, read).count_documents(
+            query or {}, **options
+        )
+    else:
+        items = await memory_collection(collection, query)
+        return items.count(query, limit)
+
+
+@track_db_call
+async def db_group_sum(collection, query, group_by=None, sum_field=None, read=None):
+    """Group documents matching ``query`` by ``group_by`` (None for a single
+    group) and return ``{group key: {"total": sum of sum_field, "count": n}}``.
+
+    MongoDB evaluates this as a $match/$group pipeline, so only the totals
+    leave the database.
+    """
+    if db is not None:
+        cached = await _working_set(collection, query)
+        if cached is not None:
+            return cached.group_sum(query, group_by, sum_field)
+        pipeline = [
+            {"$match": query},
+            {
+                "$group": {
+                    "_id": f"${group_by}" if group_by else None,
+                    "total": {"$sum": f"${sum_field}" if sum_field else 0},
+                    "count": {"$sum": 1},
+                }
+            },
+        ]
+        cursor = _read_collection(collection, read).aggregate(pipeline)
+        return {
+            row["_id"]: {"total": row["total"], "count": row["count"]}
+            for row in await cursor.to_list(None)
+        }
+    else:
+        items = await memory_collection(collection, query)
+        return items.group_sum(query, group_by, sum_field)
 
 
+@track_db_call
 async def db_insert_one(collection, document):
-    if db:
-        return await db[collection].insert_one(document)
+    if db is not None:
+        result = await db[collection].insert_one(document)
+        working_sets.inserted(collection, document)
+        return result
     else:
-        demo_storage[collection].append(document)
+        items = await memory_collection(collection, document)
+        items.insert(document)
 
         # Create a mock result object
         class MockResult:
@@ -100,20 +338,60 @@ async def db_insert_one(collection, document):
         return MockResult(document.get("id", "demo_id"))
 
 
-async def db_update_one(collection, query, update):
-    if db:
-        return await db[collection].update_one(query, update)
+@track_db_call
+async def db_insert_many(collection, documents):
+    """Insert ``documents`` in one round trip.
+
+    Returns one exception-or-None per document: MongoDB inserts unordered,
+    so one failing document does not fail the others.
+    """
+    errors = [None] * len(documents)
+    if db is not None:
+        from pymongo.errors import BulkWriteError
+
+        try:
+            await db[collection].insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                errors[error["index"]] = RuntimeError(error.get("errmsg"))
+        for document, error in zip(documents, errors):
+            if error is None:
+                working_sets.inserted(collection, document)
+    else:
+        for document in documents:
+            items = await memory_collection(collection, document)
+            items.insert(document)
+    return errors
+
+
+@track_db_call
+async def db_update_one(collection, query, update, upsert=False):
+    """Update the first document matching ``query``; with ``upsert``, insert
+    one built from the equality conditions of ``query`` if none matches."""
+    if db is not None:
+        result = await db[collection].update_one(query, update, upsert=upsert)
+        if upsert:
+            working_sets.invalidate(collection, query)
+        else:
+            working_sets.updated(collection, query, update)
+        return result
     else:
-        items = demo_storage[collection]
-        for i, item in enumerate(items):
-            if all(item.get(k) == v for k, v in query.items()):
-                items[i].update(update["$set"])
+        items = await memory_collection(collection, query)
+        item = items.find_one(query)
+        if item is not None:
+            items.update(item, update)
 
-                class MockResult:
-                    def __init__(self, modified_count):
-                        self.modified_count = modified_count
+            class MockResult:
+                def __init__(self, modified_count):
+                    self.modified_count = modified_count
 
-                return MockResult(1)
+            return MockResult(1)
+
+        if upsert:
+            item = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            item.update(update.get("$setOnInsert", {}))
+            apply_update(item, update)
+            items.insert(item)
 
         class MockResult:
             def __init__(self, modified_count):
@@ -122,20 +400,23 @@ async def db_update_one(collection, query, update):
         return MockResult(0)
 
 
+@track_db_call
 async def db_delete_one(collection, query):
-    if db:
-        return await db[collection].delete_one(query)
+    if db is not None:
+        result = await db[collection].delete_one(query)
+        working_sets.deleted(collection, query)
+        return result
     else:
-        items = demo_storage[collection]
-        for i, item in enumerate(items):
-            if all(item.get(k) == v for k, v in query.items()):
-                del items[i]
+        items = await memory_collection(collection, query)
+        item = items.find_one(query)
+        if item is not None:
+            items.remove(item)
 
-                class MockResult:
-                    def __init__(self, deleted_count):
-                        self.deleted_count = deleted_count
+            class MockResult:
+                def __init__(self, deleted_count):
+                    self.deleted_count = deleted_count
 
-                return MockResult(1)
+            return MockResult(1)
 
         class MockResult:
             def __init__(self, deleted_count):
@@ -144,14 +425,270 @@ async def db_delete_one(collection, query):
         return MockResult(0)
 
 
+@track_db_call
+async def db_delete_many(collection, query):
+    if db is not None:
+        result = await db[collection].delete_many(query)
+        working_sets.deleted(collection, query, many=True)
+        return result
+    else:
+        items = await memory_collection(collection, query)
+        deleted = items.scan(query)
+        for item in deleted:
+            items.remove(item)
+        deleted_count = len(deleted)
+
+        class MockResult:
+            def __init__(self, deleted_count):
+                self.deleted_count = deleted_count
+
+        return MockResult(deleted_count)
+
+
+@track_db_call
+async def db_increment(collection, query, field, amount=1):
+    """Atomically increment ``field`` on the matching document (upserting it)
+    and return the updated document."""
+    if db is not None:
+        working_sets.invalidate(collection, query)
+        return await db[collection].find_one_and_update(
+            query,
+            {"$inc": {field: amount}},
+            upsert=True,
+            return_document=True,  # pymongo.ReturnDocument.AFTER
+        )
+    else:
+        items = await memory_collection(collection, query)
+        item = items.find_one(query)
+        if item is not None:
+            items.update(item, {"$set": {field: item.get(field, 0) + amount}})
+            return item
+        item = dict(query)
+        item[field] = amount
+        items.insert(item)
+        return item
+
+
+@track_db_call
+async def db_bulk_write(collection, operations, session=None):
+    """Apply ordered ("insert", doc), ("update", query, update) and
+    ("delete", query) operations as a single bulk write."""
+    if db is not None:
+        from pymongo import DeleteOne, InsertOne, UpdateOne
+
+        requests = []
+        for operation in operations:
+            if operation[0] == "insert":
+                requests.append(InsertOne(operation[1]))
+            elif operation[0] == "update":
+                requests.append(UpdateOne(operation[1], operation[2]))
+            else:
+                requests.append(DeleteOne(operation[1]))
+        result = await db[collection].bulk_write(
+            requests, ordered=True, session=session
+        )
+        for operation in operations:
+            if session is not None:
+                # The transaction may still abort, so drop rather than apply
+                if operation[0] == "insert":
+                    working_sets.forget(collection, operation[1])
+                else:
+                    working_sets.invalidate(collection, operation[1])
+            elif operation[0] == "insert":
+                working_sets.inserted(collection, operation[1])
+            elif operation[0] == "update":
+                working_sets.updated(collection, operation[1], operation[2])
+            else:
+                working_sets.deleted(collection, operation[1])
+        return result
+    else:
+        inserted = modified = deleted = 0
+        for operation in operations:
+            items = await memory_collection(collection, operation[1])
+            if operation[0] == "insert":
+                items.insert(operation[1])
+                inserted += 1
+                continue
+            item = items.find_one(operation[1])
+            if item is None:
+                continue
+            if operation[0] == "update":
+                items.update(item, operation[2])
+                modified += 1
+            else:
+                items.remove(item)
+                deleted += 1
+
+        class MockResult:
+            def __init__(self, inserted_count, modified_count, deleted_count):
+                self.inserted_count = inserted_count
+                self.modified_count = modified_count
+                self.deleted_count = deleted_count
+
+        return MockResult(inserted, modified, deleted)
+
+
+@track_db_call
+async def db_text_search(collection, query, text, skip=0, limit=20, read=None):
+    """Rank documents matching ``query`` by the collection's text index.
+
+    Returns (total matches, page of documents). Only available with MongoDB.
+    """
+    query = {**query, "$text": {"$search": text}}
+    score = {"score": {"$meta": "textScore"}}
+    total = await _read_collection(collection, read).count_documents(query)
+    cursor = (
+        _read_collection(collection, read)
+        .find(query, score)
+        .sort([("score", {"$meta": "textScore"}), ("date", -1), ("id", 1)])
+        .skip(skip)
+        .limit(limit)
+    )
+    return total, await cursor.to_list(limit)
+
+
+_transactions_supported = None
+
+
+async def db_supports_transactions():
+    """Multi-document transactions need a replica set or sharded cluster."""
+    global _transactions_supported
+    if db is None:
+        return False
+    if _transactions_supported is None:
+        hello = await db.command("hello")
+        _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return _transactions_supported
+
+
 # JWT Secret (in production, use a secure random secret)
 JWT_SECRET = os.environ.get("JWT_SECRET", "your-secret-key-change-in-production")
 
+# Admin token for operational endpoints (profiles); admin routes are disabled when unset
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
 # Security
 security = HTTPBearer()
 
+
+async def ensure_indexes():
+    await db.expenses.create_index([("user_id", 1), ("change_seq", 1)])
+    await db.expense_tombstones.create_index([("user_id", 1), ("change_seq", 1)])
+    await db.change_sequences.create_index("user_id", unique=True)
+    await db.expenses.create_index(
+        [("notes", "text"), ("category", "text")],
+        weights={"category": 2, "notes": 1},
+    )
+    await db.report_jobs.create_index("id", unique=True)
+    await db.report_jobs.create_index("finished_at")
+    await db.expense_archives.create_index([("user_id", 1), ("month", 1)], unique=True)
+    await db.expense_rollups.create_index([("user_id", 1), ("month", 1)])
+    # Recurring occurrences have deterministic ids; this makes writing one
+    # twice (from two processes) fail instead of duplicating it
+    await db.expenses.create_index("id", unique=True)
+    await db.recurring_expenses.create_index([("user_id", 1), ("next_date", 1)])
+    # One statistics document per category; concurrent first writes upsert
+    # into it (MongoDB retries the losing upsert on the duplicate key)
+    await db.category_stats.create_index(
+        [("user_id", 1), ("category", 1)], unique=True
+    )
+
+
+# Money fields per collection, stored as integer minor units since the
+# introduction of money.py; older documents are converted at startup.
+MONEY_COLLECTIONS = {
+    "expenses": ("amount",),
+    "budgets": ("amount",),
+    "savings_goals": ("target_amount", "current_amount"),
+    "group_expenses": ("amount",),
+}
+
+
+async def migrate_money_to_minor_units():
+    for collection, fields in MONEY_COLLECTIONS.items():
+        # Documents whose amounts cannot be converted (NaN, inf, garbage) are
+        # left as they are and logged, rather than aborting startup
+        skipped = []
+        while True:
+            legacy = await db_find(
+                collection, {fields[0]: {"$ne": None}, "id": {"$nin": skipped}}
+            )
+            if not legacy:
+                break
+            operations = []
+            for doc in legacy:
+                try:
+                    minor = {
+                        field + MINOR_SUFFIX: to_minor(doc.get(field) or 0)
+                        for field in fields
+                    }
+                except ValueError as e:
+                    logger.warning(
+                        "Skipping %s %s: %s",
+                        collection,
+                        doc["id"],
+                        e,
+                        extra={"collection": collection, "document_id": doc["id"]},
+                    )
+                    skipped.append(doc["id"])
+                    continue
+                operations.append(
+                    (
+                        "update",
+                        {"id": doc["id"]},
+                        {"$set": minor, "$unset": {field: "" for field in fields}},
+                    )
+                )
+            if operations:
+                await db_bulk_write(collection, operations)
+            logger.info(
+                "Converted %d %s to minor units",
+                len(operations),
+                collection,
+                extra={"collection": collection, "count": len(operations)},
+            )
+
+    for stats in await db_find("category_stats", {"units": {"$ne": "minor"}}):
+        await db_update_one(
+            "category_stats",
+            {"user_id": stats["user_id"], "category": stats["category"]},
+            {"$set": insights.stats_to_minor_units(stats)},
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db
+    if STORAGE_BACKEND == "mongo":
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(mongo_url)
+        db = client[db_name]
+        await ensure_indexes()
+        logger.info("Connected to MongoDB: %s", db_name)
+    else:
+        logger.warning("Running with in-memory storage - data is not persisted")
+
+    # Jobs left queued or running by a previous process will never finish
+    for job in await db_find("report_jobs", {"status": {"$in": ["queued", "running"]}}):
+        await update_report_job(
+            job["id"], {"status": "failed", "error": "Interrupted by server restart"}
+        )
+    await expire_report_jobs(force=True)
+    await migrate_money_to_minor_units()
+    await job_runner.start()
+    yield
+    await job_runner.stop()
+    if insert_coalescer:
+        await insert_coalescer.drain()
+    if client is not None:
+        client.close()
+        client = None
+        db = None
+
+
 # Create the main app without a prefix
-app = FastAPI(title="Student Expense Manager", version="1.0.0")
+app = FastAPI(title="Student Expense Manager", version="1.0.0", lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -159,6 +696,21 @@ api_router = APIRouter(prefix="/api")
 # AI Chat instance
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 
+# Opt-in request profiling (see profiling.py)
+profiler = RequestProfiler.from_env(ROOT_DIR)
+tracer = tracing.Tracer.from_env(ROOT_DIR)
+
+
+def get_genai():
+    """Import and configure google.generativeai on first use."""
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+
+        genai.configure(api_key=GEMINI_API_KEY)
+        _genai = genai
+    return _genai
+
 
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
@@ -179,8 +731,15 @@ def create_jwt_token(user_id: str) -> str:
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ):
+    with tracing.span("auth") as span:
+        user = await authenticate_token(credentials.credentials)
+        span.set_attribute("user.id", user.id)
+        return user
+
+
+async def authenticate_token(token: str) -> "User":
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=["HS256"])
+        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
         user_id = payload.get("user_id")
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
@@ -196,7 +755,48 @@ async def get_current_user(
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
+def token_user_id(request: Request) -> Optional[str]:
+    """Return the user_id of a valid bearer token without a storage lookup."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return None
+    return payload.get("user_id")
+
+
+# Per-user/per-route rate limiting and load shedding (see ratelimit.py)
+rate_limiter = RateLimiter.from_env(token_user_id)
+idempotency_cache = IdempotencyCache.from_env(token_user_id)
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+
 # Pydantic Models
+# Money fields reject NaN and infinity with a 422; to_minor cannot store them
+Money = Annotated[float, Field(allow_inf_nan=False)]
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    # The default handler echoes each input back, and a NaN or infinity input
+    # would make the 422 itself fail to serialize
+    errors = []
+    for error in exc.errors():
+        value = error.get("input")
+        if isinstance(value, float) and not math.isfinite(value):
+            error = {**error, "input": str(value)}
+        errors.append(error)
+    return JSONResponse(
+        status_code=422, content={"detail": jsonable_encoder(errors)}
+    )
+
+
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     email: EmailStr
@@ -226,26 +826,51 @@ class UserResponse(BaseModel):
 class Expense(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
-    amount: float
+    amount: Money
     category: str  # Food, Travel, Study Material, Personal, Other
     date: datetime
     notes: Optional[str] = None
+    recurring_id: Optional[str] = None  # Set on occurrences of a recurring expense
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
 class ExpenseCreate(BaseModel):
-    amount: float
+    amount: Money
     category: str
     date: datetime
     notes: Optional[str] = None
 
 
+class RecurringExpense(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    amount: Money
+    category: str
+    notes: Optional[str] = None
+    interval: str  # 'daily', 'weekly', 'monthly' or 'yearly'
+    every: int = 1  # e.g. interval='weekly', every=2 for fortnightly
+    start_date: datetime
+    end_date: Optional[datetime] = None
+    next_date: Optional[datetime] = None  # First occurrence not yet written
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class RecurringExpenseCreate(BaseModel):
+    amount: Money
+    category: str
+    notes: Optional[str] = None
+    interval: str
+    every: int = 1
+    start_date: datetime
+    end_date: Optional[datetime] = None
+
+
 class Budget(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     type: str  # 'monthly' or 'category'
     category: Optional[str] = None  # Required if type is 'category'
-    amount: float
+    amount: Money
     month: int  # 1-12
     year: int
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -254,7 +879,7 @@ class Budget(BaseModel):
 class BudgetCreate(BaseModel):
     type: str
     category: Optional[str] = None
-    amount: float
+    amount: Money
     month: int
     year: int
 
@@ -263,15 +888,15 @@ class SavingsGoal(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     title: str
-    target_amount: float
-    current_amount: float = 0.0
+    target_amount: Money
+    current_amount: Money = 0.0
     target_date: datetime
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
 class SavingsGoalCreate(BaseModel):
     title: str
-    target_amount: float
+    target_amount: Money
     target_date: datetime
 
 
@@ -284,6 +909,12 @@ class ChatResponse(BaseModel):
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
+class ReportRequest(BaseModel):
+    type: str  # 'yearly_summary', 'export' or 'monthly_review'
+    year: Optional[int] = None
+    month: Optional[int] = None  # 1-12, monthly_review only
+
+
 # Group Management Models
 class GroupMember(BaseModel):
     user_id: str
@@ -306,7 +937,7 @@ class GroupExpense(BaseModel):
     group_id: str
     paid_by: str  # user_id of who paid
     paid_by_name: str
-    amount: float
+    amount: Money
     description: str
     category: str = "Group"
     date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -319,7 +950,7 @@ class GroupSettlement(BaseModel):
     debtor_name: str
     creditor: str  # user_id who should receive money
     creditor_name: str
-    amount: float
+    amount: Money
 
 
 class GroupSummary(BaseModel):
@@ -329,17 +960,467 @@ class GroupSummary(BaseModel):
     settlements: List[GroupSettlement]
 
 
+class BatchOperation(BaseModel):
+    op: str  # 'create', 'update' or 'delete'
+    resource: str  # 'expenses', 'budgets' or 'savings_goals'
+    id: Optional[str] = None  # Required for update and delete
+    data: Optional[dict] = None  # Required for create and update
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+
 # Helper function to serialize datetime for MongoDB
 def prepare_for_mongo(data):
     if isinstance(data, dict):
         for key, value in data.items():
             if isinstance(value, datetime):
                 data[key] = value.isoformat()
+        # Money is stored as integer minor units (see money.py)
+        for key in MONEY_FIELDS:
+            if key in data:
+                data[key + MINOR_SUFFIX] = to_minor(data.pop(key))
     return data
 
 
+# Per-user collection versions for conditional GETs. Every write bumps the
+# version, so an unchanged collection can be answered with 304 Not Modified
+# without reading any rows. BOOT_ID invalidates ETags across restarts.
+# The versions live in process memory, so this assumes a single server
+# process (as the Procfile runs it): with several workers, a worker that did
+# not see a write would keep answering 304 for the stale version.
+BOOT_ID = uuid.uuid4().hex[:8]
+collection_versions = {}
+
+
+def bump_collection_version(user_id: str, collection: str):
+    key = (user_id, collection)
+    collection_versions[key] = collection_versions.get(key, 0) + 1
+    note_write(f"user:{user_id}")
+
+
+def collection_etag(user_id: str, collection: str) -> str:
+    version = collection_versions.get((user_id, collection), 0)
+    return f'"{collection}-{BOOT_ID}-{version}"'
+
+
+def check_not_modified(
+    request: Request, response: Response, user_id: str, collection: str
+) -> Optional[Response]:
+    """Set caching headers and return a 304 response if the client is current."""
+    headers = {
+        "ETag": collection_etag(user_id, collection),
+        "Cache-Control": "private, no-cache",
+    }
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in tags or headers["ETag"] in tags:
+            return Response(status_code=304, headers=headers)
+    return None
+
+
+# Optional group commit for the hot insert paths (see coalesce.py): inserts
+# from concurrent requests are buffered for up to WRITE_COALESCE_MS and
+# written with one insert_many. 0 (the default) writes each one directly.
+# An expense insert waits for its flush inside the user's change lock (see
+# below), so one user's creates still commit one at a time, in change_seq
+# order; the batching is across users.
+WRITE_COALESCE_MS = float(os.environ.get("WRITE_COALESCE_MS", "0"))
+insert_coalescer = (
+    InsertCoalescer(
+        db_insert_many,
+        max_batch=int(os.environ.get("WRITE_COALESCE_MAX_BATCH", "64")),
+        max_delay=WRITE_COALESCE_MS / 1000,
+    )
+    if WRITE_COALESCE_MS > 0
+    else None
+)
+
+
+async def insert_document(collection, document):
+    if insert_coalescer:
+        await insert_coalescer.insert(collection, document)
+    else:
+        await db_insert_one(collection, document)
+
+
+# Expense change feed. Every expense write takes the next value of a per-user
+# sequence and deleted expenses leave a tombstone, so /expenses/changes can
+# return just the delta since a client's sync token. Tombstones older than
+# TOMBSTONE_RETENTION_DAYS are compacted; older tokens get a full resync.
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get("TOMBSTONE_RETENTION_DAYS", "30"))
+
+
+def _user_lock(locks: weakref.WeakValueDictionary, user_id: str) -> asyncio.Lock:
+    """The per-user lock in ``locks``; it lives as long as someone holds it."""
+    lock = locks.get(user_id)
+    if lock is None:
+        lock = locks[user_id] = asyncio.Lock()
+    return lock
+
+
+# A write reserves its change_seq and commits under the user's change lock,
+# and the feed reads under it too. Sequence order is therefore commit order:
+# a sync token can never move past a write that is still in flight (say,
+# buffered by the insert coalescer). Derived state (record_expense_write) is
+# updated after the lock is released. Like the other per-user locks here
+# this assumes one server process per user's writes.
+_change_locks = weakref.WeakValueDictionary()
+
+
+def change_lock(user_id: str) -> asyncio.Lock:
+    return _user_lock(_change_locks, user_id)
+
+
+async def next_change_seq(user_id: str, count: int = 1) -> int:
+    """Reserve ``count`` sequence values and return the last one. Call with
+    ``change_lock(user_id)`` held until the write using them has committed."""
+    sequence = await db_increment(
+        "change_sequences", {"user_id": user_id}, "seq", count
+    )
+    return sequence["seq"]
+
+
+async def compact_tombstones(user_id: str):
+    cutoff = datetime.now(timezone.utc) - timedelta(days=TOMBSTONE_RETENTION_DAYS)
+    query = {"user_id": user_id, "deleted_at": {"$lt": cutoff.isoformat()}}
+    newest_expired = await db_find(
+        "expense_tombstones", query, ("change_seq", -1), 1, projection=["change_seq"]
+    )
+    if not newest_expired:
+        return
+
+    await db_delete_many("expense_tombstones", query)
+    await db_update_one(
+        "change_sequences",
+        {"user_id": user_id},
+        {"$set": {"compacted_through": newest_expired[0]["change_seq"]}},
+    )
+
+
+# Spending insights: per-category running statistics maintained on every
+# expense write (see insights.py), so reads never scan expense history.
+async def update_spending_stats(user_id: str, old=None, new=None):
+    """Apply an expense write to the category statistics.
+
+    ``old`` is the stored expense before the write (update/delete) and
+    ``new`` the stored expense after it (create/update). Returns the
+    outlier flag raised for ``new``, if any.
+    """
+    flag = None
+    for category in {doc["category"] for doc in (old, new) if doc}:
+        query = {"user_id": user_id, "category": category}
+        stats = await db_find_one("category_stats", query)
+        if stats is None:
+            stats = insights.new_stats(user_id, category)
+        old_amount = new_amount = None
+        update = {"$set": {}}
+
+        if old and old["category"] == category:
+            old_amount = old["amount_minor"]
+            await db_delete_many(
+                "spending_flags", {"user_id": user_id, "expense_id": old["id"]}
+            )
+        if new and new["category"] == category:
+            new_amount = new["amount_minor"]
+            z_score = insights.outlier_score(stats, new_amount)
+            if z_score is not None:
+                flag = {
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "expense_id": new["id"],
+                    "category": category,
+                    "amount": from_minor(new_amount),
+                    "expected_amount": round(from_minor(stats["ewma_mean"]), 2),
+                    "z_score": round(z_score, 2),
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                }
+                await db_insert_one("spending_flags", flag)
+            update["$set"].update(insights.ewma_after(stats, new_amount))
+
+        update["$inc"] = insights.amount_deltas(old_amount, new_amount)
+        update["$set"]["updated_at"] = datetime.now(timezone.utc).isoformat()
+        update["$setOnInsert"] = {"units": "minor"}
+        await db_update_one("category_stats", query, update, upsert=True)
+    return flag
+
+
+# Expense search (see search.py); Mongo mode uses a text index instead
+search_indexes = SearchIndexes(int(os.environ.get("SEARCH_MAX_USERS", "1000")))
+
+
+# Real-time event stream (see pubsub.py and /api/events)
+event_hub = PubSubHub(int(os.environ.get("EVENT_QUEUE_SIZE", "100")))
+event_tickets = StreamTickets(float(os.environ.get("EVENT_TICKET_TTL_SECONDS", "30")))
+BUDGET_ALERT_THRESHOLDS = (0.8, 1.0)
+
+
+def expense_event(expense: dict) -> dict:
+    event = {
+        key: expense.get(key) for key in ("id", "category", "date", "notes", "change_seq")
+    }
+    event["amount"] = from_minor(expense["amount_minor"])
+    return event
+
+
+def month_range(date_value) -> tuple:
+    """Return ISO bounds [start, end) of the month containing ``date_value``."""
+    if isinstance(date_value, str):
+        date_value = datetime.fromisoformat(date_value.replace("Z", "+00:00"))
+    start = date_value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start, end
+
+
+# Hot/cold tiering (see archive.py). The "archive" job, started through
+# /admin/archive, moves expenses older than ARCHIVE_AFTER_MONTHS whole months
+# into compressed monthly archives; their rollups keep totals exact.
+ARCHIVE_AFTER_MONTHS = int(os.environ.get("ARCHIVE_AFTER_MONTHS", "12"))
+ARCHIVE_BATCH_SIZE = 500
+
+
+def archive_cutoff(months: Optional[int] = None) -> str:
+    """First month (``YYYY-MM``) kept hot; earlier expenses are archived."""
+    now = datetime.now(timezone.utc)
+    index = now.year * 12 + now.month - 1 - (
+        ARCHIVE_AFTER_MONTHS if months is None else months
+    )
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+async def archived_totals(user_id: str, month: Optional[str] = None, read=None):
+    """``{category: {"total", "count"}}`` over a user's archived expenses."""
+    query = {"user_id": user_id}
+    if month:
+        query["month"] = month
+    totals = {}
+    for rollup in await db_find("expense_rollups", query, read=read):
+        total = totals.setdefault(rollup["category"], {"total": 0, "count": 0})
+        total["total"] += rollup["total_minor"]
+        total["count"] += rollup["count"]
+    return totals
+
+
+async def archived_expenses(
+    user_id: str, first_month: Optional[str] = None, last_month: Optional[str] = None
+):
+    """Stored documents of a user's archived expenses in [first, last] month."""
+    query = {"user_id": user_id}
+    bounds = {}
+    if first_month:
+        bounds["$gte"] = first_month
+    if last_month:
+        bounds["$lte"] = last_month
+    if bounds:
+        query["month"] = bounds
+    rows = []
+    for document in await db_find_all("expense_archives", query, ("month", 1)):
+        rows.extend(archive.unpack(document["data"]))
+    return rows
+
+
+async def publish_budget_alerts(user_id: str, old=None, new=None):
+    """Publish budget.threshold events for budgets the write pushed past 80%/100%."""
+    if not new or not event_hub.topics.get(f"user:{user_id}"):
+        return
+    start, end = month_range(new["date"])
+    budgets = await db_find(
+        "budgets", {"user_id": user_id, "month": start.month, "year": start.year}
+    )
+    budgets = [
+        budget
+        for budget in budgets
+        if budget["type"] != "category" or budget.get("category") == new["category"]
+    ]
+    if not budgets:
+        return
+
+    async with recurring_lock(user_id):
+        category_totals = await db_group_sum(
+            "expenses",
+            {
+                "user_id": user_id,
+                "date": {"$gte": start.isoformat(), "$lt": end.isoformat()},
+            },
+            "category",
+            "amount_minor",
+        )
+        add_totals(category_totals, await pending_recurring_totals(user_id, start, end))
+    # Expenses backdated into an archived month count with its rollups
+    add_totals(
+        category_totals,
+        await archived_totals(user_id, archive.month_of(start.isoformat())),
+        counts=False,
+    )
+    for budget in budgets:
+
+        def counts(expense):
+            return (
+                expense is not None
+                and start.isoformat() <= expense["date"] < end.isoformat()
+                and (
+                    budget["type"] != "category"
+                    or expense["category"] == budget["category"]
+                )
+            )
+
+        spent = sum(
+            group["total"]
+            for category, group in category_totals.items()
+            if budget["type"] != "category" or category == budget["category"]
+        )
+        before = spent
+        if counts(new):
+            before -= new["amount_minor"]
+        if counts(old):
+            before += old["amount_minor"]
+        for threshold in BUDGET_ALERT_THRESHOLDS:
+            limit = budget["amount_minor"] * threshold
+            if before < limit <= spent:
+                event_hub.publish(
+                    f"user:{user_id}",
+                    "budget.threshold",
+                    {
+                        "budget_id": budget["id"],
+                        "category": budget.get("category"),
+                        "threshold": threshold,
+                        "spent": from_minor(spent),
+                        "amount": from_minor(budget["amount_minor"]),
+                    },
+                )
+
+
+async def record_expense_write(user_id: str, old=None, new=None):
+    """Keep derived per-user state in step with an expense write.
+
+    ``old``/``new`` are the stored expense before and after the write.
+    """
+    bump_collection_version(user_id, "expenses")
+    search_indexes.update(user_id, old=old, new=new)
+    await update_spending_stats(user_id, old=old, new=new)
+
+    if new:
+        event_type = "expense.updated" if old else "expense.created"
+        event_hub.publish(f"user:{user_id}", event_type, expense_event(new))
+    else:
+        event_hub.publish(f"user:{user_id}", "expense.deleted", {"id": old["id"]})
+    await publish_budget_alerts(user_id, old=old, new=new)
+
+
+# Recurring expenses (see recurring.py). Reads that list expenses first write
+# the user's due occurrences; aggregates add the due-but-unwritten ones with
+# recurring.pending_totals. A per-user lock keeps an aggregate from seeing
+# occurrences both as rows and as still pending.
+_recurring_locks = weakref.WeakValueDictionary()
+
+
+def recurring_lock(user_id: str) -> asyncio.Lock:
+    return _user_lock(_recurring_locks, user_id)
+
+
+# Earliest next_date of each user's templates (None: no active template),
+# so reads between occurrences skip materialize_recurring's queries; a
+# conditional GET then costs no storage round trip. Set by
+# materialize_recurring and dropped when a template is added, both under
+# recurring_lock.
+_next_recurring_date = {}
+
+
+async def materialize_recurring(user_id: str):
+    """Write the user's due recurring occurrences to ``expenses``."""
+    now = datetime.now(timezone.utc)
+    if user_id in _next_recurring_date:
+        next_date = _next_recurring_date[user_id]
+        if next_date is None or next_date > now.isoformat():
+            return
+    written = []
+    async with recurring_lock(user_id):
+        templates = await db_find(
+            "recurring_expenses",
+            {"user_id": user_id, "next_date": {"$lte": now.isoformat()}},
+        )
+        for template in templates:
+            occurrences = recurring.due(template, now)
+            documents = [recurring.occurrence(template, n, date) for n, date in occurrences]
+            existing = {
+                doc["id"]
+                for doc in await db_find(
+                    "expenses",
+                    {"user_id": user_id, "id": {"$in": [doc["id"] for doc in documents]}},
+                    projection=["id"],
+                )
+            }
+            documents = [doc for doc in documents if doc["id"] not in existing]
+            if documents:
+                async with change_lock(user_id):
+                    last_seq = await next_change_seq(user_id, len(documents))
+                    first_seq = last_seq - len(documents) + 1
+                    for offset, doc in enumerate(documents):
+                        doc["change_seq"] = first_seq + offset
+                    errors = await db_insert_many("expenses", documents)
+                # Another process wrote the rest first (unique id index)
+                written += [doc for doc, error in zip(documents, errors) if error is None]
+
+            next_index = template.get("next_index", 0) + len(occurrences)
+            await db_update_one(
+                "recurring_expenses",
+                {"id": template["id"], "next_index": template.get("next_index", 0)},
+                {
+                    "$set": {
+                        "next_index": next_index,
+                        "next_date": recurring.next_date(template, next_index),
+                    }
+                },
+            )
+
+        upcoming = await db_find(
+            "recurring_expenses",
+            {"user_id": user_id, "next_date": {"$ne": None}},
+            ("next_date", 1),
+            1,
+            projection=["next_date"],
+        )
+        _next_recurring_date[user_id] = upcoming[0]["next_date"] if upcoming else None
+    for document in written:
+        await record_expense_write(user_id, new=document)
+
+
+async def pending_recurring_totals(user_id: str, start=None, end=None, read=None):
+    """``{category: {"total", "count"}}`` of due occurrences in [start, end)
+    that are not written yet. Call with ``recurring_lock(user_id)`` held."""
+    now = datetime.now(timezone.utc)
+    end = min(end, now) if end else now
+    templates = await db_find(
+        "recurring_expenses",
+        {"user_id": user_id, "next_date": {"$lt": end.isoformat()}},
+        read=read,
+    )
+    return recurring.pending_totals(templates, start, end)
+
+
+def add_totals(totals: dict, extra: dict, counts: bool = True):
+    """Add one ``{category: {"total", "count"}}`` mapping into another."""
+    for category, total in extra.items():
+        group = totals.setdefault(category, {"total": 0, "count": 0})
+        group["total"] += total["total"]
+        if counts:
+            group["count"] += total["count"]
+
+
 def parse_from_mongo(item):
     if isinstance(item, dict):
+        # Work on a copy: in-memory documents must keep their stored form
+        item = dict(item)
+        for key in MONEY_FIELDS:
+            if key + MINOR_SUFFIX in item:
+                item[key] = from_minor(item.pop(key + MINOR_SUFFIX))
         for key, value in item.items():
             if isinstance(value, str) and key in ["date", "created_at", "target_date"]:
                 try:
@@ -394,17 +1475,146 @@ async def create_expense(
     expense = Expense(user_id=current_user.id, **expense_data.dict())
 
     expense_dict = prepare_for_mongo(expense.dict())
-    await db_insert_one("expenses", expense_dict)
+    async with change_lock(current_user.id):
+        expense_dict["change_seq"] = await next_change_seq(current_user.id)
+        await insert_document("expenses", expense_dict)
+    await record_expense_write(current_user.id, new=expense_dict)
 
     return expense
 
 
 @api_router.get("/expenses", response_model=List[Expense])
-async def get_expenses(current_user: User = Depends(get_current_user)):
-    expenses = await db_find("expenses", {"user_id": current_user.id}, ("date", -1))
+async def get_expenses(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+):
+    await materialize_recurring(current_user.id)
+    not_modified = check_not_modified(request, response, current_user.id, "expenses")
+    if not_modified:
+        return not_modified
+
+    expenses = await db_find(
+        "expenses",
+        {"user_id": current_user.id},
+        ("date", -1),
+        read=read_preference(f"user:{current_user.id}"),
+    )
     return [Expense(**parse_from_mongo(expense)) for expense in expenses]
 
 
+@api_router.get("/expenses/changes")
+async def get_expense_changes(
+    since: str = "0", limit: int = 500, current_user: User = Depends(get_current_user)
+):
+    try:
+        since_seq = int(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    limit = max(1, min(limit, 1000))
+
+    await materialize_recurring(current_user.id)
+    async with change_lock(current_user.id):
+        sequence = await db_find_one("change_sequences", {"user_id": current_user.id})
+        current_seq = sequence["seq"] if sequence else 0
+        compacted_through = sequence.get("compacted_through", 0) if sequence else 0
+
+        # No token, a token older than the retained tombstones, or a token from
+        # the future (e.g. after a data reset): send a full snapshot instead.
+        if since_seq <= 0 or since_seq < compacted_through or since_seq > current_seq:
+            expenses = await db_find_all(
+                "expenses", {"user_id": current_user.id}, ("date", -1)
+            )
+            return {
+                "reset": True,
+                "changes": [
+                    Expense(**parse_from_mongo(expense)) for expense in expenses
+                ],
+                "deleted": [],
+                "sync_token": str(current_seq),
+                "has_more": False,
+            }
+
+        # One row past the page from each collection tells whether more remain
+        query = {"user_id": current_user.id, "change_seq": {"$gt": since_seq}}
+        changed = await db_find("expenses", query, ("change_seq", 1), limit + 1)
+        tombstones = await db_find(
+            "expense_tombstones", query, ("change_seq", 1), limit + 1
+        )
+
+        events = sorted(changed + tombstones, key=lambda doc: doc["change_seq"])
+        has_more = len(events) > limit
+        events = events[:limit]
+        return {
+            "reset": False,
+            "changes": [
+                Expense(**parse_from_mongo(doc))
+                for doc in events
+                if "expense_id" not in doc
+            ],
+            "deleted": [doc["expense_id"] for doc in events if "expense_id" in doc],
+            "sync_token": str(events[-1]["change_seq"]) if events else str(since_seq),
+            "has_more": has_more,
+        }
+
+
+@api_router.get("/expenses/search")
+async def search_expenses(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    current_user: User = Depends(get_current_user),
+):
+    limit = max(1, min(limit, 100))
+    offset = max(0, offset)
+
+    await materialize_recurring(current_user.id)
+    if db is not None:
+        total, expenses = await db_text_search(
+            "expenses",
+            {"user_id": current_user.id},
+            q,
+            offset,
+            limit,
+            read=read_preference(f"user:{current_user.id}"),
+        )
+    else:
+        index = search_indexes.get(current_user.id)
+        if index is None:
+            index = search_indexes.build(
+                current_user.id,
+                await db_find("expenses", {"user_id": current_user.id}),
+            )
+        total, expense_ids = index.search(q, limit, offset)
+        found = await db_find(
+            "expenses", {"user_id": current_user.id, "id": {"$in": expense_ids}}
+        )
+        by_id = {expense["id"]: expense for expense in found}
+        expenses = [by_id[expense_id] for expense_id in expense_ids if expense_id in by_id]
+
+    return {
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "results": [Expense(**parse_from_mongo(expense)) for expense in expenses],
+    }
+
+
+@api_router.get("/expenses/archived", response_model=List[Expense])
+async def get_archived_expenses(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+):
+    """Archived expenses, optionally limited to months ``start``..``end`` (YYYY-MM)."""
+    for month in (start, end):
+        if month is not None and not re.fullmatch(r"\d{4}-\d{2}", month):
+            raise HTTPException(status_code=400, detail="Months must be YYYY-MM")
+    rows = await archived_expenses(current_user.id, start, end)
+    rows.sort(key=lambda row: str(row["date"]), reverse=True)
+    return [Expense(**parse_from_mongo(row)) for row in rows]
+
+
 @api_router.get("/expenses/{expense_id}", response_model=Expense)
 async def get_expense(expense_id: str, current_user: User = Depends(get_current_user)):
     expense = await db_find_one(
@@ -427,17 +1637,21 @@ async def update_expense(
     )
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
+    previous = dict(expense)
 
     update_data = prepare_for_mongo(expense_data.dict())
-    await db_update_one(
-        "expenses",
-        {"id": expense_id, "user_id": current_user.id},
-        {"$set": update_data},
-    )
+    async with change_lock(current_user.id):
+        update_data["change_seq"] = await next_change_seq(current_user.id)
+        await db_update_one(
+            "expenses",
+            {"id": expense_id, "user_id": current_user.id},
+            {"$set": update_data},
+        )
 
     updated_expense = await db_find_one(
         "expenses", {"id": expense_id, "user_id": current_user.id}
     )
+    await record_expense_write(current_user.id, old=previous, new=updated_expense)
     return Expense(**parse_from_mongo(updated_expense))
 
 
@@ -445,15 +1659,101 @@ async def update_expense(
 async def delete_expense(
     expense_id: str, current_user: User = Depends(get_current_user)
 ):
-    result = await db_delete_one(
+    expense = await db_find_one(
         "expenses", {"id": expense_id, "user_id": current_user.id}
     )
-    if result.deleted_count == 0:
+    if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
 
+    async with change_lock(current_user.id):
+        result = await db_delete_one(
+            "expenses", {"id": expense_id, "user_id": current_user.id}
+        )
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=404, detail="Expense not found")
+
+        tombstone = {
+            "user_id": current_user.id,
+            "expense_id": expense_id,
+            "change_seq": await next_change_seq(current_user.id),
+            "deleted_at": datetime.now(timezone.utc).isoformat(),
+        }
+        await db_insert_one("expense_tombstones", tombstone)
+    await record_expense_write(current_user.id, old=expense)
+    await compact_tombstones(current_user.id)
+
     return {"message": "Expense deleted successfully"}
 
 
+# Recurring Expense Routes
+@api_router.post("/recurring-expenses", response_model=RecurringExpense)
+async def create_recurring_expense(
+    template_data: RecurringExpenseCreate, current_user: User = Depends(get_current_user)
+):
+    if template_data.interval not in recurring.INTERVALS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"interval must be one of: {', '.join(recurring.INTERVALS)}",
+        )
+    if template_data.every < 1:
+        raise HTTPException(status_code=400, detail="every must be at least 1")
+    fields = template_data.dict()
+    fields["start_date"] = recurring.as_utc(fields["start_date"])
+    if fields["end_date"] is not None:
+        fields["end_date"] = recurring.as_utc(fields["end_date"])
+        if fields["end_date"] < fields["start_date"]:
+            raise HTTPException(status_code=400, detail="end_date is before start_date")
+    template = RecurringExpense(
+        user_id=current_user.id, next_date=fields["start_date"], **fields
+    )
+
+    template_dict = prepare_for_mongo(template.dict())
+    template_dict["next_index"] = 0
+    async with recurring_lock(current_user.id):
+        await db_insert_one("recurring_expenses", template_dict)
+        _next_recurring_date.pop(current_user.id, None)
+    bump_collection_version(current_user.id, "recurring_expenses")
+
+    return template
+
+
+@api_router.get("/recurring-expenses", response_model=List[RecurringExpense])
+async def get_recurring_expenses(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+):
+    not_modified = check_not_modified(
+        request, response, current_user.id, "recurring_expenses"
+    )
+    if not_modified:
+        return not_modified
+
+    templates = await db_find(
+        "recurring_expenses",
+        {"user_id": current_user.id},
+        read=read_preference(f"user:{current_user.id}"),
+    )
+    return [RecurringExpense(**parse_from_mongo(template)) for template in templates]
+
+
+@api_router.delete("/recurring-expenses/{template_id}")
+async def delete_recurring_expense(
+    template_id: str, current_user: User = Depends(get_current_user)
+):
+    """Stop a recurring expense. Occurrences already due are kept as expenses."""
+    query = {"id": template_id, "user_id": current_user.id}
+    if not await db_find_one("recurring_expenses", query):
+        raise HTTPException(status_code=404, detail="Recurring expense not found")
+
+    await materialize_recurring(current_user.id)
+    async with recurring_lock(current_user.id):
+        await db_delete_one("recurring_expenses", query)
+    bump_collection_version(current_user.id, "recurring_expenses")
+
+    return {"message": "Recurring expense deleted successfully"}
+
+
 # Budget Routes
 @api_router.post("/budgets", response_model=Budget)
 async def create_budget(
@@ -463,13 +1763,26 @@ async def create_budget(
 
     budget_dict = prepare_for_mongo(budget.dict())
     await db_insert_one("budgets", budget_dict)
+    bump_collection_version(current_user.id, "budgets")
 
     return budget
 
 
 @api_router.get("/budgets", response_model=List[Budget])
-async def get_budgets(current_user: User = Depends(get_current_user)):
-    budgets = await db_find("budgets", {"user_id": current_user.id})
+async def get_budgets(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+):
+    not_modified = check_not_modified(request, response, current_user.id, "budgets")
+    if not_modified:
+        return not_modified
+
+    budgets = await db_find(
+        "budgets",
+        {"user_id": current_user.id},
+        read=read_preference(f"user:{current_user.id}"),
+    )
     return [Budget(**parse_from_mongo(budget)) for budget in budgets]
 
 
@@ -482,19 +1795,36 @@ async def create_savings_goal(
 
     goal_dict = prepare_for_mongo(goal.dict())
     await db_insert_one("savings_goals", goal_dict)
+    bump_collection_version(current_user.id, "savings_goals")
 
     return goal
 
 
 @api_router.get("/savings-goals", response_model=List[SavingsGoal])
-async def get_savings_goals(current_user: User = Depends(get_current_user)):
-    goals = await db_find("savings_goals", {"user_id": current_user.id})
+async def get_savings_goals(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+):
+    not_modified = check_not_modified(
+        request, response, current_user.id, "savings_goals"
+    )
+    if not_modified:
+        return not_modified
+
+    goals = await db_find(
+        "savings_goals",
+        {"user_id": current_user.id},
+        read=read_preference(f"user:{current_user.id}"),
+    )
     return [SavingsGoal(**parse_from_mongo(goal)) for goal in goals]
 
 
 @api_router.put("/savings-goals/{goal_id}/add-amount")
 async def add_to_savings(
-    goal_id: str, amount: float, current_user: User = Depends(get_current_user)
+    goal_id: str,
+    amount: Annotated[Money, Query()],
+    current_user: User = Depends(get_current_user),
 ):
     goal = await db_find_one(
         "savings_goals", {"id": goal_id, "user_id": current_user.id}
@@ -502,12 +1832,13 @@ async def add_to_savings(
     if not goal:
         raise HTTPException(status_code=404, detail="Savings goal not found")
 
-    new_amount = goal["current_amount"] + amount
+    new_amount = goal["current_amount_minor"] + to_minor(amount)
     await db_update_one(
         "savings_goals",
         {"id": goal_id, "user_id": current_user.id},
-        {"$set": {"current_amount": new_amount}},
+        {"$set": {"current_amount_minor": new_amount}},
     )
+    bump_collection_version(current_user.id, "savings_goals")
 
     updated_goal = await db_find_one(
         "savings_goals", {"id": goal_id, "user_id": current_user.id}
@@ -515,22 +1846,484 @@ async def add_to_savings(
     return SavingsGoal(**parse_from_mongo(updated_goal))
 
 
+# Report Routes
+# Heavy reports run on the background job runner (see jobs.py/reports.py)
+async def insert_report_job(job):
+    await db_insert_one("report_jobs", job)
+
+
+async def update_report_job(job_id, fields):
+    await db_update_one("report_jobs", {"id": job_id}, {"$set": fields})
+
+
+job_runner = JobRunner(
+    insert_report_job,
+    update_report_job,
+    workers=int(os.environ.get("REPORT_WORKERS", "2")),
+    queue_size=int(os.environ.get("REPORT_QUEUE_SIZE", "100")),
+    process_workers=int(os.environ.get("REPORT_PROCESS_WORKERS", "0")),
+)
+
+# Finished jobs are kept for REPORT_RETENTION_HOURS, then deleted together
+# with their export file. CSV exports are written to EXPORT_DIR rather than
+# into the job document, which stays small however many expenses there are.
+EXPORT_DIR = Path(os.environ.get("EXPORT_DIR") or ROOT_DIR / "exports")
+REPORT_RETENTION_HOURS = float(os.environ.get("REPORT_RETENTION_HOURS", "24"))
+REPORT_EXPIRY_INTERVAL_SECONDS = 60
+_last_report_expiry = 0.0
+
+
+def export_path(job_id: str) -> Path:
+    return EXPORT_DIR / f"{job_id}.csv"
+
+
+def write_export(job_id: str, data: str) -> int:
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    path = export_path(job_id)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(data)
+    tmp_path.replace(path)
+    return path.stat().st_size
+
+
+async def expire_report_jobs(force: bool = False):
+    """Delete jobs finished more than REPORT_RETENTION_HOURS ago (at most
+    once per REPORT_EXPIRY_INTERVAL_SECONDS unless ``force``)."""
+    global _last_report_expiry
+    now = time.monotonic()
+    if not force and now - _last_report_expiry < REPORT_EXPIRY_INTERVAL_SECONDS:
+        return
+    _last_report_expiry = now
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=REPORT_RETENTION_HOURS)
+    query = {"finished_at": {"$lt": cutoff.isoformat()}}
+    while True:
+        expired = await db_find("report_jobs", query, limit=500, projection=["id"])
+        if not expired:
+            break
+        for job in expired:
+            export_path(job["id"]).unlink(missing_ok=True)
+        await db_delete_many(
+            "report_jobs", {"id": {"$in": [job["id"] for job in expired]}}
+        )
+
+
+def period_query(user_id: str, year: int, month: Optional[int] = None) -> dict:
+    """Expenses of ``user_id`` dated within ``year`` (or one of its months).
+
+    Stored dates are ISO strings, so the period is a prefix range.
+    """
+    if not month:
+        start, end = f"{year:04d}-", f"{year + 1:04d}-"
+    elif month == 12:
+        start, end = f"{year:04d}-12-", f"{year + 1:04d}-01-"
+    else:
+        start, end = f"{year:04d}-{month:02d}-", f"{year:04d}-{month + 1:02d}-"
+    return {"user_id": user_id, "date": {"$gte": start, "$lt": end}}
+
+
+async def run_yearly_summary(job, runner):
+    year = job["params"]["year"]
+    expenses = await db_find_all(
+        "expenses",
+        period_query(job["user_id"], year),
+        read=read_preference(f"user:{job['user_id']}"),
+        projection=["date", "category", "amount_minor"],
+    )
+    expenses += await archived_expenses(
+        job["user_id"], f"{year:04d}-01", f"{year:04d}-12"
+    )
+    return await runner.run_cpu(reports.yearly_summary, expenses, year)
+
+
+async def run_export(job, runner):
+    expenses = await db_find_all(
+        "expenses",
+        {"user_id": job["user_id"]},
+        read=read_preference(f"user:{job['user_id']}"),
+        projection=[*reports.EXPORT_FIELDS, "amount_minor"],
+    )
+    expenses += await archived_expenses(job["user_id"])
+    csv_data = await runner.run_cpu(reports.expenses_csv, expenses)
+    size = await asyncio.to_thread(write_export, job["id"], csv_data)
+    return {
+        "format": "csv",
+        "rows": len(expenses),
+        "bytes": size,
+        "download_url": f"/api/reports/{job['id']}/download",
+    }
+
+
+async def run_monthly_review(job, runner):
+    params = job["params"]
+    expenses = await db_find_all(
+        "expenses",
+        period_query(job["user_id"], params["year"], params["month"]),
+        read=read_preference(f"user:{job['user_id']}"),
+        projection=["date", "category", "amount_minor", "notes"],
+    )
+    month = f"{params['year']:04d}-{params['month']:02d}"
+    expenses += await archived_expenses(job["user_id"], month, month)
+    summary = await runner.run_cpu(
+        reports.monthly_summary, expenses, params["year"], params["month"]
+    )
+    if not AI_AVAILABLE or not GEMINI_API_KEY:
+        return {"summary": summary, "review": None}
+
+    genai = await asyncio.to_thread(get_genai)
+    model = genai.GenerativeModel("gemini-1.5-flash")
+    prompt = (
+        "You are a helpful financial advisor AI for a student expense management app. "
+        "Write a short, friendly monthly spending review with two or three practical "
+        f"tips, based on this summary: {summary}"
+    )
+    with tracing.span("gemini.generate_content", **{"gemini.model": model.model_name}):
+        response = await asyncio.to_thread(model.generate_content, prompt)
+    return {"summary": summary, "review": response.text}
+
+
+async def archive_month(user_id: str, month: str, expenses, runner):
+    """Merge ``expenses`` into the user's archive for ``month`` and rebuild
+    its rollups. The hot copies are deleted by the caller afterwards, so an
+    interrupted run loses nothing and a re-run de-duplicates by id."""
+    query = {"user_id": user_id, "month": month}
+    existing = await db_find_one("expense_archives", query)
+    rows = archive.merge(archive.unpack(existing["data"]) if existing else [], expenses)
+    document = {
+        **query,
+        "count": len(rows),
+        "data": await runner.run_cpu(archive.pack, rows),
+        "archived_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if existing:
+        await db_update_one("expense_archives", query, {"$set": document})
+    else:
+        await db_insert_one("expense_archives", document)
+
+    await db_delete_many("expense_rollups", query)
+    await db_bulk_write(
+        "expense_rollups",
+        [("insert", rollup) for rollup in archive.rollup(user_id, month, rows)],
+    )
+
+
+async def run_archive(job, runner):
+    before = job["params"]["before"]
+    archived = 0
+    users = set()
+    while True:
+        batch = await db_find(
+            "expenses", {"date": {"$lt": before}}, limit=ARCHIVE_BATCH_SIZE
+        )
+        if not batch:
+            break
+        months = {}
+        for expense in batch:
+            key = (expense["user_id"], archive.month_of(expense["date"]))
+            months.setdefault(key, []).append(expense)
+        for (user_id, month), expenses in months.items():
+            await archive_month(user_id, month, expenses, runner)
+            # Archived rows leave the change feed like deleted ones, so synced
+            # clients drop them too
+            async with change_lock(user_id):
+                await db_delete_many(
+                    "expenses",
+                    {"user_id": user_id, "id": {"$in": [e["id"] for e in expenses]}},
+                )
+                last_seq = await next_change_seq(user_id, len(expenses))
+                now = datetime.now(timezone.utc).isoformat()
+                await db_insert_many(
+                    "expense_tombstones",
+                    [
+                        {
+                            "user_id": user_id,
+                            "expense_id": expense["id"],
+                            "change_seq": seq,
+                            "deleted_at": now,
+                        }
+                        for seq, expense in enumerate(
+                            expenses, last_seq - len(expenses) + 1
+                        )
+                    ],
+                )
+            for expense in expenses:
+                search_indexes.update(user_id, old=expense)
+            users.add(user_id)
+        archived += len(batch)
+
+    for user_id in users:
+        bump_collection_version(user_id, "expenses")
+        await compact_tombstones(user_id)
+    return {"before": before, "archived": archived, "users": len(users)}
+
+
+REPORT_TYPES = ("yearly_summary", "export", "monthly_review")
+
+job_runner.register("yearly_summary", run_yearly_summary)
+job_runner.register("export", run_export)
+job_runner.register("monthly_review", run_monthly_review)
+job_runner.register("archive", run_archive)
+
+
+def report_job_response(job):
+    return {k: v for k, v in job.items() if k not in ("_id", "user_id")}
+
+
+@api_router.post("/reports", status_code=202)
+async def create_report(
+    report: ReportRequest, current_user: User = Depends(get_current_user)
+):
+    if report.type not in REPORT_TYPES:
+        raise HTTPException(status_code=400, detail="Unknown report type")
+    if report.month is not None and not 1 <= report.month <= 12:
+        raise HTTPException(status_code=400, detail="Invalid month")
+
+    now = datetime.now(timezone.utc)
+    params = {"year": report.year or now.year}
+    if report.type == "monthly_review":
+        params["month"] = report.month or now.month
+
+    # Reports read the stored rows, so due recurring occurrences go in first
+    await materialize_recurring(current_user.id)
+    await expire_report_jobs()
+    try:
+        job = await job_runner.submit(report.type, current_user.id, params)
+    except QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Report queue is full, please retry later",
+            headers={"Retry-After": "5"},
+        )
+    return report_job_response(job)
+
+
+@api_router.get("/reports/{job_id}")
+async def get_report(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await db_find_one("report_jobs", {"id": job_id, "user_id": current_user.id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report_job_response(job)
+
+
+@api_router.get("/reports/{job_id}/download")
+async def download_report(
+    job_id: str, current_user: User = Depends(get_current_user)
+):
+    job = await db_find_one("report_jobs", {"id": job_id, "user_id": current_user.id})
+    if not job or job["type"] != "export" or job["status"] != "completed":
+        raise HTTPException(status_code=404, detail="Export not found")
+    path = export_path(job_id)
+    if not path.exists():
+        raise HTTPException(status_code=410, detail="Export has expired")
+    return FileResponse(path, media_type="text/csv", filename=f"expenses-{job_id}.csv")
+
+
+# Batch Routes
+BATCH_MAX_OPERATIONS = 500
+BATCH_RESOURCES = {
+    # resource: (input model, stored model)
+    "expenses": (ExpenseCreate, Expense),
+    "budgets": (BudgetCreate, Budget),
+    "savings_goals": (SavingsGoalCreate, SavingsGoal),
+}
+
+
+@api_router.post("/batch")
+async def run_batch(
+    batch: BatchRequest, current_user: User = Depends(get_current_user)
+):
+    operations = batch.operations
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"A batch may contain at most {BATCH_MAX_OPERATIONS} operations",
+        )
+
+    # Validate every operation before writing anything
+    errors = []
+    validated = []
+    referenced = {resource: set() for resource in BATCH_RESOURCES}
+    for index, operation in enumerate(operations):
+        if operation.resource not in BATCH_RESOURCES:
+            errors.append({"index": index, "error": "Unknown resource"})
+            continue
+        if operation.op not in ("create", "update", "delete"):
+            errors.append({"index": index, "error": "Unknown operation"})
+            continue
+        if operation.op != "create":
+            if not operation.id:
+                errors.append({"index": index, "error": "Missing id"})
+                continue
+            referenced[operation.resource].add(operation.id)
+
+        data = None
+        if operation.op != "delete":
+            input_model = BATCH_RESOURCES[operation.resource][0]
+            try:
+                data = input_model(**(operation.data or {}))
+            except ValidationError as e:
+                errors.append(
+                    {"index": index, "error": e.errors(include_url=False)}
+                )
+                continue
+        validated.append((index, operation, data))
+
+    existing = {}
+    for resource, ids in referenced.items():
+        if ids:
+            docs = await db_find(
+                resource, {"user_id": current_user.id, "id": {"$in": list(ids)}}
+            )
+            existing[resource] = {doc["id"]: doc for doc in docs}
+
+    deleted = set()
+    for index, operation, data in validated:
+        if operation.op == "create":
+            continue
+        key = (operation.resource, operation.id)
+        if operation.id not in existing.get(operation.resource, {}):
+            errors.append({"index": index, "error": "Not found"})
+        elif key in deleted:
+            errors.append({"index": index, "error": "Already deleted in this batch"})
+        elif operation.op == "delete":
+            deleted.add(key)
+
+    if errors:
+        raise HTTPException(status_code=422, detail=sorted(errors, key=lambda e: e["index"]))
+
+    # Build one ordered bulk write per collection
+    writes = {resource: [] for resource in BATCH_RESOURCES}
+    writes["expense_tombstones"] = []
+    results = []
+    expense_changes = []  # (old, new) stored expense documents
+    expense_ops = sum(1 for _, op, _ in validated if op.resource == "expenses")
+    async with change_lock(current_user.id):
+        if expense_ops:
+            last_seq = await next_change_seq(current_user.id, expense_ops)
+            next_seq = last_seq - expense_ops + 1
+        now = datetime.now(timezone.utc).isoformat()
+
+        for index, operation, data in validated:
+            resource = operation.resource
+            stored_model = BATCH_RESOURCES[resource][1]
+            query = {"id": operation.id, "user_id": current_user.id}
+            result = {"index": index, "op": operation.op, "resource": resource}
+
+            if operation.op == "create":
+                item = stored_model(user_id=current_user.id, **data.dict())
+                document = prepare_for_mongo(item.dict())
+                if resource == "expenses":
+                    document["change_seq"] = next_seq
+                    next_seq += 1
+                    expense_changes.append((None, document))
+                writes[resource].append(("insert", document))
+                result.update({"id": item.id, "status": "created", "data": item})
+            elif operation.op == "update":
+                update_data = prepare_for_mongo(data.dict())
+                previous = dict(existing[resource][operation.id])
+                current = {**previous, **update_data}
+                # Later operations on the same id see this one's result
+                existing[resource][operation.id] = current
+                if resource == "expenses":
+                    current["change_seq"] = update_data["change_seq"] = next_seq
+                    next_seq += 1
+                    expense_changes.append((previous, current))
+                writes[resource].append(("update", query, {"$set": update_data}))
+                item = stored_model(**parse_from_mongo(current))
+                result.update({"id": operation.id, "status": "updated", "data": item})
+            else:
+                writes[resource].append(("delete", query))
+                if resource == "expenses":
+                    previous = dict(existing[resource][operation.id])
+                    expense_changes.append((previous, None))
+                    writes["expense_tombstones"].append(
+                        (
+                            "insert",
+                            {
+                                "user_id": current_user.id,
+                                "expense_id": operation.id,
+                                "change_seq": next_seq,
+                                "deleted_at": now,
+                            },
+                        )
+                    )
+                    next_seq += 1
+                result.update({"id": operation.id, "status": "deleted"})
+            results.append(result)
+
+        # All-or-nothing where the backend allows it: a transaction on a replica
+        # set, and trivially in memory since the writes below never yield to the
+        # event loop. A standalone mongod applies each bulk write independently.
+        atomic = db is None or await db_supports_transactions()
+        if db is not None and atomic:
+            async with await client.start_session() as session:
+                async with session.start_transaction():
+                    for collection, operations in writes.items():
+                        if operations:
+                            await db_bulk_write(collection, operations, session=session)
+            # Reads between the bulk writes and the commit may have cached the
+            # pre-transaction documents
+            for collection in writes:
+                working_sets.invalidate(collection, {"user_id": current_user.id})
+        else:
+            for collection, operations in writes.items():
+                if operations:
+                    await db_bulk_write(collection, operations)
+
+    for resource in ("budgets", "savings_goals"):
+        if writes[resource]:
+            bump_collection_version(current_user.id, resource)
+    for old, new in expense_changes:
+        await record_expense_write(current_user.id, old=old, new=new)
+    if writes["expense_tombstones"]:
+        await compact_tombstones(current_user.id)
+
+    return {"atomic": atomic, "results": results}
+
+
 # Analytics Routes
 @api_router.get("/analytics/expense-summary")
 async def get_expense_summary(current_user: User = Depends(get_current_user)):
-    expenses = await db_find("expenses", {"user_id": current_user.id})
+    read = read_preference(f"user:{current_user.id}")
+    async with recurring_lock(current_user.id):
+        category_totals = await db_group_sum(
+            "expenses", {"user_id": current_user.id}, "category", "amount_minor", read=read
+        )
+        add_totals(
+            category_totals, await pending_recurring_totals(current_user.id, read=read)
+        )
+    add_totals(category_totals, await archived_totals(current_user.id, read=read))
 
-    total_expenses = sum(expense["amount"] for expense in expenses)
-    category_totals = {}
+    return {
+        "total_expenses": from_minor(
+            sum(group["total"] for group in category_totals.values())
+        ),
+        "category_breakdown": {
+            category: from_minor(group["total"])
+            for category, group in category_totals.items()
+        },
+        "expense_count": sum(group["count"] for group in category_totals.values()),
+    }
 
-    for expense in expenses:
-        category = expense["category"]
-        category_totals[category] = category_totals.get(category, 0) + expense["amount"]
 
+@api_router.get("/analytics/insights")
+async def get_spending_insights(
+    limit: int = 20, current_user: User = Depends(get_current_user)
+):
+    read = read_preference(f"user:{current_user.id}")
+    stats = await db_find("category_stats", {"user_id": current_user.id}, read=read)
+    flags = await db_find(
+        "spending_flags",
+        {"user_id": current_user.id},
+        ("created_at", -1),
+        max(1, min(limit, 100)),
+        read=read,
+    )
     return {
-        "total_expenses": total_expenses,
-        "category_breakdown": category_totals,
-        "expense_count": len(expenses),
+        "categories": [insights.summarize(item) for item in stats],
+        "unusual_expenses": [
+            {k: v for k, v in flag.items() if k not in ("_id", "user_id")}
+            for flag in flags
+        ],
     }
 
 
@@ -550,17 +2343,15 @@ async def chat_with_ai(
         )
 
     try:
-        # Configure Gemini API
-        genai.configure(api_key=GEMINI_API_KEY)
+        # The first call imports the SDK off the event loop
+        genai = await asyncio.to_thread(get_genai)
 
-        # Get user's recent expenses for context
-        recent_expenses = await db_find(
-            "expenses", {"user_id": current_user.id}, ("date", -1), 10
-        )
+        # Count the user's recent expenses (up to 10) for context
+        recent_count = await db_count("expenses", {"user_id": current_user.id}, 10)
 
         # Prepare context about user's expenses
         context = f"""You are a helpful financial advisor AI for a student expense management app. 
-        The user {current_user.name} has {len(recent_expenses)} recent transactions.
+        The user {current_user.name} has {recent_count} recent transactions.
         Provide helpful, concise financial advice and answer questions about budgeting, saving, and expense management.
         Keep responses friendly, educational, and practical for students.
         Focus on actionable tips and avoid giving specific investment advice."""
@@ -572,12 +2363,16 @@ async def chat_with_ai(
         prompt = f"{context}\n\nUser question: {message_data.message}"
 
         # Generate response
-        response = model.generate_content(prompt)
+        with tracing.span(
+            "gemini.generate_content", **{"gemini.model": model.model_name}
+        ) as span:
+            response = model.generate_content(prompt)
+            span.set_attribute("gemini.response_chars", len(response.text))
 
         return ChatResponse(response=response.text)
 
     except Exception as e:
-        print(f"Gemini API error: {str(e)}")
+        logger.exception("Gemini API error")
         return ChatResponse(response=f"AI service error: {str(e)}")
 
 
@@ -592,29 +2387,32 @@ async def create_group(
     group_dict["members"] = [
         GroupMember(
             user_id=current_user.id, name=current_user.name, email=current_user.email
-        )
+        ).dict()
     ] + group_dict.get("members", [])
 
     await db_insert_one("groups", group_dict)
+    await refresh_event_topics(m["user_id"] for m in group_dict["members"])
     return group_dict
 
 
-@api_router.get("/groups", response_model=List[Group])
-async def get_user_groups(current_user: User = Depends(get_current_user)):
+async def find_user_groups(user_id: str):
     # Get groups where user is a member
-    if db:
-        groups = await db_find(
-            "groups", {"members": {"$elemMatch": {"user_id": current_user.id}}}
+    if db is not None:
+        return await db_find(
+            "groups", {"members": {"$elemMatch": {"user_id": user_id}}}
         )
-    else:
-        # For demo mode, filter groups where user is a member
-        all_groups = await db_find("groups", {})
-        groups = [
-            group
-            for group in all_groups
-            if any(m["user_id"] == current_user.id for m in group["members"])
-        ]
-    return groups
+    # For demo mode, filter groups where user is a member
+    all_groups = await db_find("groups", {})
+    return [
+        group
+        for group in all_groups
+        if any(m["user_id"] == user_id for m in group["members"])
+    ]
+
+
+@api_router.get("/groups", response_model=List[Group])
+async def get_user_groups(current_user: User = Depends(get_current_user)):
+    return await find_user_groups(current_user.id)
 
 
 @api_router.post("/groups/{group_id}/members")
@@ -632,10 +2430,28 @@ async def add_group_member(
         raise HTTPException(status_code=400, detail="User already in group")
 
     group["members"].append(member_data.dict())
-    await db_update_one("groups", {"id": group_id}, {"members": group["members"]})
+    await db_update_one(
+        "groups", {"id": group_id}, {"$set": {"members": group["members"]}}
+    )
+    note_write(f"group:{group_id}")
+    await refresh_event_topics([member_data.user_id])
     return {"message": "Member added successfully"}
 
 
+def group_balance_deltas(expense: dict) -> dict:
+    """Balance change per member for a stored group expense, in minor units.
+
+    The payer is credited the full amount and every member in split_among is
+    debited an exact share; leftover minor units go to members in sorted
+    user_id order, so balances always sum to zero.
+    """
+    deltas = {expense["paid_by"]: expense["amount_minor"]}
+    parties = expense["split_among"] or [expense["paid_by"]]
+    for user_id, share in split_evenly(expense["amount_minor"], parties).items():
+        deltas[user_id] = deltas.get(user_id, 0) - share
+    return deltas
+
+
 @api_router.post("/groups/{group_id}/expenses", response_model=GroupExpense)
 async def create_group_expense(
     group_id: str,
@@ -655,8 +2471,27 @@ async def create_group_expense(
     expense_dict["paid_by"] = current_user.id
     expense_dict["paid_by_name"] = current_user.name
 
-    await db_insert_one("group_expenses", expense_dict)
-    return expense_dict
+    expense_dict = prepare_for_mongo(expense_dict)
+    await insert_document("group_expenses", expense_dict)
+    note_write(f"group:{group_id}")
+
+    expense = parse_from_mongo(expense_dict)
+    event_hub.publish(
+        f"group:{group_id}",
+        "group_expense.created",
+        {
+            "group_id": group_id,
+            "expense": {
+                key: expense[key]
+                for key in ("id", "amount", "description", "paid_by", "date")
+            },
+            "balance_deltas": {
+                user_id: from_minor(delta)
+                for user_id, delta in group_balance_deltas(expense_dict).items()
+            },
+        },
+    )
+    return expense
 
 
 @api_router.get("/groups/{group_id}/expenses", response_model=List[GroupExpense])
@@ -671,8 +2506,13 @@ async def get_group_expenses(
     if not any(m["user_id"] == current_user.id for m in group["members"]):
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
-    expenses = await db_find("group_expenses", {"group_id": group_id}, ("date", -1))
-    return expenses
+    expenses = await db_find(
+        "group_expenses",
+        {"group_id": group_id},
+        ("date", -1),
+        read=read_preference(f"group:{group_id}"),
+    )
+    return [parse_from_mongo(expense) for expense in expenses]
 
 
 @api_router.get("/groups/{group_id}/settlement", response_model=GroupSummary)
@@ -688,25 +2528,24 @@ async def get_group_settlement(
         raise HTTPException(status_code=403, detail="Not a member of this group")
 
     # Get all group expenses
-    expenses = await db_find("group_expenses", {"group_id": group_id})
+    expenses = await db_find(
+        "group_expenses",
+        {"group_id": group_id},
+        read=read_preference(f"group:{group_id}"),
+        projection=["amount_minor", "paid_by", "split_among"],
+    )
 
-    # Calculate balances for each member
+    # Calculate balances for each member, in exact minor units
     member_balances = {}
     for member in group["members"]:
-        member_balances[member["user_id"]] = 0.0
+        member_balances[member["user_id"]] = 0
 
-    total_expenses = 0.0
+    total_expenses = 0
 
     for expense in expenses:
-        total_expenses += expense["amount"]
-        amount_per_person = expense["amount"] / len(expense["split_among"])
-
-        # Add to paid_by's balance (they paid, so positive)
-        member_balances[expense["paid_by"]] += expense["amount"]
-
-        # Subtract from each person who should pay
-        for user_id in expense["split_among"]:
-            member_balances[user_id] -= amount_per_person
+        total_expenses += expense["amount_minor"]
+        for user_id, delta in group_balance_deltas(expense).items():
+            member_balances[user_id] += delta
 
     # Calculate settlements (who owes whom)
     settlements = []
@@ -743,7 +2582,7 @@ async def get_group_settlement(
                 debtor_name=debtor_name,
                 creditor=creditor_id,
                 creditor_name=creditor_name,
-                amount=settlement_amount,
+                amount=from_minor(settlement_amount),
             )
         )
 
@@ -757,12 +2596,146 @@ async def get_group_settlement(
 
     return GroupSummary(
         group=group,
-        total_expenses=total_expenses,
-        member_balances=member_balances,
+        total_expenses=from_minor(total_expenses),
+        member_balances={
+            user_id: from_minor(balance) for user_id, balance in member_balances.items()
+        },
         settlements=settlements,
     )
 
 
+# Real-time Events
+EVENT_HEARTBEAT_SECONDS = 15
+
+
+async def event_topics(user_id: str) -> list:
+    groups = await find_user_groups(user_id)
+    return [f"user:{user_id}"] + [f"group:{group['id']}" for group in groups]
+
+
+async def refresh_event_topics(user_ids):
+    """Re-resolve the topics of the users' open streams after their group
+    memberships changed (every stream of a user subscribes to user:<id>)."""
+    for user_id in set(user_ids):
+        if not event_hub.topics.get(f"user:{user_id}"):
+            continue
+        topics = await event_topics(user_id)
+        for subscription in list(event_hub.topics.get(f"user:{user_id}", ())):
+            event_hub.resubscribe(subscription, topics)
+
+
+@api_router.post("/events/ticket")
+async def create_event_ticket(current_user: User = Depends(get_current_user)):
+    """A single-use ticket for connecting to /events with ?ticket=."""
+    return {
+        "ticket": event_tickets.issue(current_user.id),
+        "expires_in": event_tickets.ttl,
+    }
+
+
+@api_router.get("/events")
+async def stream_events(
+    request: Request,
+    ticket: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(
+        HTTPBearer(auto_error=False)
+    ),
+):
+    """Server-sent event stream of the user's and their groups' changes.
+
+    EventSource cannot set headers, so browsers pass a ticket from
+    POST /events/ticket as ?ticket= instead of the JWT.
+    """
+    if credentials:
+        current_user = await authenticate_token(credentials.credentials)
+    elif ticket:
+        user_id = event_tickets.redeem(ticket)
+        user = user_id and await db_find_one("users", {"id": user_id})
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid or expired ticket")
+        current_user = User(**user)
+    else:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    subscription = event_hub.subscribe(await event_topics(current_user.id))
+
+    async def frames():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(
+                        subscription.next_frame(), EVENT_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Admin Routes
+@api_router.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles(limit: int = 50, min_duration_ms: float = 0.0):
+    return profiler.store.list_recent(limit=limit, min_duration_ms=min_duration_ms)
+
+
+@api_router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str):
+    profile = profiler.store.load(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@api_router.post("/admin/archive", status_code=202, dependencies=[Depends(require_admin)])
+async def start_archive(months: Optional[int] = None):
+    """Archive expenses older than ``months`` (default ARCHIVE_AFTER_MONTHS)."""
+    if months is not None and months < 1:
+        raise HTTPException(status_code=400, detail="months must be at least 1")
+    try:
+        job = await job_runner.submit(
+            "archive", "system", {"before": archive_cutoff(months)}
+        )
+    except QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="Job queue is full, please retry later",
+            headers={"Retry-After": "5"},
+        )
+    return report_job_response(job)
+
+
+@api_router.get("/admin/jobs/{job_id}", dependencies=[Depends(require_admin)])
+async def get_admin_job(job_id: str):
+    job = await db_find_one("report_jobs", {"id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return report_job_response(job)
+
+
+@api_router.get("/admin/metrics", dependencies=[Depends(require_admin)])
+async def get_metrics():
+    return {
+        "rate_limiter": rate_limiter.stats(),
+        "idempotency": idempotency_cache.stats(),
+        "working_set": working_sets.stats(),
+        "memory_store": memory_spiller.stats() if db is None else None,
+        "write_coalescing": insert_coalescer.stats() if insert_coalescer else None,
+        "logging": logconfig.stats(),
+        "tracing": tracer.stats(),
+        "events": event_hub.stats(),
+        "jobs": job_runner.stats(),
+    }
+
+
 @api_router.get("/")
 async def root():
     return {"message": "Student Expense Manager API", "status": "running"}
@@ -771,6 +2744,12 @@ async def root():
 # Include the router in the main app
 app.include_router(api_router)
 
+app.middleware("http")(profiler)
+app.middleware("http")(idempotency_cache)
+app.middleware("http")(rate_limiter)
+app.middleware("http")(tracer)
+app.middleware("http")(logconfig.RequestLogMiddleware())
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -779,14 +2758,3 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
-logger = logging.getLogger(__name__)
-
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    if client:
-        client.close()
@@ -0,0 +1,262 @@
+"""Memory budget for the in-memory backend.
+
+With ``STORAGE_BACKEND=memory`` every document lives in ``demo_storage``.
+``PartitionSpiller`` keeps the estimated size of those collections (see
+``MemoryCollection.bytes``) under ``max_bytes`` by spilling the least
+recently active users: all of a user's documents in the per-user
+collections are written to one compact segment file and dropped from
+memory. The ``db_*`` helpers await ``fault_in`` before touching a collection,
+which reads a spilled user's segment back (memory-mapped, in a worker thread
+so the event loop keeps serving other requests) on their next request, so
+routes never notice.
+
+Shared collections (users, groups, group expenses) always stay resident.
+Only users idle for at least ``min_idle`` seconds are spilled; if that does
+not free enough, the budget is exceeded rather than evicting someone
+mid-session, and the overrun is counted in ``stats``.
+
+Segment layout::
+
+    b"SPL1" | header length (u32 LE) | header JSON | collection JSON arrays
+
+where the header maps each collection to the ``[offset, length]`` of its
+array in the body. Segments only live as long as the process: they are
+written to a private temporary directory that is removed at exit.
+"""
+
+import asyncio
+import atexit
+import base64
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+MAGIC = b"SPL1"
+_HEADER_LENGTH = struct.Struct("<I")
+
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return {"$binary": base64.b64encode(value).decode()}
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot spill {type(value).__name__}")
+
+
+def _decode(value):
+    if len(value) == 1:
+        if "$binary" in value:
+            return base64.b64decode(value["$binary"])
+        if "$date" in value:
+            return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def write_segment(path, collections: dict) -> int:
+    """Write ``{collection: [documents]}`` to ``path``; returns its size."""
+    header, body, offset = {}, [], 0
+    for name, docs in collections.items():
+        data = json.dumps(docs, separators=(",", ":"), default=_encode).encode()
+        header[name] = [offset, len(data)]
+        body.append(data)
+        offset += len(data)
+    header_data = json.dumps(header).encode()
+
+    # Write then rename, so a crash never leaves a truncated segment behind
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header_data)))
+        f.write(header_data)
+        for data in body:
+            f.write(data)
+    os.replace(tmp_path, path)
+    return len(MAGIC) + _HEADER_LENGTH.size + len(header_data) + offset
+
+
+def read_segment(path) -> dict:
+    """``{collection: [documents]}`` stored in the segment at ``path``."""
+    with open(path, "rb") as f:
+        try:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # no mmap support for this file
+            view = f.read()
+        try:
+            if view[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a spill segment")
+            start = len(MAGIC) + _HEADER_LENGTH.size
+            (header_length,) = _HEADER_LENGTH.unpack(view[len(MAGIC) : start])
+            header = json.loads(view[start : start + header_length])
+            start += header_length
+            return {
+                name: json.loads(
+                    view[start + offset : start + offset + length], object_hook=_decode
+                )
+                for name, (offset, length) in header.items()
+            }
+        finally:
+            if isinstance(view, mmap.mmap):
+                view.close()
+
+
+class PartitionSpiller:
+    def __init__(
+        self,
+        collections: dict,
+        spillable,
+        max_bytes: int,
+        directory=None,
+        min_idle: float = 300.0,
+    ):
+        self.collections = collections  # name -> MemoryCollection
+        self.spillable = tuple(spillable)  # names partitioned by user_id
+        self.max_bytes = max_bytes
+        self.min_idle = min_idle
+        self.directory = None
+        if self.enabled:
+            self.directory = tempfile.mkdtemp(prefix="spill-", dir=directory)
+            atexit.register(shutil.rmtree, self.directory, ignore_errors=True)
+        self.last_used = OrderedDict()  # resident user_id -> monotonic time
+        self.spilled = {}  # user_id -> (segment path, size on disk)
+        self.loading = {}  # user_id -> task reading their segment back
+        self.evictions = 0
+        self.faults = 0
+        self.fault_seconds = deque(maxlen=1000)
+        self.over_budget = 0
+
+    @classmethod
+    def from_env(cls, collections, spillable):
+        if os.environ.get("MEMORY_SPILL_DIR"):
+            os.makedirs(os.environ["MEMORY_SPILL_DIR"], exist_ok=True)
+        return cls(
+            collections,
+            spillable,
+            int(float(os.environ.get("MEMORY_BUDGET_MB", "0")) * 1024 * 1024),
+            os.environ.get("MEMORY_SPILL_DIR") or None,
+            float(os.environ.get("MEMORY_SPILL_IDLE_SECONDS", "300")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def resident_bytes(self) -> int:
+        return sum(collection.bytes for collection in self.collections.values())
+
+    async def fault_in(self, collection: str, query=None):
+        """Make every partition ``query`` can touch in ``collection`` resident."""
+        if not self.enabled or collection not in self.spillable:
+            return
+        user_id = (query or {}).get("user_id")
+        if not isinstance(user_id, str):
+            # Not pinned to one user (admin jobs, migrations): load everyone.
+            # They stay resident for this call and are the first spilled by
+            # the next enforce.
+            loaded = list(self.spilled)
+            for spilled_user in loaded:
+                await self._load(spilled_user)
+            self.enforce(keep=loaded)
+            return
+        await self._load(user_id)
+        self.last_used[user_id] = time.monotonic()
+        self.last_used.move_to_end(user_id)
+        self.enforce(keep=(user_id,))
+
+    def enforce(self, keep=()):
+        """Spill idle users, least recently active first, until under budget.
+
+        Users in ``keep`` (the ones the caller is about to read) are never
+        spilled, however idle they are.
+        """
+        if self.resident_bytes() <= self.max_bytes:
+            return
+        now = time.monotonic()
+        for user_id, used in list(self.last_used.items()):
+            if now - used < self.min_idle:
+                break
+            if user_id in keep:
+                continue
+            self._spill(user_id)
+            if self.resident_bytes() <= self.max_bytes:
+                return
+        self.over_budget += 1
+
+    def _segment_path(self, user_id: str) -> str:
+        name = hashlib.sha1(user_id.encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.seg")
+
+    def _spill(self, user_id: str):
+        partition = {}
+        for name in self.spillable:
+            docs = self.collections[name].scan({"user_id": user_id})
+            if docs:
+                partition[name] = docs
+        del self.last_used[user_id]
+        if not partition:
+            return
+        path = self._segment_path(user_id)
+        size = write_segment(path, partition)
+        # Only drop the documents once they are safely on disk
+        for name, docs in partition.items():
+            for doc in docs:
+                self.collections[name].remove(doc)
+        self.spilled[user_id] = (path, size)
+        self.evictions += 1
+
+    async def _load(self, user_id: str):
+        # Requests arriving while a segment is being read wait for that read
+        # instead of starting another; shielded so one cancelled request
+        # does not abandon the load for the others
+        task = self.loading.get(user_id)
+        if task is None:
+            if user_id not in self.spilled:
+                return
+            task = asyncio.ensure_future(self._read_back(user_id))
+            self.loading[user_id] = task
+            task.add_done_callback(lambda _: self.loading.pop(user_id, None))
+        await asyncio.shield(task)
+
+    async def _read_back(self, user_id: str):
+        path, _ = self.spilled[user_id]
+        start = time.perf_counter()
+        partition = await asyncio.to_thread(read_segment, path)
+        for name, docs in partition.items():
+            for doc in docs:
+                self.collections[name].insert(doc)
+        del self.spilled[user_id]
+        os.remove(path)
+        self.fault_seconds.append(time.perf_counter() - start)
+        self.faults += 1
+        # Loading is not activity: the user stays least recently active
+        # until fault_in records a request of theirs
+        self.last_used[user_id] = 0.0
+        self.last_used.move_to_end(user_id, last=False)
+
+    def stats(self) -> dict:
+        times = sorted(self.fault_seconds)
+        return {
+            "max_bytes": self.max_bytes,
+            "resident_bytes": self.resident_bytes(),
+            "resident_users": len(self.last_used),
+            "spilled_users": len(self.spilled),
+            "spilled_bytes": sum(size for _, size in self.spilled.values()),
+            "evictions": self.evictions,
+            "faults": self.faults,
+            "over_budget": self.over_budget,
+            "fault_ms": (
+                {
+                    "p50": round(times[len(times) // 2] * 1000, 3),
+                    "p99": round(times[int(len(times) * 0.99)] * 1000, 3),
+                    "max": round(times[-1] * 1000, 3),
+                }
+                if times
+                else None
+            ),
+        }
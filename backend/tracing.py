@@ -0,0 +1,336 @@
+"""Lightweight request tracing.
+
+A sampled fraction of requests (``TRACE_SAMPLE_RATE``) gets a trace: a
+root span for the route plus nested spans opened with ``span()`` - the auth
+dependency, every ``db_*`` storage helper (see ``profiling.track_db_call``),
+Gemini calls and other interesting sections. Spans carry timing and attributes such as
+the collection and row count.
+
+A request with a W3C ``traceparent`` header continues the caller's trace.
+Anyone can send that header, so by default a parent marked sampled is still
+sampled at ``TRACE_SAMPLE_RATE``; set ``TRACE_TRUST_PARENT=true`` to always
+trace it when every caller is a trusted upstream service.
+
+Unsampled requests pay for one contextvar lookup per ``span()`` call.
+Finished traces are handed to a background thread that exports them as
+OTLP/JSON, either appended to a local file (``TRACE_EXPORTER=file``, rotated
+at ``TRACE_FILE_MAX_MB`` with one backup kept) or POSTed to an OTLP/HTTP
+collector (``TRACE_EXPORTER=otlp``).
+"""
+
+import abc
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import logconfig
+
+_current_span = ContextVar("current_span", default=None)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def _new_id(nbytes: int) -> str:
+    return random.getrandbits(nbytes * 8).to_bytes(nbytes, "big").hex()
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans", "finished")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans = []
+        self.finished = False
+
+
+class Span:
+    __slots__ = (
+        "trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+        "attributes", "error",
+    )
+
+    def __init__(self, trace: Trace, name: str, parent_id=None, attributes=None, kind=1):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind  # OTLP SpanKind: 1 internal, 2 server
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def finish(self):
+        self.end_ns = time.time_ns()
+        # Work that outlives its request (e.g. a background task started by
+        # it) must not add spans to a trace that was already exported
+        if not self.trace.finished:
+            self.trace.spans.append(self)
+
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span():
+    """The active span, or None outside a sampled trace."""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Open a child span of the current span; a no-op outside a sampled trace."""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+
+def _attribute_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_payload(spans, service_name: str) -> dict:
+    """OTLP/JSON ``ExportTraceServiceRequest`` for ``spans``."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": service_name}}
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "tracing"},
+                        "spans": [
+                            {
+                                "traceId": s.trace.trace_id,
+                                "spanId": s.span_id,
+                                "parentSpanId": s.parent_id or "",
+                                "name": s.name,
+                                "kind": s.kind,
+                                "startTimeUnixNano": str(s.start_ns),
+                                "endTimeUnixNano": str(s.end_ns),
+                                "attributes": [
+                                    {"key": k, "value": _attribute_value(v)}
+                                    for k, v in s.attributes.items()
+                                ],
+                                "status": (
+                                    {"code": 2, "message": s.error}
+                                    if s.error
+                                    else {"code": 0}
+                                ),
+                            }
+                            for s in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class BackgroundExporter(threading.Thread, abc.ABC):
+    """Exports finished traces off the event loop; drops them when backed up.
+    Subclasses implement ``write``."""
+
+    def __init__(self, service_name: str, queue_size: int = 1000):
+        super().__init__(daemon=True, name="trace-exporter")
+        self.service_name = service_name
+        self.queue = queue.Queue(queue_size)
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def export(self, spans):
+        try:
+            self.queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        while True:
+            spans = self.queue.get()
+            try:
+                self.write(otlp_payload(spans, self.service_name))
+                self.exported += 1
+            except Exception:
+                self.failed += 1
+
+    @abc.abstractmethod
+    def write(self, payload: dict):
+        """Send one OTLP/JSON request; runs on the exporter thread."""
+
+
+class FileExporter(BackgroundExporter):
+    """Appends one OTLP/JSON request per trace to a JSON-lines file. Once it
+    reaches ``max_bytes`` it is renamed to ``<path>.1`` (replacing the
+    previous backup) and a new file is started."""
+
+    def __init__(self, path, service_name: str, max_bytes: int = 10 * 1024 * 1024):
+        super().__init__(service_name)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotations = 0
+
+    def write(self, payload: dict):
+        line = json.dumps(payload) + "\n"
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size and size + len(line) > self.max_bytes:
+            os.replace(self.path, f"{self.path}.1")
+            self.rotations += 1
+        with open(self.path, "a") as f:
+            f.write(line)
+
+
+class OtlpHttpExporter(BackgroundExporter):
+    """POSTs traces to an OTLP/HTTP collector (``<endpoint>/v1/traces``)."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0):
+        super().__init__(service_name)
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+
+    def write(self, payload: dict):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class Tracer:
+    """HTTP middleware that samples requests and opens their root span."""
+
+    def __init__(self, exporter=None, sample_rate: float = 0.0, trust_parent=False):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.trust_parent = trust_parent
+        self.traces = 0
+
+    @classmethod
+    def from_env(cls, root_dir):
+        sample_rate = float(os.environ.get("TRACE_SAMPLE_RATE", "0"))
+        service_name = os.environ.get("OTEL_SERVICE_NAME", "student-expense-manager")
+        kind = os.environ.get("TRACE_EXPORTER", "file")
+        exporter = None
+        if kind == "otlp":
+            exporter = OtlpHttpExporter(
+                os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318"),
+                service_name,
+            )
+        elif kind == "file":
+            exporter = FileExporter(
+                os.environ.get("TRACE_FILE", str(root_dir / "traces.jsonl")),
+                service_name,
+                int(float(os.environ.get("TRACE_FILE_MAX_MB", "10")) * 1024 * 1024),
+            )
+        trust_parent = os.environ.get("TRACE_TRUST_PARENT", "false").lower() == "true"
+        return cls(exporter, sample_rate, trust_parent)
+
+    def _sampled(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _start(self, request):
+        """Root span for ``request``, or None if it is not sampled."""
+        match = _TRACEPARENT.match(request.headers.get("traceparent", ""))
+        if match:
+            if not int(match.group(3), 16) & 1:
+                return None
+            if not (self.trust_parent or self._sampled()):
+                return None
+            trace_id, parent_id = match.group(1), match.group(2)
+        elif self._sampled():
+            trace_id, parent_id = _new_id(16), None
+        else:
+            return None
+        root = Span(
+            Trace(trace_id),
+            request.method,
+            parent_id,
+            {"http.method": request.method, "http.target": request.url.path},
+            kind=2,
+        )
+        request_id = logconfig.request_id_var.get()
+        if request_id:
+            root.set_attribute("request_id", request_id)
+        return root
+
+    def stats(self) -> dict:
+        exporter = self.exporter
+        return {
+            "sample_rate": self.sample_rate,
+            "traces": self.traces,
+            "exported": exporter.exported if exporter else 0,
+            "dropped": exporter.dropped if exporter else 0,
+            "failed": exporter.failed if exporter else 0,
+            "rotations": getattr(exporter, "rotations", 0),
+        }
+
+    async def __call__(self, request, call_next):
+        if self.exporter is None:
+            return await call_next(request)
+        root = self._start(request)
+        if root is None:
+            return await call_next(request)
+
+        if not self.exporter.is_alive():
+            self.exporter.start()
+        self.traces += 1
+        token = _current_span.set(root)
+        try:
+            response = await call_next(request)
+            root.set_attribute("http.status_code", response.status_code)
+            response.headers["traceparent"] = (
+                f"00-{root.trace.trace_id}-{root.span_id}-01"
+            )
+            return response
+        except BaseException as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            route = request.scope.get("route")
+            if route is not None:
+                root.name = f"{request.method} {route.path}"
+                root.set_attribute("http.route", route.path)
+            root.finish()
+            root.trace.finished = True
+            self.exporter.export(root.trace.spans)
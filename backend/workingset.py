@@ -0,0 +1,260 @@
+"""Write-through cache of hot users' working sets (MongoDB mode).
+
+A working set is every document of one partition: a user's expenses,
+budgets or savings goals, a group's expenses, or a group document (the
+``partitions`` mapping says which field partitions each collection). The
+first read of a partition loads it from the primary; later reads whose
+filter pins the partition field are answered from memory, and the ``db_*``
+write helpers apply each successful write to the cached copy.
+
+Working sets are evicted least recently used first once their estimated
+size exceeds ``max_bytes``; partitions larger than ``max_docs`` are never
+cached, and are remembered as such for ``ttl`` seconds so that their reads
+go straight to the database instead of loading the partition on every miss.
+Entries also expire after ``ttl`` seconds, which bounds how long a write
+made by another server process can go unseen.
+"""
+
+import time
+from collections import OrderedDict
+
+from memory_store import QUERY_OPERATORS, MemoryCollection
+
+
+def supports(query) -> bool:
+    """Whether the in-memory evaluator understands every condition in ``query``."""
+    for key, condition in (query or {}).items():
+        if key.startswith("$"):
+            return False
+        if isinstance(condition, dict) and not (
+            condition and all(op in QUERY_OPERATORS for op in condition)
+        ):
+            return False
+    return True
+
+
+def copy_doc(value):
+    """Copy a document so callers cannot mutate the cached one."""
+    if isinstance(value, dict):
+        return {key: copy_doc(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_doc(item) for item in value]
+    return value
+
+
+class WorkingSet:
+    __slots__ = ("docs", "expires")
+
+    def __init__(self, docs, expires):
+        self.docs = MemoryCollection(("id", "_id"))
+        self.expires = expires
+        for doc in docs:
+            self.add(doc)
+
+    @property
+    def size(self) -> int:
+        return self.docs.bytes
+
+    def add(self, doc):
+        # An insert that raced the load may already be in the partition
+        # (the driver sets _id on the document it inserted)
+        if doc.get("_id") is not None:
+            cached = self.docs.find_one({"_id": doc["_id"]})
+            if cached is not None:
+                self.docs.remove(cached)
+        self.docs.insert(copy_doc(doc))
+
+    def remove(self, doc):
+        self.docs.remove(doc)
+
+    def update(self, doc, update):
+        self.docs.update(doc, copy_doc(update))
+
+
+class WorkingSetCache:
+    def __init__(self, partitions, max_bytes: int, ttl: float = 30.0, max_docs: int = 1000):
+        self.partitions = partitions  # collection -> partition field
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_docs = max_docs
+        self.sets = OrderedDict()  # (collection, value) -> WorkingSet
+        self.bytes = 0
+        # Partitions being loaded -> [loads in progress, written meanwhile]
+        self.loading = {}
+        # Partitions found too large to cache -> when to try loading again
+        self.oversized = OrderedDict()
+        self.max_oversized = 10_000
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncacheable = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def partition(self, collection, query):
+        """Cache key for a query that pins one partition, else None."""
+        field = self.partitions.get(collection)
+        if not self.enabled or field is None or not query or not supports(query):
+            return None
+        value = query.get(field)
+        if value is None or isinstance(value, (dict, list)):
+            return None
+        return (collection, value)
+
+    def is_oversized(self, key) -> bool:
+        """Whether ``key`` was too large to cache less than ``ttl`` ago."""
+        expires = self.oversized.get(key)
+        if expires is None:
+            return False
+        if expires <= time.monotonic():
+            del self.oversized[key]
+            return False
+        return True
+
+    def _mark_oversized(self, key):
+        self.uncacheable += 1
+        self.oversized.pop(key, None)
+        self.oversized[key] = time.monotonic() + self.ttl
+        if len(self.oversized) > self.max_oversized:
+            self.oversized.popitem(last=False)
+
+    def get(self, key):
+        working_set = self.sets.get(key)
+        if working_set is not None and working_set.expires <= time.monotonic():
+            self.drop(key)
+            working_set = None
+        if working_set is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.sets.move_to_end(key)
+        return working_set.docs
+
+    def begin_load(self, key):
+        self.loading.setdefault(key, [0, False])[0] += 1
+
+    def end_load(self, key, docs):
+        """Cache the loaded partition unless it was written during the load
+        (or the load failed, ``docs`` None)."""
+        state = self.loading[key]
+        state[0] -= 1
+        if state[0] == 0:
+            del self.loading[key]
+        if state[1] or docs is None:
+            return None
+        if len(docs) > self.max_docs:
+            self._mark_oversized(key)
+            return None
+        working_set = WorkingSet(docs, time.monotonic() + self.ttl)
+        if working_set.size > self.max_bytes:
+            self._mark_oversized(key)
+            return None
+        self.drop(key)
+        self.sets[key] = working_set
+        self.bytes += working_set.size
+        self._evict()
+        return working_set.docs
+
+    def drop(self, key):
+        working_set = self.sets.pop(key, None)
+        if working_set is not None:
+            self.bytes -= working_set.size
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self.sets:
+            _, working_set = self.sets.popitem(last=False)
+            self.bytes -= working_set.size
+            self.evictions += 1
+
+    def _touch(self, key):
+        if key in self.loading:
+            self.loading[key][1] = True
+
+    def _affected(self, collection, query):
+        """(key, working set) pairs a write with ``query`` may touch."""
+        key = self.partition(collection, query)
+        if key is not None:
+            self._touch(key)
+            working_set = self.sets.get(key)
+            return [(key, working_set)] if working_set else []
+        if collection not in self.partitions:
+            return []
+        for loading_key in self.loading:
+            if loading_key[0] == collection:
+                self._touch(loading_key)
+        return [(k, ws) for k, ws in self.sets.items() if k[0] == collection]
+
+    # Write-through hooks, called after the database write succeeded
+
+    def inserted(self, collection, document):
+        field = self.partitions.get(collection)
+        if field is None or not self.enabled:
+            return
+        key = (collection, document.get(field))
+        self._touch(key)
+        working_set = self.sets.get(key)
+        if working_set is not None:
+            before = working_set.size
+            working_set.add(document)
+            self.bytes += working_set.size - before
+            self._evict()
+
+    def updated(self, collection, query, update):
+        field = self.partitions.get(collection)
+        simple = supports(query) and set(update) <= {"$set", "$unset"}
+        moves = field in update.get("$set", {}) or field in update.get("$unset", {})
+        for key, working_set in self._affected(collection, query):
+            doc = working_set.docs.find_one(query) if simple else None
+            if doc is None and simple:
+                continue
+            if not simple or moves:
+                self.drop(key)
+                if moves:
+                    moved_to = (collection, update.get("$set", {}).get(field))
+                    self._touch(moved_to)
+                    self.drop(moved_to)
+                continue
+            before = working_set.size
+            working_set.update(doc, update)
+            self.bytes += working_set.size - before
+            return
+
+    def deleted(self, collection, query, many=False):
+        for key, working_set in self._affected(collection, query):
+            if not supports(query):
+                self.drop(key)
+                continue
+            before = working_set.size
+            for doc in working_set.docs.scan(query):
+                working_set.remove(doc)
+                if not many:
+                    break
+            self.bytes += working_set.size - before
+
+    def forget(self, collection, document):
+        """Drop the cached partition ``document`` belongs to."""
+        field = self.partitions.get(collection)
+        if field is not None:
+            key = (collection, document.get(field))
+            self._touch(key)
+            self.drop(key)
+
+    def invalidate(self, collection, query):
+        for key, _ in self._affected(collection, query):
+            self.drop(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "partitions": len(self.sets),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "uncacheable": self.uncacheable,
+            "oversized_partitions": len(self.oversized),
+        }
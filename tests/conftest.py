@@ -0,0 +1,65 @@
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# The app reads its settings at import time: keep the tests in memory, quiet
+# and free of rate limits before anything imports ``server``.
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("ADMIN_TOKEN", "test-admin-token")
+os.environ.setdefault("TRACE_EXPORTER", "none")
+os.environ.setdefault("PROFILE_SAMPLE_RATE", "0")
+os.environ.setdefault("PROFILE_DIR", tempfile.mkdtemp(prefix="profiles-"))
+os.environ.setdefault("EXPORT_DIR", tempfile.mkdtemp(prefix="exports-"))
+os.environ.setdefault("RATE_LIMIT_AUTH", "1000/1000")
+os.environ.setdefault("RATE_LIMIT_DEFAULT", "1000/1000")
+
+
+@pytest.fixture(scope="session")
+def server():
+    import server
+
+    return server
+
+
+@pytest.fixture(scope="session")
+def client(server):
+    from fastapi.testclient import TestClient
+
+    return TestClient(server.app)
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Authorization headers for a freshly registered user."""
+    email = f"{uuid.uuid4().hex}@example.com"
+    credentials = {"email": email, "password": "correct horse"}
+    response = client.post("/api/auth/register", json={"name": "Test", **credentials})
+    assert response.status_code == 200, response.text
+    response = client.post("/api/auth/login", json=credentials)
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def user(server):
+    """A user to pass straight to route functions, bypassing auth."""
+    return server.User(
+        email=f"{uuid.uuid4().hex}@example.com", name="Test", password_hash="unused"
+    )
+
+
+@pytest.fixture
+def mongo(server, monkeypatch):
+    """Run the server against a fresh ``tests.fake_motor.FakeDatabase``."""
+    from tests.fake_motor import FakeDatabase
+
+    database = FakeDatabase()
+    monkeypatch.setattr(server, "db", database)
+    return database
@@ -0,0 +1,212 @@
+"""A small in-memory stand-in for the motor database the server talks to.
+
+Only the calls ``server.py`` makes are implemented. Every call is recorded in
+``FakeDatabase.calls`` as ``(collection, operation, read preference)`` so
+tests can assert where reads were routed and how often storage was hit.
+"""
+
+import itertools
+
+from memory_store import MemoryCollection, project
+
+_ids = itertools.count(1)
+
+
+class Result:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def _apply(document, update):
+    document.update(update.get("$set", {}))
+    for key, amount in update.get("$inc", {}).items():
+        document[key] = document.get(key, 0) + amount
+    for key in update.get("$unset", {}):
+        document.pop(key, None)
+
+
+def _project(document, projection):
+    if not projection:
+        return dict(document)
+    return project(document, [field for field in projection if field != "_id"])
+
+
+class FakeCursor:
+    def __init__(self, documents, projection=None):
+        self.documents = documents
+        self.projection = projection
+
+    def sort(self, key, direction):
+        self.documents.sort(key=lambda d: d.get(key, 0), reverse=direction == -1)
+        return self
+
+    def skip(self, count):
+        self.documents = self.documents[count:]
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length):
+        documents = self.documents[:length] if length else self.documents
+        return [_project(d, self.projection) for d in documents]
+
+
+class FakeCollection:
+    def __init__(self, database, name, read_preference="primary"):
+        self.database = database
+        self.name = name
+        self.read_preference = read_preference
+        self.store = database.stores.setdefault(
+            name, MemoryCollection(("id", "user_id"))
+        )
+
+    def _record(self, operation):
+        self.database.calls.append((self.name, operation, self.read_preference))
+
+    def with_options(self, read_preference=None, **_):
+        mode = read_preference.mongos_mode if read_preference else self.read_preference
+        return FakeCollection(self.database, self.name, mode)
+
+    def find(self, query=None, projection=None):
+        self._record("find")
+        return FakeCursor(self.store.find(query), projection)
+
+    async def find_one(self, query, projection=None):
+        self._record("find_one")
+        document = self.store.find_one(query)
+        return None if document is None else _project(document, projection)
+
+    async def count_documents(self, query, limit=None):
+        self._record("count")
+        return self.store.count(query, limit)
+
+    def aggregate(self, pipeline):
+        # Only the $match/$group pipeline built by db_group_sum
+        self._record("aggregate")
+        self.database.pipelines.append((self.name, pipeline))
+        group = pipeline[1]["$group"]
+        totals = self.store.group_sum(
+            pipeline[0]["$match"],
+            group["_id"][1:] if group["_id"] else None,
+            group["total"]["$sum"][1:] if group["total"]["$sum"] else None,
+        )
+        return FakeCursor([{"_id": key, **value} for key, value in totals.items()])
+
+    async def insert_one(self, document, session=None):
+        self._record("insert_one")
+        document.setdefault("_id", next(_ids))
+        self.store.insert(dict(document))
+        return Result(inserted_id=document["_id"])
+
+    async def insert_many(self, documents, ordered=True, session=None):
+        self._record("insert_many")
+        for document in documents:
+            document.setdefault("_id", next(_ids))
+            self.store.insert(dict(document))
+        return Result(inserted_ids=[d["_id"] for d in documents])
+
+    async def update_one(self, query, update, upsert=False, session=None):
+        self._record("update_one")
+        document = self.store.find_one(query)
+        if document is None:
+            if not upsert:
+                return Result(matched_count=0, modified_count=0, upserted_id=None)
+            document = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            document.update(update.get("$setOnInsert", {}))
+            _apply(document, update)
+            document["_id"] = next(_ids)
+            self.store.insert(document)
+            return Result(
+                matched_count=0, modified_count=0, upserted_id=document["_id"]
+            )
+        updated = dict(document)
+        _apply(updated, update)
+        self.store.remove(document)
+        self.store.insert(updated)
+        return Result(matched_count=1, modified_count=1, upserted_id=None)
+
+    async def update_many(self, query, update, session=None):
+        self._record("update_many")
+        documents = self.store.scan(query)
+        for document in documents:
+            updated = dict(document)
+            _apply(updated, update)
+            self.store.remove(document)
+            self.store.insert(updated)
+        return Result(matched_count=len(documents), modified_count=len(documents))
+
+    async def find_one_and_update(
+        self, query, update, upsert=False, return_document=None, session=None
+    ):
+        self._record("find_one_and_update")
+        await self.update_one(query, update, upsert=upsert)
+        document = self.store.find_one(query)
+        return None if document is None else dict(document)
+
+    async def delete_one(self, query, session=None):
+        self._record("delete_one")
+        document = self.store.find_one(query)
+        if document is not None:
+            self.store.remove(document)
+        return Result(deleted_count=0 if document is None else 1)
+
+    async def delete_many(self, query, session=None):
+        self._record("delete_many")
+        documents = self.store.scan(query)
+        for document in documents:
+            self.store.remove(document)
+        return Result(deleted_count=len(documents))
+
+    async def bulk_write(self, requests, ordered=True, session=None):
+        from pymongo import DeleteOne, InsertOne, UpdateOne
+
+        for request in requests:
+            if isinstance(request, InsertOne):
+                await self.insert_one(request._doc)
+            elif isinstance(request, UpdateOne):
+                await self.update_one(request._filter, request._doc)
+            elif isinstance(request, DeleteOne):
+                await self.delete_one(request._filter)
+        return Result(inserted_count=0)
+
+    async def create_index(self, *args, **kwargs):
+        self.database.indexes.append((self.name, args, kwargs))
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.stores = {}
+        self.calls = []
+        self.indexes = []
+        self.pipelines = []  # (collection, pipeline) of each aggregate()
+
+    def __getitem__(self, name):
+        return FakeCollection(self, name)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __bool__(self):
+        # Like motor (and pymongo), so truthiness checks on db fail in tests too
+        raise NotImplementedError(
+            "Database objects do not implement truth value testing or bool()."
+        )
+
+    def documents(self, name, query=None):
+        return [dict(d) for d in self.stores.get(name, MemoryCollection()).scan(query)]
+
+    def reads(self, name):
+        """``(operation, read preference)`` of each read of collection ``name``."""
+        return [
+            (operation, preference)
+            for collection, operation, preference in self.calls
+            if collection == name
+            and operation in ("find", "find_one", "count", "aggregate")
+        ]
+
+    async def command(self, *args, **kwargs):
+        return {}
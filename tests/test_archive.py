@@ -0,0 +1,37 @@
+import asyncio
+
+
+class InlineRunner:
+    async def run_cpu(self, function, *args):
+        return function(*args)
+
+
+def expense(server, amount, date):
+    return server.ExpenseCreate(amount=amount, category="Rent", date=date)
+
+
+def test_archived_expenses_leave_the_change_feed(server, user):
+    async def scenario():
+        old = await server.create_expense(
+            expense(server, 300, "2024-03-01T00:00:00Z"), user
+        )
+        recent = await server.create_expense(
+            expense(server, 40, "2026-03-01T00:00:00Z"), user
+        )
+        token = (await server.get_expense_changes("0", 500, user))["sync_token"]
+
+        job = {"params": {"before": "2025-01-01"}}
+        result = await server.run_archive(job, InlineRunner())
+        page = await server.get_expense_changes(token, 500, user)
+        return old, recent, result, page
+
+    old, recent, result, page = asyncio.run(scenario())
+
+    assert result["archived"] >= 1
+    assert page["reset"] is False
+    assert page["deleted"] == [old.id]
+    assert page["changes"] == []
+    assert int(page["sync_token"]) > 2
+
+    snapshot = asyncio.run(server.get_expense_changes("0", 500, user))
+    assert [e.id for e in snapshot["changes"]] == [recent.id]
@@ -0,0 +1,162 @@
+import pytest
+
+
+def expense_body(amount, category="Food", notes=""):
+    return {
+        "amount": amount,
+        "category": category,
+        "date": "2026-01-10T00:00:00Z",
+        "notes": notes,
+    }
+
+
+def op(kind, id=None, data=None, resource="expenses"):
+    return {"op": kind, "resource": resource, "id": id, "data": data}
+
+
+def batch(client, headers, *operations, status=200):
+    response = client.post(
+        "/api/batch", json={"operations": list(operations)}, headers=headers
+    )
+    assert response.status_code == status, response.text
+    return response.json()
+
+
+def create(client, headers, amount, category="Food", notes=""):
+    response = client.post(
+        "/api/expenses", json=expense_body(amount, category, notes), headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def category_stats(client, headers):
+    response = client.get("/api/analytics/insights", headers=headers)
+    return {
+        item["category"]: (item["count"], item["total"])
+        for item in response.json()["categories"]
+    }
+
+
+def expenses(client, headers):
+    return {e["id"]: e for e in client.get("/api/expenses", headers=headers).json()}
+
+
+def test_mixed_operations_apply_in_order(client, auth_headers):
+    kept = create(client, auth_headers, 5)
+    dropped = create(client, auth_headers, 7)
+
+    result = batch(
+        client,
+        auth_headers,
+        op("create", data=expense_body(3, "Books")),
+        op("update", kept["id"], expense_body(6)),
+        op("delete", dropped["id"]),
+        op(
+            "create",
+            data={
+                "type": "category",
+                "category": "Food",
+                "amount": 100,
+                "month": 1,
+                "year": 2026,
+            },
+            resource="budgets",
+        ),
+    )
+
+    statuses = [r["status"] for r in result["results"]]
+    assert statuses == ["created", "updated", "deleted", "created"]
+    stored = expenses(client, auth_headers)
+    assert {e["amount"] for e in stored.values()} == {3, 6}
+    assert dropped["id"] not in stored
+    assert category_stats(client, auth_headers) == {"Food": (1, 6), "Books": (1, 3)}
+
+
+def test_repeated_updates_chain_from_the_previous_operation(client, auth_headers):
+    expense = create(client, auth_headers, 10, notes="latte")
+    token = client.get(
+        "/api/expenses/changes", params={"since": "0"}, headers=auth_headers
+    ).json()["sync_token"]
+
+    result = batch(
+        client,
+        auth_headers,
+        op("update", expense["id"], expense_body(20, "Books", "novel")),
+        op("update", expense["id"], expense_body(30, "Books", "atlas")),
+    )
+
+    assert result["results"][1]["data"]["amount"] == 30
+    assert category_stats(client, auth_headers) == {"Food": (0, 0), "Books": (1, 30)}
+    search = client.get(
+        "/api/expenses/search", params={"q": "atlas"}, headers=auth_headers
+    ).json()
+    assert [e["id"] for e in search["results"]] == [expense["id"]]
+    for stale in ("latte", "novel"):
+        assert client.get(
+            "/api/expenses/search", params={"q": stale}, headers=auth_headers
+        ).json()["total"] == 0
+    page = client.get(
+        "/api/expenses/changes", params={"since": token}, headers=auth_headers
+    ).json()
+    assert [(c["id"], c["amount"]) for c in page["changes"]] == [(expense["id"], 30)]
+
+
+def test_update_then_delete_leaves_no_stats_behind(client, auth_headers):
+    expense = create(client, auth_headers, 10)
+
+    batch(
+        client,
+        auth_headers,
+        op("update", expense["id"], expense_body(15, "Books")),
+        op("delete", expense["id"]),
+    )
+
+    assert expenses(client, auth_headers) == {}
+    assert category_stats(client, auth_headers) == {"Food": (0, 0), "Books": (0, 0)}
+
+
+@pytest.mark.parametrize(
+    "operation, error",
+    [
+        (op("update", "missing", expense_body(1)), "Not found"),
+        (op("create", data={"amount": 1}), None),
+        (op("create", data={}, resource="invoices"), "Unknown resource"),
+    ],
+)
+def test_one_invalid_operation_rejects_the_whole_batch(
+    client, auth_headers, operation, error
+):
+    existing = create(client, auth_headers, 10)
+
+    response = batch(
+        client,
+        auth_headers,
+        op("create", data=expense_body(4)),
+        op("delete", existing["id"]),
+        operation,
+        status=422,
+    )
+
+    assert [e["index"] for e in response["detail"]] == [2]
+    if error:
+        assert response["detail"][0]["error"] == error
+    assert list(expenses(client, auth_headers)) == [existing["id"]]
+    assert category_stats(client, auth_headers) == {"Food": (1, 10)}
+
+
+def test_operation_after_a_delete_of_the_same_id_is_rejected(client, auth_headers):
+    expense = create(client, auth_headers, 10)
+
+    response = batch(
+        client,
+        auth_headers,
+        op("delete", expense["id"]),
+        op("delete", expense["id"]),
+        status=422,
+    )
+
+    assert response["detail"] == [
+        {"index": 1, "error": "Already deleted in this batch"}
+    ]
+    assert list(expenses(client, auth_headers)) == [expense["id"]]
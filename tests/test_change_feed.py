@@ -0,0 +1,196 @@
+import asyncio
+
+import pytest
+
+
+def add_expense(client, headers, amount, day=1):
+    response = client.post(
+        "/api/expenses",
+        json={
+            "amount": amount,
+            "category": "Food",
+            "date": f"2026-01-{day:02d}T00:00:00Z",
+        },
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def changes(client, headers, since, limit=500):
+    response = client.get(
+        "/api/expenses/changes",
+        params={"since": since, "limit": limit},
+        headers=headers,
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_first_sync_is_a_snapshot(client, auth_headers):
+    created = [add_expense(client, auth_headers, amount) for amount in (1, 2, 3)]
+
+    page = changes(client, auth_headers, "0")
+
+    assert page["reset"] is True
+    assert {e["id"] for e in page["changes"]} == {e["id"] for e in created}
+    assert page["sync_token"] == "3"
+
+
+def test_pages_return_changes_in_write_order(client, auth_headers):
+    first = add_expense(client, auth_headers, 1)
+    token = changes(client, auth_headers, "0")["sync_token"]
+
+    second = add_expense(client, auth_headers, 2)
+    third = add_expense(client, auth_headers, 3)
+    client.put(
+        f"/api/expenses/{first['id']}",
+        json={"amount": 10, "category": "Food", "date": "2026-01-01T00:00:00Z"},
+        headers=auth_headers,
+    )
+    client.delete(f"/api/expenses/{second['id']}", headers=auth_headers)
+
+    events, pages = [], 0
+    while True:
+        page = changes(client, auth_headers, token, limit=2)
+        assert page["reset"] is False
+        events += [("change", e["id"], e["amount"]) for e in page["changes"]]
+        events += [("delete", expense_id, None) for expense_id in page["deleted"]]
+        token = page["sync_token"]
+        pages += 1
+        if not page["has_more"]:
+            break
+
+    # The deleted expense only shows up as its tombstone
+    assert pages == 2
+    assert events == [
+        ("change", third["id"], 3),
+        ("change", first["id"], 10),
+        ("delete", second["id"], None),
+    ]
+    assert changes(client, auth_headers, token) == {
+        "reset": False,
+        "changes": [],
+        "deleted": [],
+        "sync_token": token,
+        "has_more": False,
+    }
+
+
+def test_has_more_counts_events_cut_from_the_merged_page(client, auth_headers):
+    doomed = [add_expense(client, auth_headers, amount) for amount in (1, 2, 3)]
+    token = changes(client, auth_headers, "0")["sync_token"]
+    add_expense(client, auth_headers, 4)
+    add_expense(client, auth_headers, 5)
+    for expense in doomed[:2]:
+        client.delete(f"/api/expenses/{expense['id']}", headers=auth_headers)
+
+    page = changes(client, auth_headers, token, limit=3)
+
+    # Neither collection filled the page on its own, but one event is left
+    assert len(page["changes"]) + len(page["deleted"]) == 3
+    assert page["has_more"] is True
+    rest = changes(client, auth_headers, page["sync_token"], limit=3)
+    assert rest["deleted"] == [doomed[1]["id"]]
+    assert rest["has_more"] is False
+
+
+def test_snapshot_is_not_capped_at_a_thousand_rows(server, mongo, user, monkeypatch):
+    monkeypatch.setattr(server.working_sets, "max_bytes", 0)
+    expenses = mongo["expenses"].store
+    for number in range(1201):
+        expenses.insert(
+            {
+                "id": f"e{number}",
+                "user_id": user.id,
+                "amount_minor": 100,
+                "category": "Food",
+                "date": f"2026-01-01T00:{number // 60:02d}:{number % 60:02d}+00:00",
+                "change_seq": number + 1,
+            }
+        )
+    mongo["change_sequences"].store.insert({"user_id": user.id, "seq": 1201})
+
+    page = asyncio.run(server.get_expense_changes("0", 500, user))
+
+    assert page["reset"] is True
+    assert len(page["changes"]) == 1201
+    assert page["sync_token"] == "1201" and page["has_more"] is False
+
+
+def test_token_from_the_future_resets(client, auth_headers):
+    add_expense(client, auth_headers, 1)
+
+    assert changes(client, auth_headers, "99")["reset"] is True
+    assert client.get(
+        "/api/expenses/changes", params={"since": "x"}, headers=auth_headers
+    ).status_code == 400
+
+
+def test_feed_never_skips_a_write_still_in_flight(server, user, monkeypatch):
+    """A slow write holding seq 2 must not be skipped by a feed read that
+    already sees a faster write with seq 3."""
+    insert_one = server.db_insert_one
+    slow = {"pending": False, "started": None}
+
+    async def insert(collection, document):
+        if slow["pending"]:
+            slow["pending"] = False
+            slow["started"].set()
+            await asyncio.sleep(0.05)
+        await insert_one(collection, document)
+
+    monkeypatch.setattr(server, "db_insert_one", insert)
+
+    def expense(amount):
+        return server.ExpenseCreate(
+            amount=amount, category="Food", date="2026-01-01T00:00:00Z"
+        )
+
+    async def scenario():
+        await server.create_expense(expense(1), user)
+        token = (await server.get_expense_changes("0", 500, user))["sync_token"]
+
+        slow.update(pending=True, started=asyncio.Event())
+        slow_create = asyncio.create_task(server.create_expense(expense(2), user))
+        await slow["started"].wait()
+        fast_create = asyncio.create_task(server.create_expense(expense(3), user))
+        await asyncio.sleep(0)
+        page = await server.get_expense_changes(token, 500, user)
+        await asyncio.gather(slow_create, fast_create)
+        return page, await server.get_expense_changes(page["sync_token"], 500, user)
+
+    page, after = asyncio.run(scenario())
+
+    assert [e.amount for e in page["changes"]] == [2, 3]
+    assert after["changes"] == []
+
+
+def test_feed_never_skips_a_buffered_insert(server, user, monkeypatch):
+    """With group commit on, a create waits in the coalescer's buffer while
+    an update of another expense commits directly with a higher seq."""
+    coalescer = server.InsertCoalescer(server.db_insert_many, 64, 0.05)
+    monkeypatch.setattr(server, "insert_coalescer", coalescer)
+
+    def expense(amount):
+        return server.ExpenseCreate(
+            amount=amount, category="Food", date="2026-01-01T00:00:00Z"
+        )
+
+    async def scenario():
+        existing = await server.create_expense(expense(1), user)
+        token = (await server.get_expense_changes("0", 500, user))["sync_token"]
+
+        create = asyncio.create_task(server.create_expense(expense(2), user))
+        await asyncio.sleep(0.01)  # buffered, not yet flushed
+        update = asyncio.create_task(
+            server.update_expense(existing.id, expense(3), user)
+        )
+        await asyncio.sleep(0)
+        page = await server.get_expense_changes(token, 500, user)
+        await asyncio.gather(create, update)
+        return page, await server.get_expense_changes(page["sync_token"], 500, user)
+
+    page, after = asyncio.run(scenario())
+
+    assert sorted(e.amount for e in page["changes"] + after["changes"]) == [2, 3]
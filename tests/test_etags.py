@@ -0,0 +1,146 @@
+import uuid
+
+import pytest
+
+EXPENSE = {"amount": 5, "category": "Food", "date": "2026-01-01T00:00:00Z"}
+BUDGET = {
+    "type": "category",
+    "category": "Food",
+    "amount": 50,
+    "month": 1,
+    "year": 2026,
+}
+GOAL = {"title": "Laptop", "target_amount": 900, "target_date": "2026-12-01T00:00:00Z"}
+FUTURE_TEMPLATE = {
+    "amount": 9,
+    "category": "Phone",
+    "interval": "monthly",
+    "start_date": "2999-01-01T00:00:00Z",
+}
+DUE_TEMPLATE = {
+    "amount": 30,
+    "category": "Gym",
+    "interval": "weekly",
+    "start_date": "2026-01-01T00:00:00Z",
+    "end_date": "2026-01-02T00:00:00Z",
+}
+
+
+def etag(client, headers, path):
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    return response.headers["ETag"]
+
+
+def get_if_none_match(client, headers, path, tag):
+    return client.get(path, headers={**headers, "If-None-Match": tag})
+
+
+@pytest.mark.parametrize(
+    "path",
+    ["/api/expenses", "/api/budgets", "/api/savings-goals", "/api/recurring-expenses"],
+)
+def test_unchanged_collection_is_not_modified(client, auth_headers, path):
+    tag = etag(client, auth_headers, path)
+
+    response = get_if_none_match(client, auth_headers, path, tag)
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == tag
+
+
+@pytest.mark.parametrize(
+    "if_none_match, status",
+    [
+        ('"expenses-stale-0"', 200),
+        ("{tag}", 304),
+        ("W/{tag}", 304),
+        ('"other", {tag}', 304),
+        ("*", 304),
+    ],
+)
+def test_if_none_match_forms(client, auth_headers, if_none_match, status):
+    tag = etag(client, auth_headers, "/api/expenses")
+    header = if_none_match.format(tag=tag)
+
+    response = get_if_none_match(client, auth_headers, "/api/expenses", header)
+
+    assert response.status_code == status
+
+
+def test_etags_are_per_user(client, auth_headers):
+    tag = etag(client, auth_headers, "/api/expenses")
+    credentials = {"email": f"{uuid.uuid4().hex}@example.com", "password": "pw"}
+    client.post("/api/auth/register", json={"name": "Other", **credentials})
+    login = client.post("/api/auth/login", json=credentials).json()
+    other_headers = {"Authorization": f"Bearer {login['access_token']}"}
+    client.post("/api/expenses", json=EXPENSE, headers=other_headers)
+
+    response = get_if_none_match(client, auth_headers, "/api/expenses", tag)
+
+    assert response.status_code == 304
+
+
+@pytest.mark.parametrize(
+    "path, write",
+    [
+        ("/api/expenses", "create_expense"),
+        ("/api/expenses", "update_expense"),
+        ("/api/expenses", "delete_expense"),
+        ("/api/expenses", "batch"),
+        ("/api/expenses", "recurring_materialized"),
+        ("/api/budgets", "create_budget"),
+        ("/api/budgets", "batch_budget"),
+        ("/api/savings-goals", "create_goal"),
+        ("/api/savings-goals", "add_to_goal"),
+        ("/api/recurring-expenses", "create_template"),
+        ("/api/recurring-expenses", "delete_template"),
+    ],
+)
+def test_every_write_path_invalidates_the_etag(client, auth_headers, path, write):
+    def post(url, body):
+        return client.post(url, json=body, headers=auth_headers)
+
+    def batch(resource, data):
+        operation = {"op": "create", "resource": resource, "data": data}
+        return post("/api/batch", {"operations": [operation]})
+
+    expense = post("/api/expenses", EXPENSE).json()
+    goal = post("/api/savings-goals", GOAL).json()
+    template = post("/api/recurring-expenses", FUTURE_TEMPLATE).json()
+    tag = etag(client, auth_headers, path)
+
+    writes = {
+        "create_expense": lambda: post("/api/expenses", EXPENSE),
+        "update_expense": lambda: client.put(
+            f"/api/expenses/{expense['id']}",
+            json={**EXPENSE, "amount": 6},
+            headers=auth_headers,
+        ),
+        "delete_expense": lambda: client.delete(
+            f"/api/expenses/{expense['id']}", headers=auth_headers
+        ),
+        "batch": lambda: batch("expenses", EXPENSE),
+        # Due occurrences are written by the next read of the listing
+        "recurring_materialized": lambda: post("/api/recurring-expenses", DUE_TEMPLATE),
+        "create_budget": lambda: post("/api/budgets", BUDGET),
+        "batch_budget": lambda: batch("budgets", BUDGET),
+        "create_goal": lambda: post("/api/savings-goals", GOAL),
+        "add_to_goal": lambda: client.put(
+            f"/api/savings-goals/{goal['id']}/add-amount",
+            params={"amount": 10},
+            headers=auth_headers,
+        ),
+        "create_template": lambda: post("/api/recurring-expenses", FUTURE_TEMPLATE),
+        "delete_template": lambda: client.delete(
+            f"/api/recurring-expenses/{template['id']}", headers=auth_headers
+        ),
+    }
+    assert writes[write]().status_code == 200
+
+    response = get_if_none_match(client, auth_headers, path, tag)
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != tag
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import pubsub
+from pubsub import PubSubHub, StreamTickets
+
+
+def test_ticket_is_single_use_and_short_lived(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pubsub.time, "monotonic", lambda: now[0])
+    tickets = StreamTickets(ttl=30.0)
+
+    first, second = tickets.issue("u1"), tickets.issue("u1")
+
+    assert first != second
+    assert tickets.redeem(first) == "u1"
+    assert tickets.redeem(first) is None
+    assert tickets.redeem("made-up") is None
+    now[0] += 31
+    assert tickets.redeem(second) is None
+
+
+def test_expired_and_excess_tickets_are_pruned(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(pubsub.time, "monotonic", lambda: now[0])
+    tickets = StreamTickets(ttl=30.0, max_tickets=2)
+    stale = tickets.issue("u1")
+    now[0] += 31
+
+    kept = [tickets.issue("u2"), tickets.issue("u3"), tickets.issue("u4")]
+
+    assert stale not in tickets.tickets
+    assert list(tickets.tickets) == kept[1:]
+
+
+def test_resubscribe_keeps_queued_frames():
+    hub = PubSubHub()
+    subscription = hub.subscribe(["user:1"])
+    hub.publish("user:1", "expense.created", {"id": "a"})
+
+    hub.resubscribe(subscription, ["user:1", "group:g"])
+    hub.publish("group:g", "group_expense.created", {"id": "b"})
+
+    assert subscription.queue.qsize() == 2
+    assert hub.topics == {"user:1": {subscription}, "group:g": {subscription}}
+
+
+def test_stream_connects_with_a_ticket_once(server, client, auth_headers):
+    response = client.post("/api/events/ticket", headers=auth_headers)
+    assert response.status_code == 200, response.text
+    ticket = response.json()["ticket"]
+
+    async def connect():
+        response = await server.stream_events(None, ticket=ticket, credentials=None)
+        frames = response.body_iterator
+        assert await anext(frames) == ": connected\n\n"
+        subscribed = dict(server.event_hub.topics)
+        await frames.aclose()
+        return subscribed
+
+    topics = asyncio.run(connect())
+    assert any(topic.startswith("user:") for topic in topics)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(connect())
+    assert error.value.status_code == 401
+
+
+def test_jwt_in_the_query_string_is_not_accepted(client, auth_headers):
+    token = auth_headers["Authorization"].split()[1]
+
+    response = client.get("/api/events", params={"token": token})
+
+    assert response.status_code == 401
+
+
+def test_open_streams_follow_group_membership(server, user):
+    other = server.User(email="other@example.com", name="Other", password_hash="x")
+
+    async def scenario():
+        mine = server.event_hub.subscribe(await server.event_topics(user.id))
+        theirs = server.event_hub.subscribe(await server.event_topics(other.id))
+        try:
+            group = await server.create_group(
+                server.Group(name="Flat", created_by=user.id), user
+            )
+            topic = f"group:{group['id']}"
+            assert topic in mine.topics and topic not in theirs.topics
+
+            await server.add_group_member(
+                group["id"],
+                server.GroupMember(
+                    user_id=other.id, name=other.name, email=other.email
+                ),
+                user,
+            )
+            assert topic in theirs.topics
+            return server.event_hub.publish(topic, "group_expense.created", {})
+        finally:
+            server.event_hub.unsubscribe(mine)
+            server.event_hub.unsubscribe(theirs)
+
+    assert asyncio.run(scenario()) == 2
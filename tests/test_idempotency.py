@@ -0,0 +1,93 @@
+import uuid
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.responses import JSONResponse
+
+import profiling
+from idempotency import HEADER, CachedResponse, IdempotencyCache
+
+
+def cookie_app():
+    app = FastAPI()
+    calls = []
+
+    @app.post("/api/expenses")
+    async def create():
+        calls.append(1)
+        response = JSONResponse({"call": len(calls)})
+        response.set_cookie("a", "1")
+        response.set_cookie("b", "2")
+        response.headers["X-Profile-Id"] = f"profile-{len(calls)}"
+        return response
+
+    app.middleware("http")(
+        IdempotencyCache([("POST", r"^/api/expenses$")], lambda request: "u1")
+    )
+    return TestClient(app), calls
+
+
+def test_replay_keeps_repeated_headers_and_drops_per_request_ones():
+    client, calls = cookie_app()
+    headers = {HEADER: "key-1"}
+
+    first = client.post("/api/expenses", headers=headers)
+    replay = client.post("/api/expenses", headers=headers)
+
+    assert len(calls) == 1
+    assert replay.json() == first.json() == {"call": 1}
+    cookies = first.headers.get_list("set-cookie")
+    assert [cookie.split(";")[0] for cookie in cookies] == ["a=1", "b=2"]
+    assert replay.headers.get_list("set-cookie") == cookies
+    assert first.headers["x-profile-id"] == "profile-1"
+    assert "x-profile-id" not in replay.headers
+    assert replay.headers["idempotent-replayed"] == "true"
+
+
+def test_key_reused_for_a_different_request_is_rejected(client, auth_headers):
+    headers = {**auth_headers, HEADER: uuid.uuid4().hex}
+    body = {"amount": 3, "category": "Food", "date": "2026-01-01T00:00:00Z"}
+
+    first = client.post("/api/expenses", json=body, headers=headers)
+    other = client.post("/api/expenses", json={**body, "amount": 4}, headers=headers)
+
+    assert first.status_code == 200
+    assert other.status_code == 422
+
+
+def test_replayed_expense_write_is_not_attributed_to_the_first_profile(
+    server, client, auth_headers
+):
+    headers = {
+        **auth_headers,
+        HEADER: uuid.uuid4().hex,
+        profiling.PROFILE_HEADER: server.ADMIN_TOKEN,
+    }
+    body = {"amount": 3, "category": "Food", "date": "2026-01-01T00:00:00Z"}
+
+    first = client.post("/api/expenses", json=body, headers=headers)
+    replay = client.post("/api/expenses", json=body, headers=headers)
+
+    assert replay.json()["id"] == first.json()["id"]
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert replay.headers.get("x-profile-id") != first.headers["x-profile-id"]
+    assert replay.headers["x-request-id"] != first.headers["x-request-id"]
+
+
+def test_cache_is_bounded_by_bytes():
+    cache = IdempotencyCache([], lambda request: "u1", max_bytes=1000)
+
+    def entry(body_size):
+        headers = [(b"content-type", b"text/plain")]
+        return CachedResponse("f", 200, headers, b"x" * body_size, 100.0)
+
+    for n in range(5):
+        cache.store(("u1", f"k{n}"), entry(300), now=0.0)
+
+    assert list(cache.entries) == [("u1", "k2"), ("u1", "k3"), ("u1", "k4")]
+    assert cache.bytes == sum(e.size for e in cache.entries.values()) <= 1000
+    # Replacing or expiring an entry gives its bytes back
+    cache.store(("u1", "k4"), entry(10), now=0.0)
+    assert cache.lookup(("u1", "k2"), now=200.0) is None
+    assert cache.bytes == sum(e.size for e in cache.entries.values())
+    assert cache.stats()["bytes"] == cache.bytes
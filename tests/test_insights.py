@@ -0,0 +1,126 @@
+import asyncio
+import math
+
+import insights
+
+
+def stats_with(*amounts):
+    stats = insights.new_stats("u", "Food")
+    for amount in amounts:
+        stats.update(insights.ewma_after(stats, amount, alpha=0.5))
+        for field, delta in insights.amount_deltas(None, amount).items():
+            stats[field] += delta
+    return stats
+
+
+def test_amount_deltas_for_create_update_and_delete():
+    assert insights.amount_deltas(None, 300) == {
+        "count": 1,
+        "total": 300,
+        "sum_squares": 90000.0,
+    }
+    assert insights.amount_deltas(300, 500) == {
+        "count": 0,
+        "total": 200,
+        "sum_squares": 160000.0,
+    }
+    assert insights.amount_deltas(500, None) == {
+        "count": -1,
+        "total": -500,
+        "sum_squares": -250000.0,
+    }
+
+
+def test_ewma_starts_at_the_first_amount_and_moves_towards_new_ones():
+    stats = insights.new_stats("u", "Food")
+    assert insights.ewma_after(stats, 400) == {"ewma_mean": 400, "ewma_var": 0.0}
+
+    stats = stats_with(400)
+    after = insights.ewma_after(stats, 600, alpha=0.5)
+    assert after["ewma_mean"] == 500
+    assert after["ewma_var"] == 0.5 * (0 + 200 * 100)
+
+
+def test_summarize_reports_exact_mean_and_std_in_major_units():
+    summary = insights.summarize(stats_with(100, 300))
+
+    assert summary["count"] == 2
+    assert summary["total"] == 4.0
+    assert summary["mean"] == 2.0
+    assert summary["std"] == 1.0
+
+
+def test_summarize_of_an_emptied_category():
+    stats = stats_with(250)
+    for field, delta in insights.amount_deltas(250, None).items():
+        stats[field] += delta
+
+    summary = insights.summarize(stats)
+    assert (summary["count"], summary["total"], summary["mean"]) == (0, 0.0, 0.0)
+
+
+def test_outlier_needs_history_and_a_large_z_score():
+    few = stats_with(*[1000] * (insights.OUTLIER_MIN_COUNT - 1))
+    assert insights.outlier_score(few, 100000) is None
+
+    steady = stats_with(*[1000] * insights.OUTLIER_MIN_COUNT)
+    assert insights.outlier_score(steady, 1050) is None
+    # The std floor is 10% of the mean, so 2000 is 10 standard deviations out
+    assert math.isclose(insights.outlier_score(steady, 2000), 10.0)
+
+
+def test_stats_to_minor_units_scales_every_money_field():
+    legacy = {"total": 12.5, "sum_squares": 156.25, "ewma_mean": 12.5, "ewma_var": 1.0}
+
+    assert insights.stats_to_minor_units(legacy) == {
+        "units": "minor",
+        "total": 1250,
+        "sum_squares": 1562500.0,
+        "ewma_mean": 1250.0,
+        "ewma_var": 10000.0,
+    }
+
+
+def test_concurrent_writes_keep_exact_aggregates(server, mongo, user, monkeypatch):
+    """Every write reads the statistics before updating them; interleaved
+    writes must not lose each other's counts."""
+    find_one = server.db_find_one
+
+    async def interleaving_find_one(collection, query, *args, **kwargs):
+        document = await find_one(collection, query, *args, **kwargs)
+        await asyncio.sleep(0)
+        return document
+
+    monkeypatch.setattr(server, "db_find_one", interleaving_find_one)
+
+    def expense(n):
+        return {"id": f"e{n}", "category": "Food", "amount_minor": 100 * n}
+
+    async def scenario():
+        creates = [
+            server.update_spending_stats(user.id, new=expense(n)) for n in range(1, 9)
+        ]
+        await asyncio.gather(*creates)
+        await asyncio.gather(
+            server.update_spending_stats(user.id, old=expense(1)),
+            server.update_spending_stats(user.id, old=expense(2), new=expense(20)),
+        )
+
+    asyncio.run(scenario())
+
+    [stats] = mongo.documents("category_stats", {"user_id": user.id})
+    amounts = [300, 400, 500, 600, 700, 800, 2000]
+    assert stats["count"] == len(amounts)
+    assert stats["total"] == sum(amounts)
+    assert stats["sum_squares"] == sum(float(a) * a for a in amounts)
+    assert stats["units"] == "minor"
+
+
+def test_category_stats_are_unique_per_user_and_category(server, mongo):
+    asyncio.run(server.ensure_indexes())
+
+    assert (
+        "category_stats",
+        ([("user_id", 1), ("category", 1)],),
+        {"unique": True},
+    ) in mongo.indexes
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from jobs import JobRunner, QueueFullError
+
+
+class Storage:
+    def __init__(self, insert_delay=0.0, failing_updates=0):
+        self.jobs = {}
+        self.insert_delay = insert_delay
+        self.failing_updates = failing_updates
+
+    async def insert_job(self, job):
+        await asyncio.sleep(self.insert_delay)
+        self.jobs[job["id"]] = job
+
+    async def update_job(self, job_id, fields):
+        if self.failing_updates:
+            self.failing_updates -= 1
+            raise ConnectionError("storage unavailable")
+        self.jobs[job_id].update(fields)
+
+
+async def echo(job, runner):
+    return {"echo": job["params"]}
+
+
+def test_concurrent_submits_never_overfill_the_queue():
+    storage = Storage(insert_delay=0.01)
+    runner = JobRunner(storage.insert_job, storage.update_job, queue_size=2)
+    runner.register("echo", echo)
+
+    async def scenario():
+        return await asyncio.gather(
+            *(runner.submit("echo", "u1", {"n": n}) for n in range(4)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(scenario())
+
+    assert sum(isinstance(r, QueueFullError) for r in results) == 2
+    assert runner.queue.qsize() == 2
+    assert len(storage.jobs) == 2  # rejected submits leave no job behind
+
+
+def test_worker_survives_storage_errors():
+    storage = Storage()
+    runner = JobRunner(storage.insert_job, storage.update_job, workers=1)
+    runner.register("echo", echo)
+
+    async def scenario():
+        await runner.start()
+        first = await runner.submit("echo", "u1", {"n": 1})
+        # Marking the first job running fails, and so does recording that
+        storage.failing_updates = 2
+        second = await runner.submit("echo", "u1", {"n": 2})
+        await asyncio.wait_for(runner.queue.join(), 5)
+        await runner.stop()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert runner.failed == 1
+    assert storage.jobs[second["id"]]["status"] == "completed"
+    assert storage.jobs[second["id"]]["result"] == {"echo": {"n": 2}}
+
+
+def test_unknown_job_type_is_rejected():
+    runner = JobRunner(Storage().insert_job, Storage().update_job)
+
+    with pytest.raises(ValueError):
+        asyncio.run(runner.submit("missing", "u1", {}))
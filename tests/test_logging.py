@@ -0,0 +1,13 @@
+import logging
+
+
+def test_each_request_is_logged_once(server, client, caplog):
+    caplog.set_level(logging.INFO)
+
+    client.get("/api/")
+
+    access = [record for record in caplog.records if "access" in record.name]
+    assert [record.name for record in access] == ["app.access"]
+    assert access[0].status == 200
+    # uvicorn's own access log would repeat the same line
+    assert logging.getLogger("uvicorn.access").disabled
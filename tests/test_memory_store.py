@@ -0,0 +1,196 @@
+import asyncio
+import random
+
+import pytest
+
+from memory_store import MemoryCollection, matches
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ({"amount": 5}, True),
+        ({"amount": 6}, False),
+        ({"amount": {"$gt": 4, "$lte": 5}}, True),
+        ({"amount": {"$gte": 6}}, False),
+        ({"amount": {"$lt": 5}}, False),
+        ({"missing": {"$gt": 0}}, False),  # None never compares
+        ({"missing": {"$lt": 0}}, False),
+        ({"amount": {"$ne": 5}}, False),
+        ({"missing": {"$ne": 5}}, True),
+        ({"category": {"$in": ["Food", "Books"]}}, True),
+        ({"category": {"$in": []}}, False),
+        ({"meta": {"tag": "x"}}, True),  # plain sub-document equality
+        ({"meta": {}}, False),
+        ({"amount": 5, "category": "Books"}, False),
+    ],
+)
+def test_operator_evaluation(query, expected):
+    document = {"amount": 5, "category": "Food", "meta": {"tag": "x"}}
+
+    assert matches(document, query) is expected
+
+
+def test_index_narrows_the_scan_to_one_bucket():
+    collection = MemoryCollection(("user_id",))
+    for n in range(100):
+        collection.insert({"user_id": f"u{n % 10}", "n": n})
+
+    candidates = collection.candidates({"user_id": "u3", "n": {"$gt": 50}})
+
+    assert len(candidates) == 10
+    found = collection.scan({"user_id": "u3", "n": {"$gt": 50}})
+    assert sorted(doc["n"] for doc in found) == [53, 63, 73, 83, 93]
+    # Operator conditions on an indexed field fall back to a full scan
+    assert len(collection.candidates({"user_id": {"$in": ["u1"]}})) == 100
+
+
+def test_index_follows_updates_and_removals():
+    collection = MemoryCollection(("id", "user_id"))
+    document = {"id": "a", "user_id": "u1", "amount": 1}
+    collection.insert(document)
+    empty_size = MemoryCollection().bytes
+
+    collection.update(document, {"$set": {"user_id": "u2"}, "$inc": {"amount": 2}})
+
+    assert collection.find({"user_id": "u1"}) == []
+    assert collection.find({"user_id": "u2"}) == [
+        {"id": "a", "user_id": "u2", "amount": 3}
+    ]
+    collection.remove(document)
+    assert collection.find_one({"id": "a"}) is None
+    assert collection.indexes == {"id": {}, "user_id": {}}
+    assert collection.bytes == empty_size
+
+
+def test_unhashable_values_are_matched_without_an_index():
+    collection = MemoryCollection(("user_id",))
+    collection.insert({"user_id": ["odd"], "n": 1})
+
+    assert collection.find({"user_id": ["odd"]}) == [{"user_id": ["odd"], "n": 1}]
+
+
+def random_documents(count, seed=7):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"d{n}",
+            "user_id": rng.choice(["u1", "u2", "u3"]),
+            "category": rng.choice(["Food", "Books", "Rent", None]),
+            "amount_minor": rng.choice([None, rng.randint(0, 5000)]),
+            "date": f"2026-{rng.randint(1, 12):02d}-01",
+        }
+        for n in range(count)
+    ]
+
+
+QUERIES = [
+    {},
+    {"user_id": "u1"},
+    {"user_id": "u2", "category": "Food"},
+    {"user_id": "u3", "date": {"$gte": "2026-03-01", "$lt": "2026-07-01"}},
+    {"category": {"$in": ["Books", "Rent"]}, "amount_minor": {"$gt": 1000}},
+    {"id": "d17"},
+    {"user_id": "u1", "category": {"$ne": None}},
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_indexed_queries_match_a_plain_scan(query):
+    documents = random_documents(300)
+    collection = MemoryCollection(("id", "user_id"))
+    for document in documents:
+        collection.insert(document)
+    expected = [d for d in documents if matches(d, query)]
+
+    assert sorted(collection.find(query), key=lambda d: d["id"]) == sorted(
+        expected, key=lambda d: d["id"]
+    )
+    assert collection.count(query) == len(expected)
+    assert collection.count(query, limit=3) == min(3, len(expected))
+
+    groups = collection.group_sum(query, "category", "amount_minor")
+    for category in {d["category"] for d in expected}:
+        rows = [d for d in expected if d["category"] == category]
+        assert groups[category] == {
+            "total": sum(d["amount_minor"] or 0 for d in rows),
+            "count": len(rows),
+        }
+    assert len(groups) == len({d["category"] for d in expected})
+
+
+def test_memory_backend_group_sum_matches_a_plain_scan(server, user):
+    query = {"user_id": user.id, "date": {"$gte": "2026-01-01T00:00:00+00:00"}}
+    amounts = {"Food": [1.5, 2.25], "Books": [10.0]}
+
+    async def scenario():
+        for category, values in amounts.items():
+            for amount in values:
+                await server.create_expense(
+                    server.ExpenseCreate(
+                        amount=amount, category=category, date="2026-02-01T00:00:00Z"
+                    ),
+                    user,
+                )
+        grouped = await server.db_group_sum(
+            "expenses", query, "category", "amount_minor"
+        )
+        overall = await server.db_group_sum("expenses", query)
+        rows = await server.db_find("expenses", query)
+        return grouped, overall, rows
+
+    grouped, overall, rows = asyncio.run(scenario())
+
+    scanned = {}
+    for row in rows:
+        group = scanned.setdefault(row["category"], {"total": 0, "count": 0})
+        group["total"] += row["amount_minor"]
+        group["count"] += 1
+    assert grouped == scanned == {
+        "Food": {"total": 375, "count": 2},
+        "Books": {"total": 1000, "count": 1},
+    }
+    assert overall == {None: {"total": 0, "count": 3}}
+
+
+@pytest.mark.parametrize(
+    "group_by, sum_field, group",
+    [
+        (
+            "category",
+            "amount_minor",
+            {
+                "_id": "$category",
+                "total": {"$sum": "$amount_minor"},
+                "count": {"$sum": 1},
+            },
+        ),
+        (None, None, {"_id": None, "total": {"$sum": 0}, "count": {"$sum": 1}}),
+    ],
+)
+def test_group_sum_pushes_one_pipeline_down_to_mongo(
+    server, mongo, monkeypatch, group_by, sum_field, group
+):
+    monkeypatch.setattr(server.working_sets, "max_bytes", 0)
+    query = {"user_id": "u1", "date": {"$gte": "2026-01"}}
+    for n, category in enumerate(["Food", "Food", "Books"]):
+        mongo["expenses"].store.insert(
+            {
+                "user_id": "u1",
+                "category": category,
+                "amount_minor": 100 * (n + 1),
+                "date": "2026-02-01",
+            }
+        )
+
+    result = asyncio.run(server.db_group_sum("expenses", query, group_by, sum_field))
+
+    assert mongo.pipelines == [("expenses", [{"$match": query}, {"$group": group}])]
+    assert [operation for operation, _ in mongo.reads("expenses")] == ["aggregate"]
+    if group_by:
+        assert result == {
+            "Food": {"total": 300, "count": 2},
+            "Books": {"total": 300, "count": 1},
+        }
+    else:
+        assert result == {None: {"total": 0, "count": 3}}
@@ -0,0 +1,147 @@
+import asyncio
+import json
+from decimal import Decimal
+
+import pytest
+
+from money import from_minor, split_evenly, to_minor
+
+
+@pytest.mark.parametrize(
+    "amount, minor",
+    [
+        (0.005, 1),  # half a paisa rounds up, not to even
+        (2.675, 268),  # binary float 2.67499999... still means 2.675
+        (1.005, 101),
+        (-0.005, -1),  # half away from zero
+        ("19.99", 1999),
+        (Decimal("0.1"), 10),
+        (12, 1200),
+        (0.1 + 0.2, 30),
+    ],
+)
+def test_to_minor_rounds_decimal_amounts_half_up(amount, minor):
+    assert to_minor(amount) == minor
+
+
+@pytest.mark.parametrize(
+    "amount", [float("nan"), float("inf"), -float("inf"), "abc", "NaN"]
+)
+def test_to_minor_rejects_non_finite_amounts(amount):
+    with pytest.raises(ValueError):
+        to_minor(amount)
+
+
+@pytest.mark.parametrize("amount", [float("nan"), float("inf")])
+def test_api_rejects_non_finite_amounts(client, auth_headers, amount):
+    expense = {"amount": amount, "category": "Food", "date": "2026-01-01T00:00:00Z"}
+    goal = client.post(
+        "/api/savings-goals",
+        json={"title": "Bike", "target_amount": 100, "target_date": "2026-06-01"},
+        headers=auth_headers,
+    ).json()
+
+    def post(path, body):
+        # Python's json emits the NaN/Infinity tokens clients can send
+        headers = {**auth_headers, "Content-Type": "application/json"}
+        return client.post(path, content=json.dumps(body), headers=headers)
+
+    responses = [
+        post("/api/expenses", expense),
+        post(
+            "/api/savings-goals",
+            {"title": "x", "target_amount": amount, "target_date": "2026-06-01"},
+        ),
+        client.put(
+            f"/api/savings-goals/{goal['id']}/add-amount",
+            params={"amount": str(amount)},
+            headers=auth_headers,
+        ),
+    ]
+
+    assert [response.status_code for response in responses] == [422, 422, 422]
+
+
+def test_from_minor_round_trips():
+    assert from_minor(to_minor(2.675)) == 2.68
+    assert from_minor(1999) == 19.99
+
+
+def test_split_evenly_hands_out_the_remainder_in_sorted_order():
+    assert split_evenly(100, ["carol", "alice", "bob"]) == {
+        "alice": 34,
+        "bob": 33,
+        "carol": 33,
+    }
+    assert split_evenly(101, ["b", "a", "c"]) == {"a": 34, "b": 34, "c": 33}
+
+
+def test_split_evenly_always_sums_to_the_total():
+    for total in range(0, 50):
+        for count in range(1, 8):
+            shares = split_evenly(total, [f"p{n}" for n in range(count)])
+            assert sum(shares.values()) == total
+            assert max(shares.values()) - min(shares.values()) <= 1
+
+
+def test_migrate_money_to_minor_units(server, mongo):
+    async def seed():
+        await mongo["expenses"].insert_one(
+            {"id": "e1", "user_id": "u", "amount": 2.675, "category": "Food"}
+        )
+        await mongo["expenses"].insert_one(
+            {"id": "e2", "user_id": "u", "amount_minor": 500, "category": "Food"}
+        )
+        await mongo["savings_goals"].insert_one(
+            {
+                "id": "g1",
+                "user_id": "u",
+                "target_amount": 100.5,
+                "current_amount": None,
+            }
+        )
+        await mongo["category_stats"].insert_one(
+            {
+                "user_id": "u",
+                "category": "Food",
+                "count": 1,
+                "total": 2.68,
+                "sum_squares": 7.1824,
+                "ewma_mean": 2.68,
+                "ewma_var": 0.0,
+            }
+        )
+
+    asyncio.run(seed())
+    asyncio.run(server.migrate_money_to_minor_units())
+    asyncio.run(server.migrate_money_to_minor_units())  # idempotent
+
+    expenses = {e["id"]: e for e in mongo.documents("expenses")}
+    assert expenses["e1"]["amount_minor"] == 268
+    assert "amount" not in expenses["e1"]
+    assert expenses["e2"]["amount_minor"] == 500
+    [goal] = mongo.documents("savings_goals")
+    assert (goal["target_amount_minor"], goal["current_amount_minor"]) == (10050, 0)
+    assert "target_amount" not in goal and "current_amount" not in goal
+    [stats] = mongo.documents("category_stats")
+    assert stats["units"] == "minor"
+    assert stats["total"] == 268
+    assert stats["ewma_mean"] == pytest.approx(268.0)
+
+
+def test_migration_skips_unconvertible_amounts(server, mongo, caplog):
+    async def seed():
+        for expense_id, amount in (("ok", 2.5), ("nan", float("nan")), ("txt", "?")):
+            await mongo["expenses"].insert_one(
+                {"id": expense_id, "user_id": "u", "amount": amount}
+            )
+
+    asyncio.run(seed())
+    asyncio.run(server.migrate_money_to_minor_units())
+
+    expenses = {e["id"]: e for e in mongo.documents("expenses")}
+    assert expenses["ok"]["amount_minor"] == 250
+    assert "amount_minor" not in expenses["txt"] and expenses["txt"]["amount"] == "?"
+    assert "amount_minor" not in expenses["nan"]
+    skipped = [r for r in caplog.records if r.getMessage().startswith("Skipping")]
+    assert sorted(r.document_id for r in skipped) == ["nan", "txt"]
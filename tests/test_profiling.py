@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+import profiling
+from profiling import RequestProfile, StackSampler
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_concurrent_profiles_only_get_their_own_samples():
+    busy = RequestProfile("GET", "/busy")
+    idle = RequestProfile("GET", "/idle")
+
+    async def request(sampler, profile, work):
+        token = profiling._active_profile.set(profile)
+        sampler.attach(asyncio.current_task(), profile)
+        try:
+            # Routes run in a child task, as under Starlette's call_next
+            await asyncio.create_task(work())
+        finally:
+            sampler.detach(profile)
+            profiling._active_profile.reset(token)
+
+    async def busy_route():
+        spin(0.2)
+
+    async def idle_route():
+        await asyncio.sleep(0.3)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        sampler = StackSampler(loop, threading.get_ident(), 0.002)
+        sampler.start()
+        try:
+            await asyncio.gather(
+                request(sampler, idle, idle_route), request(sampler, busy, busy_route)
+            )
+        finally:
+            sampler.stop()
+        return sampler
+
+    sampler = asyncio.run(scenario())
+
+    assert busy.samples > 0
+    assert any("busy_route" in stack for stack in busy.stacks)
+    assert not any("idle_route" in stack for stack in busy.stacks)
+    assert not any("busy_route" in stack for stack in idle.stacks)
+    assert sampler.owners == {}
+
+
+def test_profiled_request_records_db_calls(server, client, auth_headers):
+    response = client.get(
+        "/api/expenses",
+        headers={**auth_headers, profiling.PROFILE_HEADER: server.ADMIN_TOKEN},
+    )
+
+    profile_id = response.headers["X-Profile-Id"]
+    profile = client.get(
+        f"/api/admin/profiles/{profile_id}",
+        headers={"X-Admin-Token": server.ADMIN_TOKEN},
+    ).json()
+    assert profile["path"] == "/api/expenses"
+    assert "expenses" in {call["collection"] for call in profile["db_calls"]}
+
+
+def test_tasks_outliving_the_request_are_not_attached():
+    profile = RequestProfile("GET", "/api/events")
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        sampler = StackSampler(loop, threading.get_ident(), 0.002)
+        token = profiling._active_profile.set(profile)
+        try:
+            sampler.attach(asyncio.current_task(), profile)
+            await asyncio.create_task(asyncio.sleep(0))
+            # Finished tasks let go of the profile without waiting for detach
+            assert len(sampler.owners) == 1
+            sampler.detach(profile)
+
+            # e.g. wait_for() inside a streaming body, after call_next returned
+            later = [asyncio.create_task(asyncio.sleep(0.01)) for _ in range(50)]
+            assert sampler.owners == {}
+            await asyncio.gather(*later)
+        finally:
+            profiling._active_profile.reset(token)
+            sampler.stop()
+        return sampler
+
+    sampler = asyncio.run(scenario())
+
+    assert profile.tasks == []
+    assert not sampler._wake.is_set()
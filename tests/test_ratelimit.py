@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+from starlette.datastructures import Headers
+
+from ratelimit import RateLimiter, RateRule
+
+
+def limiter(**kwargs):
+    rule = RateRule("default", "/", rate=2.0, burst=5)
+    return RateLimiter([], rule, identify=lambda request: None, **kwargs), rule
+
+
+def request(host="10.0.0.1", forwarded=()):
+    return SimpleNamespace(
+        client=SimpleNamespace(host=host),
+        headers=Headers(raw=[(b"x-forwarded-for", v.encode()) for v in forwarded]),
+    )
+
+
+def test_burst_is_allowed_then_requests_wait_for_a_token():
+    rate_limiter, rule = limiter()
+
+    assert [rate_limiter.acquire("ip:a", rule, 100.0) for _ in range(5)] == [0.0] * 5
+    # Empty bucket at 2 tokens/s: the next token is half a second away
+    assert rate_limiter.acquire("ip:a", rule, 100.0) == 0.5
+
+
+def test_bucket_refills_at_the_rate_up_to_the_burst():
+    rate_limiter, rule = limiter()
+    for _ in range(5):
+        rate_limiter.acquire("ip:a", rule, 100.0)
+
+    assert rate_limiter.acquire("ip:a", rule, 100.5) == 0.0
+    assert rate_limiter.acquire("ip:a", rule, 100.5) == 0.5
+
+    # A long idle period refills to the burst, never beyond it
+    allowed = [rate_limiter.acquire("ip:a", rule, 1000.0) for _ in range(6)]
+    assert allowed.count(0.0) == 5
+
+
+def test_clients_have_separate_buckets():
+    rate_limiter, rule = limiter()
+    for _ in range(5):
+        rate_limiter.acquire("ip:a", rule, 100.0)
+
+    assert rate_limiter.acquire("ip:b", rule, 100.0) == 0.0
+
+
+def test_sweep_evicts_only_refilled_buckets():
+    rate_limiter, rule = limiter()
+    rate_limiter.acquire("ip:old", rule, 100.0)
+    rate_limiter.acquire("ip:new", rule, 102.0)
+
+    # rule.idle_seconds is 2.5: the old bucket is full again, the new one not
+    rate_limiter.sweep(102.6)
+
+    assert list(rate_limiter.buckets) == [("default", "ip:new")]
+
+
+def test_connecting_address_is_used_without_trusted_proxies():
+    rate_limiter, rule = limiter()
+
+    key = rate_limiter.client_key(request(forwarded=["1.2.3.4"]), rule)
+
+    assert key == "ip:10.0.0.1"
+
+
+def test_trusted_proxy_hop_ignores_client_written_entries():
+    rate_limiter, rule = limiter(trusted_proxy_hops=1)
+
+    # The client sent a forged header; the router appended the real address
+    forged = request(forwarded=["6.6.6.6, 1.2.3.4"])
+    assert rate_limiter.client_key(forged, rule) == "ip:1.2.3.4"
+    # Repeated headers are one list
+    repeated = request(forwarded=["6.6.6.6", "1.2.3.4"])
+    assert rate_limiter.client_key(repeated, rule) == "ip:1.2.3.4"
+    assert rate_limiter.client_key(request(), rule) == "ip:10.0.0.1"
+
+
+def test_more_trusted_hops_than_entries_uses_the_leftmost():
+    rate_limiter, rule = limiter(trusted_proxy_hops=2)
+
+    assert rate_limiter.client_key(request(forwarded=["1.2.3.4"]), rule) == "ip:1.2.3.4"
+    two_proxies = request(forwarded=["6.6.6.6, 1.2.3.4, 10.1.1.1"])
+    assert rate_limiter.client_key(two_proxies, rule) == "ip:1.2.3.4"
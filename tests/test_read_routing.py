@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+
+def summary_reads(server, mongo, user):
+    del mongo.calls[:]
+    asyncio.run(server.get_expense_summary(user))
+    return {preference for _, preference in mongo.reads("expenses")}
+
+
+def add_expense(server, user):
+    expense = server.ExpenseCreate(
+        amount=12.5, category="Food", date="2026-01-01T00:00:00Z"
+    )
+    asyncio.run(server.create_expense(expense, user))
+
+
+def test_reads_go_to_secondaries_without_recent_writes(
+    server, mongo, user, monkeypatch
+):
+    monkeypatch.setattr(server.working_sets, "max_bytes", 0)
+
+    assert summary_reads(server, mongo, user) == {"secondaryPreferred"}
+
+
+def test_read_right_after_a_write_goes_to_the_primary(server, mongo, user, monkeypatch):
+    monkeypatch.setattr(server.working_sets, "max_bytes", 0)
+
+    add_expense(server, user)
+
+    assert summary_reads(server, mongo, user) == {"primary"}
+
+
+def test_read_after_the_staleness_window_may_use_a_secondary(
+    server, mongo, user, monkeypatch
+):
+    monkeypatch.setattr(server.working_sets, "max_bytes", 0)
+    add_expense(server, user)
+
+    written = server._recent_writes[f"user:{user.id}"]
+    later = written + server.READ_MAX_STALENESS_SECONDS
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+
+    assert summary_reads(server, mongo, user) == {"secondaryPreferred"}
+
+
+def test_secondary_reads_can_be_disabled(server, mongo, user, monkeypatch):
+    monkeypatch.setattr(server.working_sets, "max_bytes", 0)
+    monkeypatch.setattr(server, "SECONDARY_READS", False)
+
+    assert summary_reads(server, mongo, user) == {"primary"}
+
+
+def test_writes_and_read_before_write_lookups_use_the_primary(
+    server, mongo, user, monkeypatch
+):
+    monkeypatch.setattr(server.working_sets, "max_bytes", 0)
+    add_expense(server, user)
+    expense_id = mongo.documents("expenses")[0]["id"]
+    del mongo.calls[:]
+
+    asyncio.run(server.delete_expense(expense_id, user))
+
+    assert mongo.reads("expenses")
+    assert {preference for _, preference in mongo.reads("expenses")} == {"primary"}
@@ -0,0 +1,138 @@
+import uuid
+from datetime import datetime, timezone
+
+import recurring
+
+
+def template(interval="monthly", start="2026-01-31T09:00:00+00:00", **fields):
+    return {
+        "id": "rent",
+        "user_id": "u",
+        "amount_minor": 50000,
+        "category": "Rent",
+        "interval": interval,
+        "every": 1,
+        "start_date": start,
+        **fields,
+    }
+
+
+def dates(schedule, count):
+    return [recurring.next_date(schedule, n)[:10] for n in range(count)]
+
+
+def test_month_end_clamps_to_shorter_months_and_recovers():
+    assert dates(template(), 5) == [
+        "2026-01-31",
+        "2026-02-28",
+        "2026-03-31",
+        "2026-04-30",
+        "2026-05-31",
+    ]
+    leap = template(start="2028-01-30T00:00:00+00:00")
+    assert dates(leap, 2) == ["2028-01-30", "2028-02-29"]
+
+
+def test_monthly_rolls_over_the_year_and_yearly_handles_leap_days():
+    assert dates(template(start="2026-11-30T00:00:00+00:00"), 4) == [
+        "2026-11-30",
+        "2026-12-30",
+        "2027-01-30",
+        "2027-02-28",
+    ]
+    every_other = template(start="2026-12-15T00:00:00+00:00", every=2)
+    assert dates(every_other, 2) == ["2026-12-15", "2027-02-15"]
+    leap_day = template("yearly", start="2028-02-29T00:00:00+00:00")
+    assert dates(leap_day, 2) == ["2028-02-29", "2029-02-28"]
+
+
+def test_schedule_ends_after_end_date():
+    weekly = template(
+        "weekly",
+        start="2026-01-01T00:00:00+00:00",
+        end_date="2026-01-15T00:00:00+00:00",
+    )
+
+    assert dates(weekly, 3) == ["2026-01-01", "2026-01-08", "2026-01-15"]
+    assert recurring.next_date(weekly, 3) is None
+
+
+def test_occurrence_ids_are_deterministic_uuid5():
+    first = recurring.occurrence_id("rent", 0)
+
+    assert first == recurring.occurrence_id("rent", 0)
+    assert first != recurring.occurrence_id("rent", 1)
+    assert first != recurring.occurrence_id("phone", 0)
+    assert uuid.UUID(first).version == 5
+    assert first == str(uuid.uuid5(recurring._NAMESPACE, "rent:0"))
+
+
+def test_due_starts_at_next_index_and_is_capped():
+    daily = template("daily", start="2026-01-01T00:00:00+00:00", next_index=2)
+    through = datetime(2026, 1, 5, tzinfo=timezone.utc)
+
+    assert [n for n, _ in recurring.due(daily, through)] == [2, 3, 4]
+    assert len(recurring.due(daily, through, limit=2)) == 2
+
+
+def test_pending_totals_counts_unwritten_occurrences_in_range():
+    daily = template("daily", start="2026-01-01T00:00:00+00:00", next_index=1)
+    start = datetime(2026, 1, 3, tzinfo=timezone.utc)
+    end = datetime(2026, 1, 6, tzinfo=timezone.utc)
+
+    assert recurring.pending_totals([daily], start, end) == {
+        "Rent": {"total": 150000, "count": 3}
+    }
+    assert recurring.pending_totals([daily], None, end) == {
+        "Rent": {"total": 200000, "count": 4}
+    }
+
+
+def test_listing_is_not_materialized_while_nothing_is_due(
+    server, client, auth_headers, monkeypatch
+):
+    future = {
+        "amount": 12,
+        "category": "Phone",
+        "interval": "monthly",
+        "start_date": "2999-01-01T00:00:00Z",
+    }
+    assert client.post(
+        "/api/recurring-expenses", json=future, headers=auth_headers
+    ).status_code == 200
+    etag = client.get("/api/expenses", headers=auth_headers).headers["ETag"]
+
+    reads = []
+    find = server.db_find
+
+    async def recording_find(collection, *args, **kwargs):
+        reads.append(collection)
+        return await find(collection, *args, **kwargs)
+
+    monkeypatch.setattr(server, "db_find", recording_find)
+    response = client.get(
+        "/api/expenses", headers={**auth_headers, "If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+    assert reads == []
+
+
+def test_new_template_due_now_is_materialized(server, client, auth_headers):
+    client.get("/api/expenses", headers=auth_headers)  # caches "nothing due"
+    due = {
+        "amount": 30,
+        "category": "Gym",
+        "interval": "weekly",
+        "start_date": "2026-01-01T00:00:00Z",
+        "end_date": "2026-01-10T00:00:00Z",
+    }
+    template_id = client.post(
+        "/api/recurring-expenses", json=due, headers=auth_headers
+    ).json()["id"]
+
+    expenses = client.get("/api/expenses", headers=auth_headers).json()
+
+    assert sorted(e["id"] for e in expenses) == sorted(
+        recurring.occurrence_id(template_id, n) for n in range(2)
+    )
@@ -0,0 +1,126 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+
+class InlineRunner:
+    async def run_cpu(self, function, *args):
+        return function(*args)
+
+
+@pytest.fixture
+def exports(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "EXPORT_DIR", tmp_path)
+    return tmp_path
+
+
+def finished_job(server, user, job_type="export", hours_ago=0.0):
+    finished = datetime.now(timezone.utc) - timedelta(hours=hours_ago)
+    return {
+        "id": f"job-{user.id}-{hours_ago}",
+        "user_id": user.id,
+        "type": job_type,
+        "params": {},
+        "status": "completed",
+        "finished_at": finished.isoformat(),
+    }
+
+
+def test_export_is_written_to_a_file_not_the_job(server, user, exports):
+    expense = server.ExpenseCreate(
+        amount=12.5, category="Food", date="2026-02-01T00:00:00Z", notes="lunch"
+    )
+    job = finished_job(server, user)
+
+    async def scenario():
+        await server.create_expense(expense, user)
+        await server.insert_report_job(dict(job))
+        result = await server.run_export(job, InlineRunner())
+        await server.update_report_job(job["id"], {"result": result})
+        return result, await server.download_report(job["id"], user)
+
+    result, response = asyncio.run(scenario())
+
+    assert "data" not in result
+    assert result["rows"] == 1
+    assert result["download_url"] == f"/api/reports/{job['id']}/download"
+    csv_data = (exports / f"{job['id']}.csv").read_bytes().decode()
+    assert result["bytes"] == len(csv_data.encode())
+    assert "12.50" in csv_data and "lunch" in csv_data
+    assert str(response.path) == str(exports / f"{job['id']}.csv")
+    assert response.media_type == "text/csv"
+
+
+def test_download_is_only_for_the_owners_completed_exports(server, user, exports):
+    other = server.User(email="other@example.com", name="Other", password_hash="x")
+    summary = finished_job(server, user, job_type="yearly_summary")
+
+    async def download(job_id, owner):
+        with pytest.raises(HTTPException) as error:
+            await server.download_report(job_id, owner)
+        return error.value.status_code
+
+    async def scenario():
+        job = finished_job(server, user, hours_ago=1.0)
+        await server.insert_report_job(dict(job))
+        await server.insert_report_job(dict(summary))
+        # The file is gone (e.g. the instance restarted)
+        return (
+            await download(job["id"], other),
+            await download(summary["id"], user),
+            await download(job["id"], user),
+        )
+
+    assert asyncio.run(scenario()) == (404, 404, 410)
+
+
+def test_jobs_past_retention_are_deleted_with_their_export(server, user, exports):
+    old = finished_job(server, user, hours_ago=server.REPORT_RETENTION_HOURS + 1)
+    recent = finished_job(server, user, hours_ago=1.0)
+    running = {**finished_job(server, user, hours_ago=100.0), "finished_at": None}
+    running["id"] = f"running-{user.id}"
+    (exports / f"{old['id']}.csv").write_text("date,amount\n")
+
+    async def scenario():
+        for job in (old, recent, running):
+            await server.insert_report_job(dict(job))
+        await server.expire_report_jobs(force=True)
+        return {
+            job["id"]
+            for job in await server.db_find("report_jobs", {"user_id": user.id})
+        }
+
+    assert asyncio.run(scenario()) == {recent["id"], running["id"]}
+    assert not (exports / f"{old['id']}.csv").exists()
+
+
+def test_reports_read_every_row_in_mongo_mode(
+    server, mongo, user, exports, monkeypatch
+):
+    monkeypatch.setattr(server.working_sets, "max_bytes", 0)
+    expenses = mongo["expenses"].store
+    for number in range(1200):
+        expenses.insert(
+            {
+                "id": f"e{number}",
+                "user_id": user.id,
+                "amount_minor": 100,
+                "category": "Food",
+                "date": f"2026-{number % 12 + 1:02d}-01T00:00:00+00:00",
+            }
+        )
+    export = finished_job(server, user)
+    summary = {**finished_job(server, user, "yearly_summary"), "params": {"year": 2026}}
+
+    async def scenario():
+        return (
+            await server.run_export(export, InlineRunner()),
+            await server.run_yearly_summary(summary, InlineRunner()),
+        )
+
+    export_result, summary_result = asyncio.run(scenario())
+
+    assert export_result["rows"] == 1200
+    assert summary_result["expense_count"] == 1200
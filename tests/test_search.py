@@ -0,0 +1,117 @@
+import pytest
+
+from search import SearchIndexes, UserSearchIndex
+
+
+def expense(expense_id, category, notes="", date="2026-01-01T00:00:00+00:00"):
+    return {"id": expense_id, "category": category, "notes": notes, "date": date}
+
+
+@pytest.fixture
+def index():
+    index = UserSearchIndex()
+    for item in (
+        expense("coffee", "Food", "coffee with friends"),
+        expense("coffees", "Food", "coffees for the team"),
+        expense("groceries", "Groceries", "weekly shop"),
+        expense("notes-only", "Shopping", "groceries and a coffee"),
+    ):
+        index.add(item)
+    return index
+
+
+def test_exact_term_ranks_above_fuzzy_and_prefix_matches(index):
+    # Equal exact-match scores and dates fall back to the id
+    assert index.search("coffee", limit=10) == (3, ["coffee", "notes-only", "coffees"])
+
+
+def test_category_match_ranks_above_notes_match(index):
+    assert index.search("groceries", limit=10) == (2, ["groceries", "notes-only"])
+
+
+def test_documents_matching_more_query_terms_rank_first(index):
+    total, page = index.search("groceries coffee", limit=10)
+
+    assert page[0] == "notes-only"
+    assert total == 4
+
+
+def test_typos_and_prefixes_match(index):
+    assert "coffee" in index.search("cofee", limit=10)[1]
+    assert "groceries" in index.search("grocereis", limit=10)[1]
+    assert "groceries" in index.search("groc", limit=10)[1]
+    assert index.search("rent", limit=10) == (0, [])
+
+
+def test_ties_are_broken_by_newest_then_id():
+    index = UserSearchIndex()
+    index.add(expense("b", "Taxi", date="2026-01-01T00:00:00+00:00"))
+    index.add(expense("a", "Taxi", date="2026-01-01T00:00:00+00:00"))
+    index.add(expense("c", "Taxi", date="2026-03-01T00:00:00+00:00"))
+
+    assert index.search("taxi", limit=2) == (3, ["c", "a"])
+    assert index.search("taxi", limit=2, offset=2) == (3, ["b"])
+
+
+def test_updates_and_deletes_keep_the_index_current():
+    indexes = SearchIndexes()
+    old = expense("1", "Coffee", "flat white")
+    indexes.update("u1", new=old)  # not resident yet: ignored
+    assert indexes.get("u1") is None
+    index = indexes.build("u1", [old])
+
+    new = expense("1", "Books", "textbook")
+    indexes.update("u1", old=old, new=new)
+
+    assert index.search("coffee", limit=10) == (0, [])
+    assert index.search("textbook", limit=10) == (1, ["1"])
+    # Terms no other expense uses are dropped along with their trigrams
+    assert "flat" not in index.postings
+    assert not any("coffee" in terms for terms in index.trigram_terms.values())
+
+    indexes.update("u1", old=new)
+
+    assert index.search("books", limit=10) == (0, [])
+    assert index.postings == {} and index.trigram_terms == {}
+
+
+def test_least_recently_used_index_is_dropped():
+    indexes = SearchIndexes(max_users=2)
+    indexes.build("a", [])
+    indexes.build("b", [])
+    indexes.get("a")
+
+    indexes.build("c", [])
+
+    assert list(indexes.indexes) == ["a", "c"]
+
+
+def test_search_route_reflects_updates_and_deletes(client, auth_headers):
+    def search(q):
+        response = client.get(
+            "/api/expenses/search", params={"q": q}, headers=auth_headers
+        )
+        assert response.status_code == 200, response.text
+        return [result["id"] for result in response.json()["results"]]
+
+    body = {
+        "amount": 4.5,
+        "category": "Food",
+        "date": "2026-01-05T00:00:00Z",
+        "notes": "espresso",
+    }
+    created = client.post("/api/expenses", json=body, headers=auth_headers).json()
+    assert search("espreso") == [created["id"]]
+
+    response = client.put(
+        f"/api/expenses/{created['id']}",
+        json={**body, "notes": "bagel"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200, response.text
+    assert search("espresso") == []
+    assert search("bagel") == [created["id"]]
+
+    response = client.delete(f"/api/expenses/{created['id']}", headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert search("bagel") == []
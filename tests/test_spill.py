@@ -0,0 +1,132 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+from memory_store import MemoryCollection
+from spill import PartitionSpiller, read_segment, write_segment
+
+
+def make_spiller(tmp_path, max_bytes=1, min_idle=0.0):
+    collections = {
+        "expenses": MemoryCollection(("id", "user_id")),
+        "budgets": MemoryCollection(("user_id",)),
+        "users": MemoryCollection(("id",)),
+    }
+    spiller = PartitionSpiller(
+        collections, ("expenses", "budgets"), max_bytes, tmp_path, min_idle
+    )
+    return spiller, collections
+
+
+def expense(user_id, number):
+    return {
+        "id": f"{user_id}-{number}",
+        "user_id": user_id,
+        "amount": 1250 + number,
+        "date": datetime(2026, 2, number + 1, tzinfo=timezone.utc),
+        "receipt": bytes([number, 0, 255]),
+        "tags": ["food", None],
+    }
+
+
+def test_segment_round_trip(tmp_path):
+    partition = {"expenses": [expense("a", 0), expense("a", 1)], "budgets": []}
+    path = tmp_path / "a.seg"
+
+    size = write_segment(path, partition)
+
+    assert size == path.stat().st_size
+    assert read_segment(path) == partition
+
+
+def test_spilled_user_is_faulted_back_unchanged(tmp_path):
+    spiller, collections = make_spiller(tmp_path)
+    documents = [expense("a", 0), expense("a", 1)]
+    for document in documents:
+        collections["expenses"].insert(dict(document))
+    collections["budgets"].insert({"user_id": "a", "limit": 100})
+    collections["users"].insert({"id": "a", "email": "a@example.com"})
+    asyncio.run(spiller.fault_in("expenses", {"user_id": "a"}))
+
+    asyncio.run(spiller.fault_in("expenses", {"user_id": "b"}))
+
+    assert collections["expenses"].scan({"user_id": "a"}) == []
+    assert collections["budgets"].scan() == []
+    assert len(collections["users"]) == 1  # shared collections stay resident
+    assert spiller.stats()["spilled_users"] == 1
+
+    asyncio.run(spiller.fault_in("budgets", {"user_id": "a"}))
+
+    assert sorted(collections["expenses"].scan(), key=lambda d: d["id"]) == documents
+    assert collections["budgets"].scan() == [{"user_id": "a", "limit": 100}]
+    assert "a" not in spiller.spilled
+    assert spiller.faults == 1
+
+
+def test_fault_in_never_spills_the_user_it_loaded(tmp_path):
+    # A budget smaller than any one user, and everyone counts as idle
+    spiller, collections = make_spiller(tmp_path)
+    for user_id in ("a", "b"):
+        collections["expenses"].insert(expense(user_id, 0))
+        asyncio.run(spiller.fault_in("expenses", {"user_id": user_id}))
+
+    for user_id in ("a", "b", "a"):
+        asyncio.run(spiller.fault_in("expenses", {"user_id": user_id}))
+        resident = {d["user_id"] for d in collections["expenses"].scan()}
+        assert resident == {user_id}
+    assert spiller.over_budget >= 3
+
+
+def test_unpinned_fault_in_loads_everyone_until_the_next_enforce(tmp_path):
+    spiller, collections = make_spiller(tmp_path, min_idle=60.0)
+    for user_id in ("a", "b", "c"):
+        collections["expenses"].insert(expense(user_id, 0))
+        asyncio.run(spiller.fault_in("expenses", {"user_id": user_id}))
+    # a and b went idle long ago and were spilled
+    spiller.last_used.update(a=0.0, b=0.0)
+    spiller.enforce()
+    assert set(spiller.spilled) == {"a", "b"}
+
+    asyncio.run(spiller.fault_in("expenses", {}))  # e.g. an admin job over all users
+
+    assert {d["user_id"] for d in collections["expenses"].scan()} == {"a", "b", "c"}
+
+    # Faulting everyone in did not make them active: the next request spills
+    # them again, but not c, who is still within min_idle
+    asyncio.run(spiller.fault_in("expenses", {"user_id": "c"}))
+
+    assert set(spiller.spilled) == {"a", "b"}
+    assert {d["user_id"] for d in collections["expenses"].scan()} == {"c"}
+
+
+def test_segment_is_read_off_the_event_loop(tmp_path, monkeypatch):
+    import spill
+
+    spiller, collections = make_spiller(tmp_path)
+    collections["expenses"].insert(expense("a", 0))
+    asyncio.run(spiller.fault_in("expenses", {"user_id": "a"}))
+    asyncio.run(spiller.fault_in("expenses", {"user_id": "b"}))
+    assert "a" in spiller.spilled
+
+    reads = []
+
+    def tracked_read(path):
+        reads.append(threading.get_ident())
+        return read_segment(path)
+
+    monkeypatch.setattr(spill, "read_segment", tracked_read)
+
+    async def fault_in_together():
+        loop_thread = threading.get_ident()
+        await asyncio.gather(
+            spiller.fault_in("expenses", {"user_id": "a"}),
+            spiller.fault_in("budgets", {"user_id": "a"}),
+        )
+        return loop_thread
+
+    loop_thread = asyncio.run(fault_in_together())
+
+    # One read for both requests, and not on the loop's thread
+    assert len(reads) == 1 and reads[0] != loop_thread
+    assert [d["id"] for d in collections["expenses"].scan()] == ["a-0"]
+    assert spiller.faults == 1 and spiller.loading == {}
@@ -0,0 +1,81 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from starlette.datastructures import Headers
+
+import tracing
+
+SAMPLED_PARENT = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+
+
+class RecordingExporter(tracing.BackgroundExporter):
+    def write(self, payload):
+        pass
+
+
+def request(traceparent=None):
+    headers = {"traceparent": traceparent} if traceparent else {}
+    return SimpleNamespace(
+        method="GET",
+        url=SimpleNamespace(path="/api/expenses"),
+        headers=Headers(headers),
+    )
+
+
+def test_background_exporter_requires_write():
+    with pytest.raises(TypeError):
+        tracing.BackgroundExporter("service")
+
+
+def test_untrusted_sampled_parent_does_not_bypass_the_sample_rate():
+    tracer = tracing.Tracer(RecordingExporter("service"), sample_rate=0.0)
+
+    assert tracer._start(request(SAMPLED_PARENT)) is None
+
+
+def test_trusted_sampled_parent_continues_the_callers_trace():
+    tracer = tracing.Tracer(RecordingExporter("service"), trust_parent=True)
+
+    root = tracer._start(request(SAMPLED_PARENT))
+
+    assert root.trace.trace_id == "a" * 32
+    assert root.parent_id == "b" * 16
+
+
+def test_sampled_request_with_untrusted_parent_keeps_its_trace_id():
+    tracer = tracing.Tracer(RecordingExporter("service"), sample_rate=1.0)
+
+    assert tracer._start(request(SAMPLED_PARENT)).trace.trace_id == "a" * 32
+    assert tracer._start(request(SAMPLED_PARENT[:-2] + "00")) is None
+
+
+def test_spans_nest_under_the_current_span():
+    root = tracing.Span(tracing.Trace("t" * 32), "root")
+    token = tracing._current_span.set(root)
+    try:
+        with tracing.span("db_find", rows=3) as child:
+            assert tracing.current_span() is child
+    finally:
+        tracing._current_span.reset(token)
+
+    assert tracing.current_span() is None
+    assert child.parent_id == root.span_id
+    assert root.trace.spans == [child]
+    with tracing.span("outside") as span:
+        assert span is tracing.NOOP_SPAN
+
+
+def test_trace_file_is_rotated_at_its_size_limit(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = tracing.FileExporter(str(path), "service", max_bytes=200)
+    payload = {"resourceSpans": ["x" * 50]}
+
+    for _ in range(5):
+        exporter.write(payload)
+
+    assert path.stat().st_size <= 200
+    assert (tmp_path / "traces.jsonl.1").stat().st_size <= 200
+    assert exporter.rotations >= 1
+    lines = path.read_text().splitlines()
+    assert [json.loads(line) for line in lines] == [payload] * len(lines)
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import pytest
+
+
+@pytest.fixture
+def cache(server, mongo, monkeypatch):
+    working_sets = server.WorkingSetCache(
+        {"expenses": "user_id"}, 1024 * 1024, ttl=30.0, max_docs=3
+    )
+    monkeypatch.setattr(server, "working_sets", working_sets)
+    return working_sets
+
+
+def seed(mongo, user_id, count):
+    for n in range(count):
+        asyncio.run(
+            mongo["expenses"].insert_one(
+                {"id": f"{user_id}-{n}", "user_id": user_id, "amount_minor": n}
+            )
+        )
+    del mongo.calls[:]
+
+
+def list_expenses(server, user_id, times=1):
+    for _ in range(times):
+        found = asyncio.run(server.db_find("expenses", {"user_id": user_id}))
+    return found
+
+
+def test_small_partition_is_loaded_once_and_served_from_memory(server, mongo, cache):
+    seed(mongo, "small", 2)
+
+    assert len(list_expenses(server, "small", times=3)) == 2
+    assert mongo.reads("expenses") == [("find", "primary")]
+    assert cache.stats()["hits"] == 2
+
+
+def test_oversized_partition_is_not_reloaded_on_every_miss(server, mongo, cache):
+    seed(mongo, "large", 5)
+
+    assert len(list_expenses(server, "large", times=3)) == 5
+    # One preload that turned out too large, then one query per read
+    assert len(mongo.reads("expenses")) == 4
+    assert cache.stats()["uncacheable"] == 1
+    assert cache.stats()["oversized_partitions"] == 1
+
+
+def test_oversized_partition_is_retried_after_the_ttl(
+    server, mongo, cache, monkeypatch
+):
+    seed(mongo, "shrinking", 5)
+    list_expenses(server, "shrinking")
+    stale = {"id": {"$in": ["shrinking-0", "shrinking-1"]}}
+    asyncio.run(mongo["expenses"].delete_many(stale))
+    del mongo.calls[:]
+
+    later = time.monotonic() + cache.ttl
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    assert len(list_expenses(server, "shrinking", times=2)) == 3
+
+    # Preloaded again, now small enough to cache
+    assert len(mongo.reads("expenses")) == 1
+    assert cache.stats()["oversized_partitions"] == 0
+
+
+def test_insert_racing_a_load_is_cached_once(server, mongo, cache):
+    seed(mongo, "racy", 1)
+    document = {"id": "racy-new", "user_id": "racy", "amount_minor": 5}
+    # The insert lands, a concurrent read loads the partition with it, and
+    # only then does the writer's write-through hook run
+    asyncio.run(mongo["expenses"].insert_one(document))
+    list_expenses(server, "racy")
+    cache.inserted("expenses", document)
+
+    assert sorted(e["id"] for e in list_expenses(server, "racy")) == [
+        "racy-0",
+        "racy-new",
+    ]
+    assert cache.stats()["hits"] == 1